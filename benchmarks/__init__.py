@@ -0,0 +1 @@
+"""Synthetic MLS data and per-stage benchmarks (run from the repo root)."""
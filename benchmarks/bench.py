@@ -0,0 +1,221 @@
+"""Per-stage timing and memory benchmarks on synthetic comp sets.
+
+Runs the app's stages in page order on a synthetic export of each size —
+ingest (parse + compact), Module 4 SF filter, Module 7 adjustments, Module 8
+summarization, analysis JSON write and DOCX render — recording the best wall
+time of at least `--repeat` runs (short stages keep running until
+MIN_TIMED_SECONDS have elapsed) and the tracemalloc peak of one more. Results are
+compared against `baselines.json`; a stage slower than its baseline by more
+than `--tolerance` is reported as a regression (exit status 1 with `--check`).
+
+Baselines are absolute seconds from the machine that recorded them, so each
+run also times a fixed numpy / pandas / pure-Python calibration loop and
+scales the baseline by how much faster or slower this machine runs it.
+
+    python -m benchmarks.bench [--sizes 1000 10000 100000] [--check] [--update-baseline]
+"""
+
+import argparse
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import generate, subjects
+from ichiban.adjustments import apply_adjustments
+from ichiban.analysis_format import build_analysis, to_json
+from ichiban.compact import compact_comps
+from ichiban.ingest import fingerprint, parse_comps
+from ichiban.reports import build_backup_report
+from ichiban.schema import load_compiled
+from ichiban.search import CompIndex
+from ichiban.summary import average_days, prepare_comps, value_range
+
+BASELINE_PATH = Path(__file__).with_name("baselines.json")
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+STAGES = ["ingest", "sf_filter", "adjust", "summarize", "json_write", "docx_render"]
+# Timings below this are noise; they never count as regressions
+MIN_SECONDS = 0.005
+DEFAULT_REPEAT = 5
+# Each stage is re-run until it has been timed for this long (at most MAX_RUNS times)
+MIN_TIMED_SECONDS = 0.5
+MAX_RUNS = 200
+
+
+def _subject():
+    subject = subjects(1, seed=1001).iloc[0].to_dict()
+    return {k: (v.item() if hasattr(v, "item") else v) for k, v in subject.items()}
+
+
+def _stages(data, subject, compiled):
+    """(name, fn) pairs; each fn takes the previous stage's output."""
+    key = fingerprint(data)
+
+    def ingest(_):
+        return compact_comps(parse_comps(data), key)
+
+    def sf_filter(ingested):
+        comps, store = ingested
+        positions = CompIndex(comps).query(ag_sf=(subject["ag_sf"] * 0.85, subject["ag_sf"] * 1.10))
+        return comps.iloc[positions], store
+
+    def adjust(filtered):
+        comps, store = filtered
+        return apply_adjustments(comps, subject, compiled), store
+
+    def summarize(adjusted):
+        comps, store = adjusted
+        comps = prepare_comps(comps, store)
+        stats, _ = value_range(comps["adjusted_price"], comps["ag_sf"])
+        return comps, stats
+
+    def json_write(summary):
+        comps, stats = summary
+        analysis = build_analysis({"subject_property": subject, "online_estimate_average": 0.0, **stats,
+                                   "average_days_in_mls": average_days(comps), "online_estimates": {}}, comps)
+        return analysis, to_json(analysis)
+
+    def docx_render(written):
+        # Builder + save without render_report's cache, so every run really renders
+        buf = io.BytesIO()
+        build_backup_report(written[0]).save(buf)
+        return buf.getvalue()
+
+    return list(zip(STAGES, [ingest, sf_filter, adjust, summarize, json_write, docx_render]))
+
+
+def calibrate(repeat=DEFAULT_REPEAT):
+    """Best seconds for a fixed sort / groupby / Python-loop workload; the machine-speed yardstick."""
+    rng = np.random.default_rng(0)
+    values = rng.random(1_000_000)
+    frame = pd.DataFrame({"key": rng.integers(0, 1000, 200_000), "value": rng.random(200_000)})
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        np.sort(values)
+        frame.groupby("key")["value"].median()
+        sum(i * i for i in range(300_000))
+        best = min(best, time.perf_counter() - start)
+    return round(best, 5)
+
+
+def run_size(rows, repeat=DEFAULT_REPEAT, seed=0, extra_columns=40):
+    """{stage: {"seconds", "peak_mb", "rows"}} for one synthetic comp set."""
+    data = generate(rows, seed=seed, extra_columns=extra_columns).to_csv(index=False).encode()
+    subject = _subject()
+    compiled = load_compiled("mid")
+    results = {}
+    value = None
+    for name, fn in _stages(data, subject, compiled):
+        best, total, runs = float("inf"), 0.0, 0
+        while runs < repeat or (total < MIN_TIMED_SECONDS and runs < MAX_RUNS):
+            start = time.perf_counter()
+            out = fn(value)
+            elapsed = time.perf_counter() - start
+            best, total, runs = min(best, elapsed), total + elapsed, runs + 1
+        tracemalloc.start()
+        fn(value)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        first = out[0] if isinstance(out, tuple) else out
+        results[name] = {"seconds": round(best, 5), "peak_mb": round(peak / 2**20, 2),
+                         "rows": len(first) if hasattr(first, "__len__") and not isinstance(first, (bytes, dict)) else None}
+        value = out
+    return results
+
+
+def compare(results, baselines, tolerance=1.5, scale=1.0):
+    """Regression messages for stages slower than `tolerance` x their baseline (times `scale`)."""
+    problems = []
+    for size, stages in results.items():
+        for name, r in stages.items():
+            base = baselines.get(size, {}).get(name)
+            if not base:
+                continue
+            expected = base["seconds"] * scale
+            limit = max(expected * tolerance, MIN_SECONDS)
+            if r["seconds"] > limit:
+                problems.append(f"{size} rows / {name}: {r['seconds']:.3f}s vs baseline {expected:.3f}s "
+                                f"({r['seconds'] / expected:.1f}x)")
+    return problems
+
+
+def load_baselines(path=BASELINE_PATH):
+    """The recorded payload: machine, python, calibration_s and per-size results."""
+    if not Path(path).exists():
+        return {"results": {}}
+    return json.loads(Path(path).read_text())
+
+
+def save_baselines(results, calibration, path=BASELINE_PATH):
+    payload = {"machine": platform.machine(), "python": platform.python_version(),
+               "recorded": time.strftime("%Y-%m-%d"), "calibration_s": calibration, "results": results}
+    Path(path).write_text(json.dumps(payload, indent=2) + "\n")
+
+
+def machine_scale(recorded, calibration):
+    """How much slower this machine is than the recording one (1.0 if the baseline has no calibration)."""
+    base = recorded.get("calibration_s")
+    return calibration / base if base else 1.0
+
+
+def _print_table(results, baselines, scale=1.0):
+    print(f"{'rows':>9}  {'stage':<12} {'seconds':>9} {'baseline':>9} {'peak MB':>9} {'out rows':>9}")
+    for size, stages in results.items():
+        for name, r in stages.items():
+            base = baselines.get(size, {}).get(name, {}).get("seconds")
+            base = f"{base * scale:.4f}" if base is not None else "-"
+            print(f"{int(size):>9,}  {name:<12} {r['seconds']:>9.4f} {base:>9} "
+                  f"{r['peak_mb']:>9.1f} {r['rows'] if r['rows'] is not None else '-':>9}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the app's stages on synthetic comp sets.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--tolerance", type=float, default=1.5, help="Allowed slowdown vs baseline")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="Exit 1 when any stage regressed")
+    args = parser.parse_args(argv)
+
+    # Untimed pass so one-time imports and schema loading don't land in the first stage's timings
+    run_size(200, repeat=1)
+    calibration = calibrate(max(args.repeat, DEFAULT_REPEAT))
+    results = {}
+    for rows in args.sizes:
+        print(f"Running {rows:,} rows...", file=sys.stderr)
+        results[str(rows)] = run_size(rows, repeat=args.repeat)
+
+    recorded = load_baselines(args.baseline)
+    baselines = recorded["results"]
+    scale = machine_scale(recorded, calibration)
+    _print_table(results, baselines, scale)
+    if args.update_baseline:
+        # Sizes not re-run are carried over, rescaled to this machine's calibration
+        carried = {size: {name: {**r, "seconds": round(r["seconds"] * scale, 5)} for name, r in stages.items()}
+                   for size, stages in baselines.items() if size not in results}
+        save_baselines({**carried, **results}, calibration, args.baseline)
+        print(f"Baseline written to {args.baseline}", file=sys.stderr)
+        return 0
+
+    if (recorded.get("machine"), recorded.get("python")) != (platform.machine(), platform.python_version()):
+        print(f"Baseline recorded on {recorded.get('machine')} / Python {recorded.get('python')}; "
+              f"comparing against it scaled by the calibration loop", file=sys.stderr)
+    print(f"Calibration {calibration:.4f}s ({scale:.2f}x the baseline machine)", file=sys.stderr)
+    problems = compare(results, baselines, args.tolerance, scale)
+    for p in problems:
+        print(f"REGRESSION {p}", file=sys.stderr)
+    if not problems:
+        print("No regressions against baseline." if baselines else "No baseline recorded yet.", file=sys.stderr)
+    return 1 if problems and args.check else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
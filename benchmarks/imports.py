@@ -0,0 +1,149 @@
+"""Cold import time of each page and library module, and which heavy packages it loads.
+
+Each target is imported in a fresh interpreter (`--repeat` times, best kept),
+so the numbers are what the first visit to a page costs in a new container.
+A page's target is the set of modules its top-level imports name; packages
+not installed here (e.g. streamlit) are skipped and listed. `DEFERRED` names
+heavy packages a target must not load at import time. `RENDER_DEFERRED` pages
+are also run once with Streamlit's AppTest (fresh interpreter, empty session)
+and must not load those packages beyond what a bare one-line Streamlit script
+loads. `--check` exits 1 when either is violated.
+
+    python -m benchmarks.imports [--repeat 5] [--check]
+"""
+
+import argparse
+import ast
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from ichiban.lazy import available
+
+ROOT = Path(__file__).resolve().parent.parent
+HEAVY = ["pandas", "numpy", "pyarrow", "fitz", "docx", "openai", "tiktoken", "altair"]
+# Packages that must stay unloaded until the interaction that needs them runs
+DEFERRED = {
+    "ichiban.llm": ["openai"],
+    "ichiban.reports": ["docx"],
+    "ichiban.subject_pdf": ["fitz", "pandas"],
+    "ichiban.instrument": ["pandas"],
+    "pages/2_Module2.py": ["fitz", "pandas"],
+    "pages/3_Module3.py": ["pandas"],
+    "pages/6_Module6.py": ["pandas"],
+    "pages/9_Module9.py": ["docx", "openai"],
+    "pages/11_Module11.py": ["docx", "openai"],
+    "pages/12_Module12.py": ["altair"],
+}
+
+# Pages whose first render (not just import) must leave these packages unloaded
+RENDER_DEFERRED = {
+    "pages/3_Module3.py": ["pandas", "numpy"],
+    "pages/6_Module6.py": ["pandas", "numpy"],
+}
+BARE_PAGE = "import streamlit as st\nst.write('')\n"
+
+RENDER_PROBE = """
+import sys, json
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_{source}({target!r}, default_timeout=60)
+at.run()
+print(json.dumps({{"loaded": [m for m in {heavy!r} if m in sys.modules], "errors": [str(e.value) for e in at.exception]}}))
+"""
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def page_modules(path):
+    """Top-level modules a page imports (the page's cold-start import set)."""
+    tree = ast.parse(Path(path).read_text(encoding="utf-8"))
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            names.append(node.module)
+    return list(dict.fromkeys(names))
+
+
+def targets():
+    """{target name: modules to import}: every ichiban module, then every page."""
+    out = {f"ichiban.{p.stem}": [f"ichiban.{p.stem}"]
+           for p in sorted((ROOT / "ichiban").glob("*.py")) if p.stem != "__init__"}
+    pages = sorted((ROOT / "pages").glob("*.py"), key=lambda p: int(p.name.split("_")[0]))
+    for page in [ROOT / "main.py"] + pages:
+        out[str(page.relative_to(ROOT))] = page_modules(page)
+    return out
+
+
+def measure(modules, repeat=3):
+    """Best seconds over `repeat` fresh interpreters, and the heavy packages loaded."""
+    code = PROBE.format(modules=modules, heavy=HEAVY)
+    best, loaded = float("inf"), []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        best, loaded = min(best, result["seconds"]), result["loaded"]
+    return best, loaded
+
+
+def render_loaded(page=None):
+    """Heavy packages loaded after one AppTest run of `page` (the bare script when None), and its errors."""
+    source, target = ("string", BARE_PAGE) if page is None else ("file", str(ROOT / page))
+    code = RENDER_PROBE.format(source=source, target=target, heavy=HEAVY)
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    return result["loaded"], result["errors"]
+
+
+def render_problems():
+    """Pages in RENDER_DEFERRED whose first render loads a deferred package."""
+    if not available("streamlit"):
+        print("render check skipped: streamlit not installed")
+        return []
+    bare, _ = render_loaded()
+    problems = []
+    for page, deferred in RENDER_DEFERRED.items():
+        loaded, errors = render_loaded(page)
+        early = [m for m in deferred if m in loaded and m not in bare]
+        print(f"render {page:<21} {', '.join(loaded) or '-'}{'  errors: ' + '; '.join(errors) if errors else ''}")
+        if early:
+            problems.append(f"{page} loads {', '.join(early)} on first render")
+        if errors:
+            problems.append(f"{page} raised on first render")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold import time per page and module.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--check", action="store_true", help="Exit 1 when a target loads a deferred package")
+    args = parser.parse_args(argv)
+
+    problems = []
+    print(f"{'target':<28} {'seconds':>8}  heavy packages loaded")
+    for name, modules in targets().items():
+        missing = [m for m in modules if not available(m.split(".")[0])]
+        seconds, loaded = measure([m for m in modules if m not in missing], args.repeat)
+        note = f"  (skipped, not installed: {', '.join(missing)})" if missing else ""
+        print(f"{name:<28} {seconds:>8.3f}  {', '.join(loaded) or '-'}{note}")
+        early = [m for m in DEFERRED.get(name, []) if m in loaded]
+        if early:
+            problems.append(f"{name} loads {', '.join(early)} at import time")
+
+    problems += render_problems()
+    for p in problems:
+        print(f"EAGER IMPORT {p}", file=sys.stderr)
+    return 1 if problems and args.check else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""Synthetic MLS comp exports for benchmarking (no real listing data).
+
+Columns and formats follow the MLS exports Module 1 reads: the raw field
+names `parse_comps` renames, "$1,234" money strings, mixed date formats,
+status/city categoricals, coordinates, and public remarks built from a phrase
+bank. Prices come from a simple hedonic model (tiered $/SF + basement,
+garage, view, age) plus noise, so the adjustment and range stages see
+realistic spreads.
+
+    python -m benchmarks.synthetic --rows 100000 --out comps.csv [--extra-columns 120] [--seed 0]
+"""
+
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+CITIES = {
+    # city: (zip prefix, base $/SF, centre lat, centre lon)
+    "Denver": ("802", 330.0, 39.74, -104.99),
+    "Aurora": ("800", 245.0, 39.73, -104.83),
+    "Lakewood": ("802", 300.0, 39.70, -105.08),
+    "Littleton": ("801", 310.0, 39.61, -105.02),
+    "Arvada": ("800", 290.0, 39.80, -105.09),
+    "Parker": ("801", 280.0, 39.52, -104.76),
+}
+STREETS = ["Maple", "Oak", "Elm", "Cedar", "Pine", "Aspen", "Willow", "Spruce", "Birch", "Juniper",
+           "Main", "Park", "Lake", "Hill", "Ridge", "Meadow", "Sunset", "Highland", "Valley", "Canyon"]
+SUFFIXES = ["St", "Ave", "Dr", "Ct", "Ln", "Way", "Pl", "Cir", "Rd", "Blvd"]
+STATUSES = ["Closed", "Closed", "Closed", "Closed", "Active", "Pending", "Withdrawn"]
+VIEWS = ["", "", "", "Greenbelt", "Mountain(s)", "Golf Course", "City", "Open Space"]
+BASEMENTS = ["Full", "Full", "Partial", "Walk-Out Access", "Garden Level", "Crawl Space", ""]
+PHRASES = [
+    "Updated kitchen with quartz counters and stainless appliances.",
+    "Open floor plan with vaulted ceilings and abundant natural light.",
+    "Backs to greenbelt with mountain views from the deck.",
+    "New roof and furnace in the last two years.",
+    "Finished walkout basement with wet bar and guest suite.",
+    "Quiet cul-de-sac location close to parks and schools.",
+    "Hardwood floors throughout the main level.",
+    "Oversized three car garage with workshop space.",
+    "Primary suite with five-piece bath and walk-in closet.",
+    "Needs some updating; priced accordingly.",
+    "Large corner lot with mature trees and a fenced yard.",
+    "Minutes to light rail, shopping and dining.",
+    "Seller concessions available for buyer closing costs.",
+    "Solar panels owned; low utility bills.",
+]
+
+
+def _money(values):
+    return pd.Series(values).map("${:,.0f}".format)
+
+
+def generate(rows, seed=0, extra_columns=0, start="2022-01-01", end="2025-06-30"):
+    """Raw MLS-style comp frame with `rows` listings."""
+    rng = np.random.default_rng(seed)
+    names = list(CITIES)
+    city = rng.choice(len(names), rows)
+    zip_prefix = np.array([CITIES[c][0] for c in names])[city]
+    base_ppsf = np.array([CITIES[c][1] for c in names])[city]
+    lat0 = np.array([CITIES[c][2] for c in names])[city]
+    lon0 = np.array([CITIES[c][3] for c in names])[city]
+
+    ag_sf = np.clip(rng.lognormal(np.log(1900), 0.32, rows), 600, 7500).round()
+    has_basement = rng.random(rows) < 0.7
+    basement_sf = np.where(has_basement, (ag_sf * rng.uniform(0.4, 0.9, rows)).round(), 0)
+    finished_share = np.where(has_basement, rng.choice([0.0, 0.5, 0.8, 1.0], rows, p=[0.25, 0.15, 0.2, 0.4]), 0.0)
+    bgf = (basement_sf * finished_share).round()
+    bgu = basement_sf - bgf
+    beds = np.clip(np.round(ag_sf / 550 + rng.normal(0, 0.7, rows)), 1, 7)
+    full_baths = np.clip(np.round(beds * 0.6 + rng.normal(0, 0.5, rows)), 1, 5)
+    half_baths = (rng.random(rows) < 0.45).astype(int)
+    garage = rng.choice([0, 1, 2, 2, 2, 3, 3, 4], rows)
+    year_built = np.clip(np.round(rng.normal(1988, 22, rows)), 1900, 2025)
+    view = rng.choice(VIEWS, rows)
+    basement = np.where(has_basement, rng.choice(BASEMENTS, rows), "None")
+
+    price = (base_ppsf * ag_sf * rng.lognormal(0, 0.08, rows)
+             + 35 * bgf + 12 * bgu + 9000 * garage + 6500 * full_baths + 3000 * half_baths
+             - 900 * (2025 - year_built)
+             + np.where(np.isin(view, ["Mountain(s)", "Golf Course"]), 0.04, np.where(view == "Greenbelt", 0.02, 0.0)) * base_ppsf * ag_sf)
+    price = np.maximum(price, 75_000).round(-2)
+    list_price = (price * rng.uniform(0.97, 1.06, rows)).round(-3)
+    concessions = np.where(rng.random(rows) < 0.3, rng.choice([2500, 5000, 7500, 10000, 15000], rows), 0)
+    net_price = price - concessions
+
+    span = (pd.Timestamp(end) - pd.Timestamp(start)).days
+    close = pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, span, rows), unit="D")
+    dom = np.clip(rng.gamma(1.4, 18, rows).round(), 0, 400).astype(int)
+    contract = close - pd.to_timedelta(dom + rng.integers(20, 45, rows), unit="D")
+    # Exports mix ISO and US dates
+    us = rng.random(rows) < 0.3
+    close_text = np.where(us, close.strftime("%m/%d/%Y"), close.strftime("%Y-%m-%d"))
+
+    remarks_idx = rng.integers(0, len(PHRASES), (rows, 4))
+    phrases = np.array(PHRASES, dtype=object)
+    remarks = [" ".join(p) for p in phrases[remarks_idx].tolist()]
+
+    df = pd.DataFrame({
+        "Listing Id": [f"SYN{seed:02d}{i:08d}" for i in range(rows)],
+        "Street Number": rng.integers(100, 19999, rows).astype(str),
+        "Street Name": rng.choice(STREETS, rows),
+        "Street Suffix": rng.choice(SUFFIXES, rows),
+        "City": np.array(names)[city],
+        "Postal Code": [f"{p}{n:02d}" for p, n in zip(zip_prefix, rng.integers(1, 40, rows))],
+        "Subdivision Name": [f"{STREETS[i % len(STREETS)]} {'Park' if i % 3 else 'Estates'} Filing {i % 7 + 1}" for i in rng.integers(0, 400, rows)],
+        "Mls Status": rng.choice(STATUSES, rows),
+        "Listing Contract Date": contract.strftime("%Y-%m-%d"),
+        "Close Date": close_text,
+        "List Price": _money(list_price),
+        "Close Price": _money(price),
+        "Concessions Amount": _money(concessions),
+        "Net Close Price": _money(net_price),
+        "Above Grade Finished Area": ag_sf.astype(int),
+        "Below Grade Finished Area": bgf.astype(int),
+        "Below Grade Unfinished Area": bgu.astype(int),
+        "Bedrooms Total": beds.astype(int),
+        "Bathrooms Total Integer": (full_baths + half_baths).astype(int),
+        "Bathrooms Full": full_baths.astype(int),
+        "Bathrooms Half": half_baths,
+        "Garage Spaces": garage,
+        "Year Built": year_built.astype(int),
+        "Days In MLS": dom,
+        "View": view,
+        "Basement": basement,
+        "Latitude": (lat0 + rng.normal(0, 0.04, rows)).round(6),
+        "Longitude": (lon0 + rng.normal(0, 0.05, rows)).round(6),
+        "Public Remarks": remarks,
+    })
+    # Real exports are wide; padding columns exercise projection and parse cost
+    for i in range(extra_columns):
+        df[f"Extra Field {i + 1}"] = rng.choice(["Yes", "No", "", "See Remarks"], rows)
+    return df
+
+
+def write_csv(path, rows, seed=0, extra_columns=0, chunk_rows=200_000):
+    """Write a synthetic export in chunks (keeps memory flat at 1M rows)."""
+    with open(path, "w", newline="") as f:
+        for i, start in enumerate(range(0, rows, chunk_rows)):
+            chunk = generate(min(chunk_rows, rows - start), seed=seed + i, extra_columns=extra_columns)
+            chunk.to_csv(f, index=False, header=(i == 0))
+
+
+def subjects(rows, seed=1):
+    """Subject rows (the batch runner's subject CSV fields) drawn from the same model."""
+    comps = generate(rows, seed=seed)
+    return pd.DataFrame({
+        "address": comps["Street Number"] + " " + comps["Street Name"] + " " + comps["Street Suffix"],
+        "ag_sf": comps["Above Grade Finished Area"],
+        "bedrooms": comps["Bedrooms Total"],
+        "bathrooms": comps["Bathrooms Total Integer"],
+        "below_grade_finished": comps["Below Grade Finished Area"],
+        "below_grade_unfinished": comps["Below Grade Unfinished Area"],
+        "garage_spaces": comps["Garage Spaces"],
+        "full_baths": comps["Bathrooms Full"],
+        "half_baths": comps["Bathrooms Half"],
+        "year_built": comps["Year Built"],
+        "latitude": comps["Latitude"],
+        "longitude": comps["Longitude"],
+    })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic MLS comp export.")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--extra-columns", type=int, default=0, help="Padding columns to mimic wide exports")
+    parser.add_argument("--subjects", type=int, default=0, help="Also write this many subjects to <out>.subjects.csv")
+    args = parser.parse_args(argv)
+
+    write_csv(args.out, args.rows, seed=args.seed, extra_columns=args.extra_columns)
+    print(f"Wrote {args.rows:,} comps to {args.out}", file=sys.stderr)
+    if args.subjects:
+        path = f"{args.out.rsplit('.', 1)[0]}.subjects.csv"
+        subjects(args.subjects, seed=args.seed + 1000).to_csv(path, index=False)
+        print(f"Wrote {args.subjects:,} subjects to {path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
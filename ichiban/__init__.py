@@ -0,0 +1 @@
+"""Shared helpers used by the Ichiban Streamlit pages."""
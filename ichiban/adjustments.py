@@ -0,0 +1,246 @@
+"""Comp adjustments driven by market_adjustment_schema.json.
+
+The schema is compiled once into flat arrays (price-tier boundaries and the
+per-tier SF rates), and every adjustment is applied as a whole-column NumPy
+operation, so a comp frame of any size is adjusted in a single pass.
+
+Adjustments follow the schema's first principle, "adjust the comparable, not
+the subject": each amount is `(subject - comp) * rate`, so a comp that is
+larger or better than the subject is adjusted down.
+"""
+
+import re
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from ichiban.instrument import traced
+
+# Every adjustment column produced by apply_adjustments, in display order
+ADJUSTMENT_COLUMNS = ["ag_adj", "bgf_adj", "bgu_adj", "garage_adj", "bath_adj", "view_adj", "walkout_adj", "age_adj"]
+
+# Adjustment groups that can be selected with `include=`
+ADJUSTMENT_GROUPS = {
+    "ag": ["ag_adj"],
+    "basement": ["bgf_adj", "bgu_adj"],
+    "garage": ["garage_adj"],
+    "baths": ["bath_adj"],
+    "view": ["view_adj"],
+    "walkout": ["walkout_adj"],
+    "age": ["age_adj"],
+}
+
+VIEW_PATTERNS = {
+    "premium": r"mountain|golf|panoram",
+    "greenbelt": r"greenbelt|green belt|open space",
+}
+BASEMENT_PATTERNS = {
+    "walkout": r"walk[\s-]?out",
+    "garden": r"garden",
+}
+
+CompiledSchema = namedtuple("CompiledSchema", [
+    "tier_upper",        # upper net-price bound of each SF tier (last is inf)
+    "tier_labels",
+    "ag_rate",           # per-tier $/SF arrays
+    "basement_rate",
+    "basement_finished_rate",
+    "garage_per_bay",
+    "tandem_multiplier",
+    "half_bath",
+    "full_bath",
+    "greenbelt_pct",
+    "premium_view_pct",
+    "walkout",
+    "garden_level",
+    "age_per_year",
+])
+
+
+def parse_money(text):
+    """'$250K' -> 250000, '$1.2M' -> 1200000, '$250' -> 250."""
+    m = re.search(r"([\d.]+)\s*([KkMm]?)", text)
+    if not m:
+        raise ValueError(f"Unrecognized price: {text!r}")
+    value = float(m.group(1))
+    return value * {"k": 1e3, "m": 1e6}.get(m.group(2).lower(), 1.0)
+
+
+def tier_upper_bound(price_range):
+    """Upper bound of a schema priceRange such as '$450–$700K' or '$1.2M+'."""
+    text = price_range.strip()
+    if text.endswith("+"):
+        return np.inf
+    return parse_money(re.split(r"[–—-]", text)[-1])
+
+
+# Which point of a [low, high] schema range to use
+RATE_POINTS = ("low", "mid", "high")
+
+
+def range_point(value, point="mid"):
+    """Low end, midpoint or high end of a schema number / [low, high] range."""
+    if isinstance(value, (list, tuple)):
+        if point == "low":
+            return float(min(value))
+        if point == "high":
+            return float(max(value))
+        return float(sum(value)) / len(value)
+    return float(value)
+
+
+def compile_schema(schema, point="mid"):
+    """Flatten the schema dict into a CompiledSchema of arrays and scalars.
+
+    Range-valued entries are resolved to their `point` ("low", "mid" or "high").
+    """
+    def pick(value):
+        return range_point(value, point)
+
+    tiers = schema.get("squareFootageAdjustments", [])
+    uppers = np.array([tier_upper_bound(t["priceRange"]) for t in tiers], dtype="float64")
+    order = np.argsort(uppers, kind="stable")
+    tiers = [tiers[i] for i in order]
+
+    def tier_rates(key):
+        return np.array([pick(t.get(key, 0)) for t in tiers], dtype="float64")
+
+    garage = schema.get("garageAdjustment", {})
+    baths = schema.get("bathroomsAdjustment", {})
+    view = schema.get("viewAdjustment", {})
+    return CompiledSchema(
+        tier_upper=uppers[order],
+        tier_labels=[t["priceRange"] for t in tiers],
+        ag_rate=tier_rates("aboveGrade"),
+        basement_rate=tier_rates("basement"),
+        basement_finished_rate=tier_rates("basementFinished"),
+        garage_per_bay=pick(garage.get("perBayRange", 0)),
+        tandem_multiplier=float(garage.get("tandemMultiplier", 1.0)),
+        half_bath=pick(baths.get("halfBathroom", 0)),
+        full_bath=pick(baths.get("fullBathroom", 0)),
+        greenbelt_pct=pick(view.get("greenbeltPercent", 0)),
+        premium_view_pct=pick(view.get("mountainGolfPanoramicPercentRange", 0)),
+        walkout=pick(schema.get("walkoutBasementAdjustment", {}).get("range", 0)),
+        garden_level=pick(schema.get("gardenLevelAdjustment", {}).get("range", 0)),
+        age_per_year=float(schema.get("ageAdjustment", {}).get("perYear", 0)),
+    )
+
+
+def tier_index(compiled, prices):
+    """Index of the SF tier for each price (binary search on tier upper bounds)."""
+    idx = np.searchsorted(compiled.tier_upper, np.nan_to_num(prices, nan=0.0), side="left")
+    return np.minimum(idx, len(compiled.tier_upper) - 1)
+
+
+def _num(comps, col, default=np.nan):
+    if col in comps.columns:
+        return pd.to_numeric(comps[col], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    return np.full(len(comps), default, dtype="float64")
+
+
+def _text(comps, col):
+    if col in comps.columns:
+        return comps[col].astype("object").fillna("").astype(str).str.lower()
+    return pd.Series("", index=comps.index)
+
+
+def _diff(subject_value, comp_values):
+    """subject - comp, with 0 wherever either side is unknown."""
+    if subject_value is None:
+        return np.zeros(len(comp_values))
+    d = float(subject_value) - comp_values
+    return np.where(np.isnan(d), 0.0, d)
+
+
+def view_percent(compiled, kind):
+    return {"premium": compiled.premium_view_pct, "greenbelt": compiled.greenbelt_pct}.get(kind, 0.0)
+
+
+def basement_value(compiled, kind):
+    return {"walkout": compiled.walkout, "garden": compiled.garden_level}.get(kind, 0.0)
+
+
+def _classify(text, patterns, default="none"):
+    out = np.full(len(text), default, dtype=object)
+    # Earlier patterns take precedence when a description matches several
+    for kind, pattern in reversed(list(patterns.items())):
+        out[text.str.contains(pattern, regex=True).to_numpy()] = kind
+    return out
+
+
+@traced()
+def apply_adjustments(comps, subject, compiled, include=None):
+    """Return `comps` with *_diff, *_adj, total_adjustments and adjusted_price columns.
+
+    `include` limits the adjustments to the given ADJUSTMENT_GROUPS keys; the
+    other *_adj columns are still present and zero. Subject fields that are
+    missing (None) contribute no adjustment.
+    """
+    groups = set(ADJUSTMENT_GROUPS) if include is None else set(include)
+    n = len(comps)
+    price = _num(comps, "net_price")
+    tier = tier_index(compiled, price)
+    out = {}
+
+    # Square footage, rated by the comp's price tier
+    out["ag_diff"] = _diff(subject.get("ag_sf", 0), _num(comps, "ag_sf"))
+    out["bgf_diff"] = _diff(subject.get("below_grade_finished", 0), _num(comps, "below_grade_finished", 0.0))
+    out["bgu_diff"] = _diff(subject.get("below_grade_unfinished", 0), _num(comps, "below_grade_unfinished", 0.0))
+    out["ag_adj"] = out["ag_diff"] * compiled.ag_rate[tier]
+    out["bgf_adj"] = out["bgf_diff"] * compiled.basement_finished_rate[tier]
+    out["bgu_adj"] = out["bgu_diff"] * compiled.basement_rate[tier]
+
+    # Garage bays; tandem bays beyond the first count at the tandem multiplier
+    def effective_bays(bays, tandem):
+        return np.where(tandem & (bays > 1), 1 + (bays - 1) * compiled.tandem_multiplier, bays)
+
+    comp_bays = effective_bays(_num(comps, "Garage Spaces"), _text(comps, "Parking Features").str.contains("tandem").to_numpy())
+    subject_bays = subject.get("garage_spaces")
+    if subject_bays is not None:
+        subject_bays = float(effective_bays(np.float64(subject_bays), bool(subject.get("garage_tandem"))))
+    out["garage_adj"] = _diff(subject_bays, comp_bays) * compiled.garage_per_bay
+
+    # Bathrooms: full/half split when available, otherwise total count as full baths
+    if "Bathrooms Full" in comps.columns and subject.get("full_baths") is not None:
+        full = _diff(subject.get("full_baths"), _num(comps, "Bathrooms Full"))
+        half = _diff(subject.get("half_baths"), _num(comps, "Bathrooms Half", 0.0))
+    else:
+        full = _diff(subject.get("bathrooms"), _num(comps, "bathrooms"))
+        half = np.zeros(n)
+    out["bath_adj"] = full * compiled.full_bath + half * compiled.half_bath
+
+    # View: percent of the comp's price
+    subject_view = subject.get("view")
+    if subject_view is not None and "View" in comps.columns:
+        kinds = _classify(_text(comps, "View"), VIEW_PATTERNS)
+        comp_view = np.select([kinds == "premium", kinds == "greenbelt"], [compiled.premium_view_pct, compiled.greenbelt_pct], 0.0)
+        out["view_adj"] = (view_percent(compiled, subject_view) - comp_view) / 100.0 * np.nan_to_num(price)
+    else:
+        out["view_adj"] = np.zeros(n)
+
+    # Walkout / garden-level basements: fixed amounts
+    subject_basement = subject.get("basement_type")
+    if subject_basement is not None and "Basement" in comps.columns:
+        kinds = _classify(_text(comps, "Basement"), BASEMENT_PATTERNS)
+        comp_value = np.where(kinds == "walkout", compiled.walkout, np.where(kinds == "garden", compiled.garden_level, 0.0))
+        out["walkout_adj"] = basement_value(compiled, subject_basement) - comp_value
+    else:
+        out["walkout_adj"] = np.zeros(n)
+
+    # Age: newer comps are adjusted down
+    out["age_adj"] = _diff(subject.get("year_built"), _num(comps, "Year Built")) * compiled.age_per_year
+
+    for group, cols in ADJUSTMENT_GROUPS.items():
+        if group not in groups:
+            for col in cols:
+                out[col] = np.zeros(n)
+
+    total = np.zeros(n)
+    for col in ADJUSTMENT_COLUMNS:
+        total = total + out[col]
+    out["total_adjustments"] = total
+    out["adjusted_price"] = price + total
+    # One concat instead of a column insert per output keeps this cheap on wide MLS frames
+    added = pd.DataFrame(out, index=comps.index)
+    return pd.concat([comps.drop(columns=list(out), errors="ignore"), added], axis=1)
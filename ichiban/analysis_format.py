@@ -0,0 +1,193 @@
+"""Versioned Module 8 analysis format.
+
+An analysis is a plain dict of summary fields plus a column-oriented comp
+block: `{"length": n, "columns": {name: ndarray}}` holding only the columns
+the reports use. Serialization converts whole columns at once (no per-value
+type probing) and comes in two flavours:
+
+* JSON (`to_json`) – compact, human-readable, what Module 10 shows.
+* Binary (`to_binary`) – a small JSON header followed by the raw column
+  buffers, for fast reload by Modules 9–11.
+
+`loads` accepts either flavour as well as the legacy version-1
+module9_analysis.json (comps as a list of records).
+"""
+
+import json
+import math
+import struct
+
+import numpy as np
+import pandas as pd
+
+from ichiban.adjustments import ADJUSTMENT_COLUMNS
+from ichiban.instrument import traced
+
+FORMAT_VERSION = 2
+BINARY_MAGIC = b"ICHBAN"
+
+# Comp columns carried into the analysis (whichever exist in the adjusted frame)
+REPORT_COLUMNS = (
+    ["full_address", "ag_sf", "bedrooms", "bathrooms", "below_grade_finished", "below_grade_unfinished", "net_price"]
+    + ADJUSTMENT_COLUMNS
+    + ["total_adjustments", "adjusted_price", "days_in_mls", "distance_mi", "similarity", "remarks_snippet"]
+)
+TEXT_COLUMNS = {"full_address", "remarks_snippet"}
+
+
+def comp_block(comps, columns=REPORT_COLUMNS):
+    """Project a comp DataFrame into a typed column block."""
+    block = {}
+    for col in columns:
+        if col not in comps.columns:
+            continue
+        if col in TEXT_COLUMNS:
+            block[col] = comps[col].astype("object").fillna("").astype(str).to_numpy(dtype=object)
+        else:
+            block[col] = pd.to_numeric(comps[col], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    return {"length": int(len(comps)), "columns": block}
+
+
+@traced()
+def build_analysis(fields, comps):
+    """Analysis dict from the Module 8 summary fields and the adjusted comp frame."""
+    return {"format_version": FORMAT_VERSION, **fields, "comps": comp_block(comps)}
+
+
+def comps_frame(analysis):
+    """The comp block as a DataFrame (shares the column arrays)."""
+    comps = analysis.get("comps")
+    if isinstance(comps, pd.DataFrame):
+        return comps
+    if isinstance(comps, list):
+        return pd.DataFrame.from_records(comps)
+    if not comps:
+        return pd.DataFrame()
+    return pd.DataFrame(comps["columns"], copy=False)
+
+
+def comp_count(analysis):
+    comps = analysis.get("comps")
+    if isinstance(comps, dict):
+        return int(comps.get("length", 0))
+    return len(comps) if comps is not None else 0
+
+
+def _json_default(o):
+    # Only reached for the few non-JSON scalars in the summary fields (numpy numbers)
+    if isinstance(o, np.generic):
+        return o.item()
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def _finite(obj):
+    """Copy of the (small) summary fields with NaN / infinite floats as None, which JSON can carry."""
+    if isinstance(obj, dict):
+        return {k: _finite(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(v) for v in obj]
+    if isinstance(obj, np.ndarray):
+        return _finite(obj.tolist())
+    if isinstance(obj, np.generic):
+        obj = obj.item()
+    if isinstance(obj, float) and not math.isfinite(obj):
+        return None
+    return obj
+
+
+def _column_list(arr):
+    if arr.dtype.kind == "f" and not np.isfinite(arr).all():
+        # null in JSON; from_dict turns it back into NaN
+        return np.where(np.isfinite(arr), arr, None).tolist()
+    return arr.tolist()
+
+
+@traced()
+def to_json(analysis, indent=None):
+    """Compact, strict JSON text (NaN written as null); each comp column is converted with one `tolist()`."""
+    block = analysis.get("comps") or {"length": 0, "columns": {}}
+    payload = _finite({k: v for k, v in analysis.items() if k != "comps"})
+    payload["comps"] = {
+        "length": block["length"],
+        "columns": {name: _column_list(arr) for name, arr in block["columns"].items()},
+    }
+    separators = None if indent else (",", ":")
+    return json.dumps(payload, default=_json_default, indent=indent, separators=separators, allow_nan=False)
+
+
+@traced()
+def to_binary(analysis):
+    """Binary form: magic, header length, JSON header, then raw column buffers."""
+    block = analysis.get("comps") or {"length": 0, "columns": {}}
+    buffers, columns, offset = [], [], 0
+    for name, arr in block["columns"].items():
+        if arr.dtype == object:
+            encoded = [s.encode("utf-8") for s in arr.tolist()]
+            lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+            data = lengths.tobytes() + b"".join(encoded)
+            columns.append({"name": name, "kind": "text", "offset": offset, "nbytes": len(data)})
+        else:
+            data = np.ascontiguousarray(arr).tobytes()
+            columns.append({"name": name, "kind": "array", "dtype": arr.dtype.str, "offset": offset, "nbytes": len(data)})
+        buffers.append(data)
+        offset += len(data)
+
+    header = _finite({k: v for k, v in analysis.items() if k != "comps"})
+    header["comps"] = {"length": block["length"], "columns": columns}
+    head = json.dumps(header, default=_json_default, separators=(",", ":"), allow_nan=False).encode("utf-8")
+    return BINARY_MAGIC + struct.pack("<I", len(head)) + head + b"".join(buffers)
+
+
+def _from_binary(data):
+    start = len(BINARY_MAGIC)
+    try:
+        (head_len,) = struct.unpack_from("<I", data, start)
+    except struct.error as e:
+        raise ValueError(f"truncated analysis file: {e}") from e
+    if start + 4 + head_len > len(data):
+        raise ValueError("truncated analysis file: header is incomplete")
+    body = start + 4 + head_len
+    header = json.loads(data[start + 4:body])
+    n = header["comps"]["length"]
+    if any(body + meta["offset"] + meta["nbytes"] > len(data) for meta in header["comps"]["columns"]):
+        raise ValueError("truncated analysis file: column data is incomplete")
+    view = memoryview(data)[body:]
+    cols = {}
+    for meta in header["comps"]["columns"]:
+        chunk = view[meta["offset"]:meta["offset"] + meta["nbytes"]]
+        if meta["kind"] == "text":
+            lengths = np.frombuffer(chunk[:8 * n], dtype=np.int64)
+            ends = np.cumsum(lengths)
+            raw = bytes(chunk[8 * n:])
+            starts = ends - lengths
+            cols[meta["name"]] = np.array([raw[s:e].decode("utf-8") for s, e in zip(starts.tolist(), ends.tolist())], dtype=object)
+        else:
+            cols[meta["name"]] = np.frombuffer(chunk, dtype=np.dtype(meta["dtype"])).copy()
+    header["comps"] = {"length": n, "columns": cols}
+    return header
+
+
+def from_dict(payload):
+    """Analysis from parsed JSON (version 2, or legacy version 1 with comp records)."""
+    comps = payload.get("comps")
+    if isinstance(comps, list):
+        # Legacy module9_analysis.json: comps as a list of full MLS records
+        payload = {**payload, "format_version": FORMAT_VERSION, "comps": comp_block(pd.DataFrame.from_records(comps))}
+        return payload
+    block = comps or {"length": 0, "columns": {}}
+    cols = {}
+    for name, values in block["columns"].items():
+        # None (null) becomes NaN in float columns
+        cols[name] = np.array(values, dtype=object if name in TEXT_COLUMNS else "float64")
+    return {**payload, "comps": {"length": block["length"], "columns": cols}}
+
+
+def loads(data):
+    """Analysis from bytes/str in the binary or JSON format."""
+    if isinstance(data, (bytes, bytearray, memoryview)) and bytes(data[:len(BINARY_MAGIC)]) == BINARY_MAGIC:
+        return _from_binary(bytes(data))
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data).decode("utf-8")
+    return from_dict(json.loads(data))
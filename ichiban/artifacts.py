@@ -0,0 +1,246 @@
+"""In-memory, per-session artifact store shared by the pages of one app process.
+
+Artifacts (e.g. the Module 8 analysis) are stored as live Python objects under
+a per-session namespace and a content hash, so report pages read them without
+any JSON round-trip and concurrent sessions never see each other's results.
+Memory is bounded: the least recently used artifacts are evicted, optionally
+spilling to a local directory from which they are transparently reloaded.
+The spill directory is bounded too, and sessions idle past `NAMESPACE_TTL`
+are dropped along with their spilled files.
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import pickle
+import secrets
+import shutil
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Re-exported: pages import session_namespace from here
+from ichiban.session import NAMESPACE_KEY, session_namespace
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_SPILL_DIR = Path(os.environ.get("ICHIBAN_CACHE_DIR", Path(__file__).resolve().parent.parent / ".ichiban_cache")) / "artifacts"
+DEFAULT_SPILL_MAX_BYTES = 1024 * 1024 * 1024
+# A namespace untouched this long (seconds) belongs to a closed session; spilled
+# files older than this are unreachable (e.g. left by an earlier process)
+NAMESPACE_TTL = 6 * 3600
+
+
+def _feed(h, obj):
+    if isinstance(obj, pd.DataFrame):
+        h.update(repr(list(obj.columns)).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, pd.Series):
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, np.ndarray):
+        h.update(str(obj.dtype).encode())
+        h.update(np.ascontiguousarray(obj).tobytes() if obj.dtype != object else pd.util.hash_array(obj).tobytes())
+    elif isinstance(obj, dict):
+        h.update(b"{")
+        for k in sorted(obj, key=str):
+            h.update(str(k).encode())
+            _feed(h, obj[k])
+        h.update(b"}")
+    elif isinstance(obj, (list, tuple)):
+        h.update(b"[")
+        for v in obj:
+            _feed(h, v)
+        h.update(b"]")
+    else:
+        h.update(json.dumps(obj, default=str).encode())
+
+
+def content_key(obj):
+    """Content hash of nested dicts/lists/DataFrames/arrays without serializing them."""
+    h = hashlib.blake2b(digest_size=16)
+    _feed(h, obj)
+    return h.hexdigest()
+
+
+def estimate_size(obj):
+    """Approximate in-memory size in bytes."""
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return int(obj.memory_usage(deep=True).sum()) if isinstance(obj, pd.DataFrame) else int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(estimate_size(k) + estimate_size(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(estimate_size(v) for v in obj)
+    return sys.getsizeof(obj)
+
+
+class ArtifactStore:
+    """Bounded LRU of artifacts keyed by (namespace, content hash).
+
+    `put` also records the key under a name (e.g. "analysis") so pages can ask
+    for the latest artifact of that name in their session.
+
+    Spilled pickles are signed with a key that lives only in this process and
+    are only unpickled if the signature matches, so a file planted in (or left
+    over in) the shared cache directory is never deserialized.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, spill_dir=None, spill_max_bytes=DEFAULT_SPILL_MAX_BYTES,
+                 namespace_ttl=NAMESPACE_TTL):
+        self.max_bytes = max_bytes
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self.spill_max_bytes = spill_max_bytes
+        self.namespace_ttl = namespace_ttl
+        self._items = OrderedDict()
+        self._names = {}
+        self._touched = {}
+        self._bytes = 0
+        self._secret = secrets.token_bytes(32)
+        self._lock = threading.RLock()
+        if self.spill_dir is not None:
+            self._sweep_spill()
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def _spill_path(self, namespace, key):
+        return self.spill_dir / namespace / f"{key}.pkl"
+
+    def put(self, namespace, name, obj):
+        """Store `obj` and make it the latest `name` artifact; returns its key."""
+        key = content_key(obj)
+        size = estimate_size(obj)
+        with self._lock:
+            self._touched[namespace] = time.time()
+            self._prune_idle()
+            item = (namespace, key)
+            if item in self._items:
+                self._items.move_to_end(item)
+            else:
+                self._items[item] = (obj, size)
+                self._bytes += size
+            self._names[(namespace, name)] = key
+            self._evict(keep=item)
+        return key
+
+    def get(self, namespace, key):
+        """Artifact by key, reloading it from the spill directory if it was evicted."""
+        with self._lock:
+            self._touched[namespace] = time.time()
+            item = (namespace, key)
+            if item in self._items:
+                self._items.move_to_end(item)
+                return self._items[item][0]
+            if self.spill_dir is None:
+                return None
+            path = self._spill_path(namespace, key)
+            try:
+                blob = path.read_bytes()
+                signature, payload = blob[:32], blob[32:]
+                if not hmac.compare_digest(signature, self._sign(payload)):
+                    return None
+                obj = pickle.loads(payload)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                return None
+            size = estimate_size(obj)
+            self._items[item] = (obj, size)
+            self._bytes += size
+            self._evict(keep=item)
+            return obj
+
+    def latest_key(self, namespace, name):
+        with self._lock:
+            self._touched[namespace] = time.time()
+            return self._names.get((namespace, name))
+
+    def latest(self, namespace, name):
+        """Most recently published `name` artifact in `namespace`, or None."""
+        key = self.latest_key(namespace, name)
+        return None if key is None else self.get(namespace, key)
+
+    def _evict(self, keep=None):
+        spilled = False
+        while self._bytes > self.max_bytes and len(self._items) > 1:
+            item = next(iter(self._items))
+            if item == keep:
+                self._items.move_to_end(item)
+                item = next(iter(self._items))
+            obj, size = self._items.pop(item)
+            self._bytes -= size
+            if self.spill_dir is not None:
+                path = self._spill_path(*item)
+                payload = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+                try:
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    path.write_bytes(self._sign(payload) + payload)
+                except OSError:
+                    pass
+                spilled = True
+        # One directory sweep per eviction pass, not per spilled item
+        if spilled:
+            self._sweep_spill()
+
+    def _sign(self, payload):
+        return hmac.new(self._secret, payload, hashlib.sha256).digest()
+
+    def _prune_idle(self):
+        """Forget namespaces idle past the TTL: their artifacts, names and spilled files."""
+        cutoff = time.time() - self.namespace_ttl
+        idle = {ns for ns, touched in self._touched.items() if touched < cutoff}
+        if not idle:
+            return
+        for item in [i for i in self._items if i[0] in idle]:
+            self._bytes -= self._items.pop(item)[1]
+        for name in [n for n in self._names if n[0] in idle]:
+            del self._names[name]
+        for ns in idle:
+            del self._touched[ns]
+            if self.spill_dir is not None:
+                shutil.rmtree(self.spill_dir / ns, ignore_errors=True)
+
+    def _sweep_spill(self):
+        """Delete spilled files older than the TTL, then the oldest until under `spill_max_bytes`."""
+        entries = []
+        cutoff = time.time() - self.namespace_ttl
+        for p in self.spill_dir.glob("*/*.pkl"):
+            try:
+                st = p.stat()
+                if st.st_mtime < cutoff:
+                    p.unlink()
+                    continue
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        while entries and total > self.spill_max_bytes:
+            _, size, p = entries.pop(0)
+            try:
+                p.unlink()
+            except OSError:
+                pass
+            total -= size
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Process-wide store shared by every page and session."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            spill = os.environ.get("ICHIBAN_ARTIFACT_SPILL", "1") != "0"
+            _store = ArtifactStore(spill_dir=DEFAULT_SPILL_DIR if spill else None)
+        return _store
@@ -0,0 +1,187 @@
+"""Headless batch valuation: value every subject in a CSV against one comp store.
+
+Runs the same steps as the pages (Module 4 SF-band filter, Module 7 schema
+adjustments, Module 8 range / outlier statistics) for each subject in a
+process pool. The comp store is loaded once in the parent and handed to each
+worker at start-up (inherited copy-on-write where `fork` is available), so
+tasks only carry subject rows.
+
+    python -m ichiban.batch comps.csv [more.csv ...] --subjects subjects.csv --out results.csv
+"""
+
+import argparse
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ichiban.adjustments import apply_adjustments
+from ichiban.dedup import merge_exports
+from ichiban.geo import GridIndex
+from ichiban.ingest import load_comps
+from ichiban.schema import load_compiled
+from ichiban.search import CompIndex
+from ichiban.summary import prepare_comps, value_ranges
+
+# Subject CSV columns copied into the subject dict (the same keys Modules 2/6 save)
+SUBJECT_FIELDS = [
+    "address", "ag_sf", "bedrooms", "bathrooms", "below_grade_finished", "below_grade_unfinished",
+    "garage_spaces", "garage_tandem", "full_baths", "half_baths", "year_built", "view", "basement_type",
+    "latitude", "longitude",
+]
+
+RESULT_COLUMNS = [
+    "address", "comp_count", "filtered_count", "raw_low", "raw_high", "normalized_low", "normalized_high",
+    "normalized_median", "average_ppsf", "average_days_in_mls", "error",
+]
+
+
+def load_comp_store(paths):
+    """Cleaned comp frame from Parquet files or raw MLS CSV exports (merged + deduplicated)."""
+    frames = []
+    for path in map(Path, paths):
+        if path.suffix.lower() == ".parquet":
+            frames.append(pd.read_parquet(path))
+        else:
+            frames.append(load_comps(path.read_bytes())[0])
+    return frames[0] if len(frames) == 1 else merge_exports(frames)
+
+
+def load_subjects(path):
+    """Subject rows as dicts; blank cells become None so they skip their adjustment."""
+    df = pd.read_csv(path)
+    df.columns = [c.strip() for c in df.columns]
+    fields = [c for c in SUBJECT_FIELDS if c in df.columns]
+    df = df[fields].astype(object).where(df[fields].notna(), None)
+    return df.to_dict(orient="records")
+
+
+# Worker-side state, set once per process by _init_worker
+_state = {}
+
+
+def _init_worker(comps, options):
+    _state["index"] = CompIndex(comps)
+    _state["geo"] = GridIndex.from_frame(comps)
+    _state["compiled"] = load_compiled(options["rate_point"], options.get("schema"))
+    _state["options"] = options
+
+
+def select_comps(subject, index, compiled, geo=None, sf_low=0.85, sf_high=1.10, radius_mi=0.0):
+    """Module 4 filter + Module 7 adjustments for one subject.
+
+    Returns `(row, comps)`; `comps` is None when the subject cannot be valued
+    and `row["error"]` says why.
+    """
+    row = {"address": subject.get("address"), "comp_count": 0, "filtered_count": 0, "error": None}
+    ag_sf = subject.get("ag_sf")
+    if not ag_sf:
+        row["error"] = "missing ag_sf"
+        return row, None
+
+    positions = index.query(ag_sf=(float(ag_sf) * sf_low, float(ag_sf) * sf_high))
+    lat, lon = subject.get("latitude"), subject.get("longitude")
+    if radius_mi and geo is not None and lat is not None and lon is not None:
+        in_radius, _ = geo.radius(float(lat), float(lon), radius_mi)
+        positions = np.intersect1d(positions, in_radius)
+    row["comp_count"] = int(len(positions))
+    if not len(positions):
+        row["error"] = "no comps in range"
+        return row, None
+    return row, prepare_comps(apply_adjustments(index.frame(positions), subject, compiled))
+
+
+def value_subjects(subjects, index, compiled, geo=None, sf_low=0.85, sf_high=1.10, radius_mi=0.0):
+    """Result rows for `subjects`; the Module 8 statistics run once for the whole group."""
+    rows, frames = [], []
+    for subject in subjects:
+        try:
+            row, comps = select_comps(subject, index, compiled, geo, sf_low, sf_high, radius_mi)
+        except Exception as e:  # one bad subject must not sink the whole batch
+            row, comps = {"address": subject.get("address"), "error": f"{type(e).__name__}: {e}"}, None
+        rows.append(row)
+        frames.append(comps)
+
+    valued = [(row, comps) for row, comps in zip(rows, frames) if comps is not None]
+    if not valued:
+        return rows
+    prices = np.concatenate([c["adjusted_price"].to_numpy(dtype="float64") for _, c in valued])
+    ag_sf = np.concatenate([c["ag_sf"].to_numpy(dtype="float64") for _, c in valued])
+    days = np.concatenate([c["days_in_mls"].to_numpy(dtype="float64") for _, c in valued])
+    groups = np.repeat(np.arange(len(valued)), [len(c) for _, c in valued])
+    stats, _ = value_ranges(prices, ag_sf, groups, n_groups=len(valued))
+
+    has_days = ~np.isnan(days)
+    day_counts = np.bincount(groups[has_days], minlength=len(valued))
+    day_sums = np.bincount(groups[has_days], weights=days[has_days], minlength=len(valued))
+    for g, ((row, _), st) in enumerate(zip(valued, stats)):
+        row.update({
+            "filtered_count": st["outlier_notes"]["filtered_count"],
+            "raw_low": st["adjusted_price_range"][0],
+            "raw_high": st["adjusted_price_range"][1],
+            "normalized_low": st["normalized_range"][0],
+            "normalized_high": st["normalized_range"][1],
+            "normalized_median": st["normalized_median"],
+            "average_ppsf": st["average_ppsf"],
+            "average_days_in_mls": int(day_sums[g] / day_counts[g]) if day_counts[g] else "N/A",
+        })
+    return rows
+
+
+def _value_chunk(subjects):
+    opts = _state["options"]
+    return value_subjects(subjects, _state["index"], _state["compiled"], _state["geo"],
+                          opts["sf_low"], opts["sf_high"], opts["radius_mi"])
+
+
+def run_batch(comps, subjects, workers=None, chunk_size=50, **options):
+    """Value `subjects` (list of dicts) against `comps`; returns a results DataFrame."""
+    options = {"sf_low": 0.85, "sf_high": 1.10, "radius_mi": 0.0, "rate_point": "mid", "schema": None, **options}
+    chunks = [subjects[i:i + chunk_size] for i in range(0, len(subjects), chunk_size)]
+    if workers == 1 or len(chunks) <= 1:
+        _init_worker(comps, options)
+        rows = [r for chunk in chunks for r in _value_chunk(chunk)]
+    else:
+        methods = multiprocessing.get_all_start_methods()
+        ctx = multiprocessing.get_context("fork" if "fork" in methods else None)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                 initializer=_init_worker, initargs=(comps, options)) as pool:
+            rows = [r for chunk_rows in pool.map(_value_chunk, chunks) for r in chunk_rows]
+    return pd.DataFrame(rows, columns=RESULT_COLUMNS)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Value a CSV of subject properties against a comp store.")
+    parser.add_argument("comps", nargs="+", help="Comp store: MLS CSV export(s) or cleaned Parquet file(s)")
+    parser.add_argument("--subjects", required=True, help="CSV of subjects (address, ag_sf, bedrooms, ...)")
+    parser.add_argument("--out", default="batch_valuations.csv", help="Output CSV path")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=50, help="Subjects per task")
+    parser.add_argument("--sf-low", type=float, default=85.0, help="Lower SF bound, % of subject")
+    parser.add_argument("--sf-high", type=float, default=110.0, help="Upper SF bound, % of subject")
+    parser.add_argument("--radius", type=float, default=0.0, help="Radius in miles when subjects have lat/long (0 = any)")
+    parser.add_argument("--rate-point", choices=["low", "mid", "high"], default="mid", help="Point within schema ranges")
+    parser.add_argument("--schema", default=None, help="Adjustment schema path (default: bundled schema)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    comps = load_comp_store(args.comps)
+    subjects = load_subjects(args.subjects)
+    print(f"Loaded {len(comps):,} comps and {len(subjects):,} subjects in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    results = run_batch(comps, subjects, workers=args.workers, chunk_size=max(1, args.chunk_size),
+                        sf_low=args.sf_low / 100.0, sf_high=args.sf_high / 100.0, radius_mi=args.radius,
+                        rate_point=args.rate_point, schema=args.schema)
+    results.to_csv(args.out, index=False)
+    failed = int(results["error"].notna().sum())
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {len(results):,} rows to {args.out} ({failed} without a value) in {elapsed:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,317 @@
+"""Adjustment rates calibrated by hedonic regression on the comp store.
+
+Net price is regressed on above-grade SF, finished and unfinished basement SF
+(each with one rate per schema price tier, like the schema itself; a comp's
+tier comes from its predicted, not its actual, price), bedrooms, full / half
+baths and garage bays. The fit is kept as normal-equation
+accumulators (X'X, X'y, y'y), so appending an export only adds its new rows
+(rows already seen are skipped by address + close date) and the coefficients
+are re-solved from the small p x p system with `np.linalg.lstsq`, never refit
+from the raw rows. `calibrated_schema` writes the fitted rates, as
+[rate - 1 SE, rate + 1 SE] ranges, into a copy of market_adjustment_schema.json.
+
+    python -m ichiban.calibration comps.csv [more.csv ...] --out calibrated_schema.json [--state calibration.npz]
+"""
+
+import argparse
+import copy
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ichiban.adjustments import tier_index
+from ichiban.instrument import traced
+from ichiban.schema import compile_all, load_schema
+
+# Tiers with fewer comps than this keep the base schema's SF rates
+MIN_TIER_ROWS = 30
+ROW_KEY_COLUMNS = ["full_address", "Close Date"]
+
+
+class NormalEquations:
+    """Running X'X, X'y, y'y and row count for a linear least-squares fit."""
+
+    def __init__(self, names):
+        self.names = list(names)
+        p = len(self.names)
+        self.xtx = np.zeros((p, p))
+        self.xty = np.zeros(p)
+        self.yty = 0.0
+        self.y_sum = 0.0
+        self.n = 0
+
+    def add(self, X, y):
+        X = np.asarray(X, dtype="float64")
+        y = np.asarray(y, dtype="float64")
+        self.xtx += X.T @ X
+        self.xty += X.T @ y
+        self.yty += float(y @ y)
+        self.y_sum += float(y.sum())
+        self.n += len(y)
+
+    def merge(self, other):
+        if other.names != self.names:
+            raise ValueError("Cannot merge fits with different features")
+        self.xtx += other.xtx
+        self.xty += other.xty
+        self.yty += other.yty
+        self.y_sum += other.y_sum
+        self.n += other.n
+
+    def solve(self):
+        """{"coef", "se", "r2", "n"}; coefficients of unidentified columns come back as 0 with NaN SE."""
+        coef, _, rank, _ = np.linalg.lstsq(self.xtx, self.xty, rcond=None)
+        identified = np.diag(self.xtx) > 0
+        sse = max(self.yty - 2.0 * coef @ self.xty + coef @ self.xtx @ coef, 0.0)
+        dof = self.n - rank
+        sigma2 = sse / dof if dof > 0 else np.nan
+        with np.errstate(invalid="ignore"):
+            se = np.sqrt(np.clip(np.diag(np.linalg.pinv(self.xtx)), 0.0, None) * sigma2)
+        se[~identified] = np.nan
+        sst = self.yty - self.y_sum ** 2 / self.n if self.n else 0.0
+        return {
+            "coef": dict(zip(self.names, coef)),
+            "se": dict(zip(self.names, se)),
+            "r2": 1.0 - sse / sst if sst > 0 else np.nan,
+            "n": self.n,
+        }
+
+
+def _column(df, name, fill=None):
+    if name not in df.columns:
+        return np.full(len(df), np.nan if fill is None else fill)
+    values = pd.to_numeric(df[name], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    return values if fill is None else np.where(np.isnan(values), fill, values)
+
+
+def row_keys(df):
+    """64-bit identity per comp (address + close date) used to skip rows already accumulated."""
+    cols = [c for c in ROW_KEY_COLUMNS if c in df.columns]
+    if not cols:
+        return pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return pd.util.hash_pandas_object(df[cols].astype("string"), index=False).to_numpy()
+
+
+class Calibrator:
+    """Incremental hedonic fit with one SF / basement rate per schema price tier.
+
+    A comp's tier comes from its predicted price under a pooled first-pass fit
+    (frozen on the first batch), never from the net price being regressed:
+    tiering on the outcome truncates it and biases every slope toward zero.
+    """
+
+    FIXED = ["bedrooms", "full_baths", "half_baths", "garage_bays"]
+    POOLED = ["intercept", "ag", "bgf", "bgu"] + FIXED
+
+    def __init__(self, compiled):
+        self.compiled = compiled
+        self.tier_upper = np.asarray(compiled.tier_upper, dtype="float64")
+        self.tier_labels = list(compiled.tier_labels)
+        tiers = range(len(self.tier_labels))
+        names = ["intercept"] + [f"tier_{t}" for t in tiers][1:]
+        for part in ("ag", "bgf", "bgu"):
+            names += [f"{part}_{t}" for t in tiers]
+        self.equations = NormalEquations(names + self.FIXED)
+        self.tier_rows = np.zeros(len(self.tier_labels), dtype=np.int64)
+        self.seen = np.empty(0, dtype=np.uint64)
+        # Pooled coefficients (POOLED order) that predict the price used for tiering
+        self.tier_coef = None
+
+    def features(self, comps):
+        """(F, y, rows): POOLED features and net price of the usable rows; basement / garage / half baths blank = 0."""
+        price = _column(comps, "net_price")
+        ag_sf = _column(comps, "ag_sf")
+        beds = _column(comps, "bedrooms")
+        if "Bathrooms Full" in comps.columns:
+            full, half = _column(comps, "Bathrooms Full"), _column(comps, "Bathrooms Half", 0.0)
+        else:
+            full, half = _column(comps, "bathrooms"), np.zeros(len(comps))
+        usable = ~(np.isnan(price) | np.isnan(ag_sf) | np.isnan(beds) | np.isnan(full)) & (price > 0) & (ag_sf > 0)
+
+        rows = np.flatnonzero(usable)
+        F = np.column_stack([np.ones(len(comps)), ag_sf, _column(comps, "below_grade_finished", 0.0),
+                             _column(comps, "below_grade_unfinished", 0.0), beds, full, half,
+                             _column(comps, "Garage Spaces", 0.0)])[rows]
+        return F, price[rows], rows
+
+    def design(self, comps):
+        """(X, y, tier, rows) for the usable rows of a cleaned comp frame (needs `tier_coef`)."""
+        F, y, rows = self.features(comps)
+        tier = tier_index(self.compiled, F @ self.tier_coef)
+        n_tiers = len(self.tier_labels)
+        X = np.zeros((len(rows), len(self.equations.names)))
+        X[:, 0] = 1.0
+        if n_tiers > 1:
+            dummies = tier > 0
+            X[np.flatnonzero(dummies), tier[dummies]] = 1.0
+        at = np.arange(len(rows))
+        for i in range(3):
+            X[at, n_tiers + i * n_tiers + tier] = F[:, 1 + i]
+        X[:, -len(self.FIXED):] = F[:, -len(self.FIXED):]
+        return X, y, tier, rows
+
+    @traced()
+    def update(self, comps):
+        """Accumulate the usable rows of `comps` not seen before; returns `(added, skipped)`.
+
+        Only rows that enter the fit are remembered, so a later export that
+        fills in a row's missing fields still gets it added.
+        """
+        keys = row_keys(comps)
+        fresh = ~np.isin(keys, self.seen)
+        # Duplicates inside this frame count once too
+        _, first = np.unique(keys, return_index=True)
+        once = np.zeros(len(keys), dtype=bool)
+        once[first] = True
+        positions = np.flatnonzero(fresh & once)
+        new = comps.iloc[positions]
+        if self.tier_coef is None:
+            F, y, _ = self.features(new)
+            if not len(y):
+                return 0, len(comps)
+            pooled = NormalEquations(self.POOLED)
+            pooled.add(F, y)
+            self.tier_coef = np.array([pooled.solve()["coef"][name] for name in self.POOLED])
+        X, y, tier, rows = self.design(new)
+        if len(y):
+            self.equations.add(X, y)
+            self.tier_rows += np.bincount(tier, minlength=len(self.tier_labels))
+        self.seen = np.union1d(self.seen, keys[positions[rows]])
+        return len(y), len(comps) - len(y)
+
+    @property
+    def n(self):
+        return self.equations.n
+
+    def fit(self):
+        """Fitted rates per tier and for the fixed features, as a DataFrame plus fit stats."""
+        result = self.equations.solve()
+        coef, se = result["coef"], result["se"]
+        rows = []
+        for t, label in enumerate(self.tier_labels):
+            for part, field in (("ag", "aboveGrade"), ("bgf", "basementFinished"), ("bgu", "basement")):
+                name = f"{part}_{t}"
+                rows.append({"feature": field, "tier": label, "rate": coef[name], "se": se[name],
+                             "rows": int(self.tier_rows[t]), "enough_rows": bool(self.tier_rows[t] >= MIN_TIER_ROWS)})
+        for name in self.FIXED:
+            rows.append({"feature": name, "tier": None, "rate": coef[name], "se": se[name],
+                         "rows": result["n"], "enough_rows": result["n"] >= MIN_TIER_ROWS})
+        return pd.DataFrame(rows), {"r2": result["r2"], "n": result["n"]}
+
+    def save(self, path):
+        eq = self.equations
+        np.savez_compressed(path, names=np.array(eq.names), xtx=eq.xtx, xty=eq.xty,
+                            stats=np.array([eq.yty, eq.y_sum, eq.n]), tier_upper=self.tier_upper,
+                            tier_labels=np.array(self.tier_labels), tier_rows=self.tier_rows, seen=self.seen,
+                            tier_coef=self.tier_coef if self.tier_coef is not None else np.empty(0))
+
+    @classmethod
+    def load(cls, path, compiled):
+        """Restore saved accumulators; raises ValueError if the price tiers or features changed since."""
+        data = np.load(path)
+        if not np.array_equal(data["tier_upper"], np.asarray(compiled.tier_upper, dtype="float64")):
+            raise ValueError(f"{path}: saved with different price tiers; recalibrate from scratch")
+        if "tier_coef" not in data.files:
+            raise ValueError(f"{path}: saved by an older version that tiered comps on net price; recalibrate from scratch")
+        calibrator = cls(compiled)
+        eq = calibrator.equations
+        if list(data["names"]) != eq.names:
+            raise ValueError(f"{path}: saved with different regression features; recalibrate from scratch")
+        eq.xtx, eq.xty = data["xtx"], data["xty"]
+        eq.yty, eq.y_sum, n = data["stats"]
+        eq.n = int(n)
+        calibrator.tier_rows = data["tier_rows"]
+        calibrator.seen = data["seen"]
+        if len(data["tier_coef"]):
+            calibrator.tier_coef = data["tier_coef"]
+        return calibrator
+
+
+def _rate_range(rate, se, digits):
+    """[rate - 1 SE, rate + 1 SE], floored at 0 (a negative rate would invert the adjustment)."""
+    se = 0.0 if not np.isfinite(se) else float(se)
+    low, high = max(float(rate) - se, 0.0), max(float(rate) + se, 0.0)
+    return [round(low, digits), round(high, digits)]
+
+
+def calibrated_schema(base, rates, stats):
+    """Copy of schema dict `base` with fitted SF, basement, bath and garage rates.
+
+    Rates from thin tiers (or fitted as negative) are left at the base values.
+    The result passes `schema.validate`; a "calibration" section records the fit.
+    """
+    schema = copy.deepcopy(base)
+    kept = []
+    by_tier = {(r.feature, r.tier): r for r in rates.itertuples()}
+    for tier in schema["squareFootageAdjustments"]:
+        for field in ("aboveGrade", "basementFinished", "basement"):
+            r = by_tier.get((field, tier["priceRange"]))
+            if r is not None and r.enough_rows and r.rate > 0:
+                tier[field] = _rate_range(r.rate, r.se, 2)
+            else:
+                kept.append(f"{tier['priceRange']} {field}")
+
+    fixed = {r.feature: r for r in rates.itertuples() if r.feature in Calibrator.FIXED}
+    for feature, section, field in (("full_baths", "bathroomsAdjustment", "fullBathroom"),
+                                    ("half_baths", "bathroomsAdjustment", "halfBathroom"),
+                                    ("garage_bays", "garageAdjustment", "perBayRange")):
+        r = fixed[feature]
+        if r.enough_rows and r.rate > 0:
+            schema[section][field] = _rate_range(r.rate, r.se, -2)
+        else:
+            kept.append(f"{section}.{field}")
+
+    schema["calibration"] = {
+        "method": "OLS hedonic regression of net price; ranges are rate ± 1 standard error",
+        "comps": int(stats["n"]),
+        "r2": round(float(stats["r2"]), 4) if np.isfinite(stats["r2"]) else None,
+        "bedrooms_rate": round(float(fixed["bedrooms"].rate), 2) if np.isfinite(fixed["bedrooms"].rate) else None,
+        "kept_from_base": kept,
+        "fitted_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    compile_all(schema)
+    return schema
+
+
+def write_schema(schema, path):
+    """Write a schema profile as indented JSON (atomic replace)."""
+    path = Path(path)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(schema, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    tmp.replace(path)
+
+
+def main(argv=None):
+    from ichiban.batch import load_comp_store
+
+    parser = argparse.ArgumentParser(description="Fit adjustment rates from comps and write a schema profile.")
+    parser.add_argument("comps", nargs="+", help="MLS CSV export(s) or cleaned Parquet file(s)")
+    parser.add_argument("--out", default="calibrated_schema.json", help="Schema profile to write")
+    parser.add_argument("--schema", default=None, help="Base schema (default: bundled schema)")
+    parser.add_argument("--state", default=None, help="Accumulator file (.npz) to resume from and update")
+    args = parser.parse_args(argv)
+
+    base = load_schema(args.schema)
+    compiled = base.compiled["mid"]
+    state = Path(args.state) if args.state else None
+    calibrator = Calibrator.load(state, compiled) if state and state.exists() else Calibrator(compiled)
+    before = calibrator.n
+    added, skipped = calibrator.update(load_comp_store(args.comps))
+    print(f"Added {added:,} comps ({skipped:,} already seen or unusable); fit now uses {calibrator.n:,} "
+          f"(was {before:,})", file=sys.stderr)
+    if state:
+        calibrator.save(state)
+
+    rates, stats = calibrator.fit()
+    write_schema(calibrated_schema(base.raw, rates, stats), args.out)
+    print(rates.to_string(index=False), file=sys.stderr)
+    print(f"R² {stats['r2']:.3f}; wrote {args.out}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""Memory-compact comp frames for session state.
+
+An MLS export carries 150+ columns; the app uses a few dozen. `compact_comps`
+keeps only those, stores numbers in the narrowest dtype that holds them
+exactly, turns repetitive strings into categoricals and moves the long public
+remarks out of the frame into a `RemarksStore` shared by every session that
+uploaded the same export. `memory_report` shows what one session holds,
+counting buffers shared between frames (copy-on-write views) only once.
+"""
+
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from ichiban.geo import LAT_COLUMNS, LON_COLUMNS
+from ichiban.ingest import ADDRESS_PARTS, CATEGORY_COLUMNS, DATE_COLUMNS, RENAME_MAP
+from ichiban.instrument import traced
+from ichiban.search import STATUS_COLUMNS
+from ichiban.summary import REMARKS_COLUMNS
+
+# Columns read anywhere downstream of Module 1 (filters, adjustments, summary, reports)
+PIPELINE_COLUMNS = (
+    ["full_address"] + list(RENAME_MAP.values()) + ADDRESS_PARTS + DATE_COLUMNS
+    + ["Bathrooms Full", "Bathrooms Half", "Garage Spaces", "Garage Type", "Parking Features", "Year Built",
+       "Days In MLS", "Close Price", "List Price", "View", "Basement", "Listing Id", "MLS Number"]
+    + CATEGORY_COLUMNS + STATUS_COLUMNS + LAT_COLUMNS + LON_COLUMNS
+)
+# Coordinates keep full precision; float32 would move comps by up to a metre
+FULL_PRECISION = set(LAT_COLUMNS) | set(LON_COLUMNS)
+# Strings repeated at least this often on average become categoricals
+CATEGORY_MIN_REPEAT = 2.0
+
+
+class RemarksStore:
+    """Public remarks for one comp set, looked up by the comp frame's row labels."""
+
+    def __init__(self, key, remarks):
+        self.key = key
+        self.remarks = remarks.astype("string")
+
+    def __repr__(self):
+        # Stable and cheap: pipeline fingerprints hash this instead of the text
+        return f"RemarksStore({self.key!r}, {len(self.remarks)} rows)"
+
+    def __len__(self):
+        return len(self.remarks)
+
+    @property
+    def nbytes(self):
+        return int(self.remarks.memory_usage(deep=True))
+
+    def lookup(self, index):
+        """Remarks aligned to `index` ("" where a row has none)."""
+        return self.remarks.reindex(index).fillna("")
+
+
+_stores = weakref.WeakValueDictionary()
+_stores_lock = threading.Lock()
+
+
+def share_remarks(key, remarks):
+    """The RemarksStore for `key`, reusing one another session already holds."""
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = RemarksStore(key, remarks)
+            _stores[key] = store
+        return store
+
+
+def _downcast(s):
+    if s.name in FULL_PRECISION or not pd.api.types.is_float_dtype(s) or s.dtype == "float32":
+        return s
+    small = s.astype("float32")
+    # Only when every value survives the round trip (prices, SF and counts do)
+    if np.array_equal(small.to_numpy(dtype="float64"), s.to_numpy(dtype="float64"), equal_nan=True):
+        return small
+    return s
+
+
+def _categorize(s):
+    if isinstance(s.dtype, pd.CategoricalDtype) or not (pd.api.types.is_object_dtype(s) or pd.api.types.is_string_dtype(s)):
+        return s
+    n = s.notna().sum()
+    if n and n / max(s.nunique(), 1) >= CATEGORY_MIN_REPEAT:
+        return s.astype("category")
+    return s
+
+
+@traced()
+def compact_comps(df, key, columns=PIPELINE_COLUMNS):
+    """Return `(compact_df, remarks_store)` for a cleaned comp frame.
+
+    `key` identifies the comp set (e.g. the upload fingerprint) so identical
+    uploads share one remarks store. Row labels are kept, so filtered subsets
+    can still look their remarks up.
+    """
+    remarks_col = next((c for c in REMARKS_COLUMNS if c in df.columns), None)
+    remarks = df[remarks_col] if remarks_col else pd.Series("", index=df.index)
+    store = share_remarks(key, remarks)
+
+    keep = [c for c in dict.fromkeys(columns) if c in df.columns]
+    out = pd.DataFrame({c: _categorize(_downcast(df[c])) for c in keep}, index=df.index)
+    out.attrs.update(df.attrs)
+    return out, store
+
+
+def _buffers(df):
+    """(buffer id, bytes) per column; numpy-backed columns are identified by their data pointer."""
+    out = []
+    for name in df.columns:
+        s = df[name]
+        arr = s.array
+        if isinstance(arr, pd.arrays.NumpyExtensionArray) or isinstance(s.dtype, np.dtype):
+            data = s.to_numpy(copy=False)
+            out.append((("np", data.__array_interface__["data"][0], data.nbytes), data.nbytes))
+        else:
+            out.append(((name, id(arr)), int(s.memory_usage(deep=True, index=False))))
+    return out
+
+
+def _walk(name, value, depth=0):
+    """(name, object) for frames, arrays and remarks stores, looking inside dicts (e.g. the stage memo)."""
+    if isinstance(value, (pd.DataFrame, np.ndarray, RemarksStore)):
+        yield name, value
+    elif isinstance(value, dict) and depth < 3:
+        for k, v in value.items():
+            yield from _walk(f"{name}.{k}" if k != "value" else name, v, depth + 1)
+
+
+def memory_report(state):
+    """One row per frame / array / remarks store in session state, with bytes and unique bytes.
+
+    `unique_bytes` leaves out column buffers already counted for an earlier
+    entry, so frames that share data (views, published stage outputs) are not
+    double counted; its total is what the session really holds.
+    """
+    seen = set()
+    rows = []
+    for key in sorted(state.keys(), key=str):
+        for name, value in _walk(str(key), state[key]):
+            if isinstance(value, pd.DataFrame):
+                parts = _buffers(value)
+                kind, n_rows, n_cols = "DataFrame", len(value), value.shape[1]
+            elif isinstance(value, RemarksStore):
+                parts = [(("remarks", value.key), value.nbytes)]
+                kind, n_rows, n_cols = "RemarksStore (shared)", len(value), 1
+            else:
+                parts = [(("np", value.__array_interface__["data"][0], value.nbytes), value.nbytes)]
+                kind, n_rows, n_cols = "ndarray", len(value), 1
+            total = unique = 0
+            for buf, size in parts:
+                total += size
+                if buf not in seen:
+                    seen.add(buf)
+                    unique += size
+            rows.append({"key": name, "kind": kind, "rows": n_rows, "columns": n_cols,
+                         "bytes": total, "unique_bytes": unique})
+    return pd.DataFrame(rows, columns=["key", "kind", "rows", "columns", "bytes", "unique_bytes"])
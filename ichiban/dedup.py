@@ -0,0 +1,157 @@
+"""Merge overlapping MLS exports and drop duplicate comps.
+
+Rows are bucketed by a blocking key (street number + 5-digit zip) and only rows
+sharing a bucket are compared, so the work stays close to linear even when the
+merged frame has hundreds of thousands of rows. Within a bucket, two rows are
+the same comp only if number, directions and street name match exactly; the
+suffix or unit may be missing on one side but never differ ("123 Maple St" and
+"123 Maple Ct" are different houses). Rows without a usable address or close
+date are never treated as duplicates of anything.
+"""
+
+import numpy as np
+import pandas as pd
+
+from ichiban.instrument import traced
+
+# Canonical forms for common street suffix / direction spellings
+ADDRESS_TOKENS = {
+    "street": "st", "str": "st",
+    "avenue": "ave", "av": "ave",
+    "road": "rd",
+    "drive": "dr",
+    "lane": "ln",
+    "court": "ct",
+    "circle": "cir",
+    "boulevard": "blvd",
+    "place": "pl",
+    "parkway": "pkwy",
+    "terrace": "ter",
+    "trail": "trl",
+    "way": "wy",
+    "north": "n", "south": "s", "east": "e", "west": "w",
+    "northeast": "ne", "northwest": "nw", "southeast": "se", "southwest": "sw",
+}
+
+STREET_SUFFIXES = {"st", "ave", "rd", "dr", "ln", "ct", "cir", "blvd", "pl", "pkwy", "ter", "trl", "wy", "way",
+                   "hwy", "loop", "sq", "pt", "xing", "aly", "row", "run", "walk"}
+DIRECTIONS = {"n", "s", "e", "w", "ne", "nw", "se", "sw"}
+UNIT_WORDS = {"unit", "apt", "apartment", "ste", "suite", "bldg", "no"}
+
+
+def normalize_address(series):
+    """Lowercase, strip punctuation and canonicalize suffix/direction tokens."""
+    s = series.astype(str).str.lower().str.replace(r"[^a-z0-9 ]", " ", regex=True)
+    get = ADDRESS_TOKENS.get
+    values = [" ".join([get(t, t) for t in v.split()]) for v in s.to_numpy()]
+    return pd.Series(values, index=series.index, dtype=object)
+
+
+def _column(df, name, default=""):
+    if name in df.columns:
+        return df[name].astype("object").fillna(default).astype(str)
+    return pd.Series(default, index=df.index)
+
+
+def blocking_key(df, address):
+    """Street number + zip5 bucket for each row."""
+    if "Street Number" in df.columns:
+        number = _column(df, "Street Number").str.strip()
+    else:
+        # Fall back to the first token of the normalized address
+        number = address.str.split(" ", n=1).str[0].fillna("")
+    zip5 = _column(df, "Postal Code").str.strip().str.slice(0, 5)
+    return number + "|" + zip5
+
+
+# Placeholder `parse_comps` writes when the export lacks the street columns
+UNKNOWN_ADDRESS = "unknown"
+
+
+def address_parts(address):
+    """(core, suffix, unit) of a normalized address; core is number + directions + street name."""
+    tokens = address.split()
+    at = max((i for i, t in enumerate(tokens) if t in STREET_SUFFIXES and i > 0), default=None)
+    if at is None:
+        # No suffix: a unit word starts the unit
+        at_unit = next((i for i, t in enumerate(tokens) if t in UNIT_WORDS), len(tokens))
+        return " ".join(tokens[:at_unit]), "", " ".join(t for t in tokens[at_unit:] if t not in UNIT_WORDS)
+    rest = tokens[at + 1:]
+    # Post-directionals ("Main St N") belong to the street, anything else is the unit
+    post = [t for t in rest if t in DIRECTIONS]
+    unit = [t for t in rest if t not in DIRECTIONS and t not in UNIT_WORDS]
+    return " ".join(tokens[:at] + post), tokens[at], " ".join(unit)
+
+
+def _compatible(a, b):
+    return not a or not b or a == b
+
+
+def _same_address(a, b):
+    if a == b:
+        return True
+    core_a, suffix_a, unit_a = address_parts(a)
+    core_b, suffix_b, unit_b = address_parts(b)
+    return core_a == core_b and _compatible(suffix_a, suffix_b) and _compatible(unit_a, unit_b)
+
+
+def find_duplicates(df):
+    """Boolean mask marking every row that duplicates an earlier row."""
+    address = normalize_address(df["full_address"]) if "full_address" in df.columns else pd.Series("", index=df.index)
+    if "Close Date" in df.columns:
+        close = pd.to_datetime(df["Close Date"], errors="coerce").dt.strftime("%Y-%m-%d").fillna("")
+    else:
+        close = pd.Series("", index=df.index)
+
+    # Rows missing either half of the identity can't be matched safely
+    known = ((address != "") & (address != UNKNOWN_ADDRESS) & (close != "")).to_numpy()
+
+    # Exact matches are resolved by hashing; only the remainder goes through blocking
+    exact = pd.DataFrame({"a": address.to_numpy(), "c": close.to_numpy()}).duplicated().to_numpy() & known
+
+    block = blocking_key(df, address)
+    # An empty street number or zip would pool unrelated rows into one quadratic block
+    blockable = known & ~block.str.startswith("|").to_numpy() & ~block.str.endswith("|").to_numpy()
+    codes, counts = np.unique(block.to_numpy(), return_inverse=True, return_counts=True)[1:]
+    shared = counts[codes] > 1
+    dup = exact.copy()
+
+    candidates = np.flatnonzero(shared & blockable & ~exact)
+    if len(candidates):
+        addr = address.to_numpy()
+        dates = close.to_numpy()
+        order = candidates[np.argsort(codes[candidates], kind="stable")]
+        bounds = np.flatnonzero(np.diff(codes[order])) + 1
+        for rows in np.split(order, bounds):
+            kept = []
+            for i in rows:
+                if any(dates[i] == dates[j] and _same_address(addr[i], addr[j]) for j in kept):
+                    dup[i] = True
+                else:
+                    kept.append(i)
+    return dup
+
+
+@traced()
+def merge_exports(frames):
+    """Concatenate cleaned exports and drop duplicate comps, keeping the first seen.
+
+    Rows from an export that lacks the street columns (`address_ok` False)
+    are always kept, since they carry no address to compare; the other
+    exports are still deduplicated against each other.
+    """
+    frames = [f for f in frames if f is not None and len(f)]
+    if not frames:
+        return pd.DataFrame()
+    merged = pd.concat(frames, ignore_index=True)
+    address_ok = all(f.attrs.get("address_ok", True) for f in frames)
+    comparable = np.repeat([f.attrs.get("address_ok", True) for f in frames], [len(f) for f in frames])
+    dup = np.zeros(len(merged), dtype=bool)
+    if comparable.any():
+        dup[comparable] = find_duplicates(merged.loc[comparable])
+    merged = merged.loc[~dup]
+    merged = merged.sort_values(by="net_price", kind="stable")
+    merged.attrs["removed"] = int(sum(f.attrs.get("removed", 0) for f in frames))
+    merged.attrs["address_ok"] = address_ok
+    merged.attrs["duplicates_removed"] = int(dup.sum())
+    return merged
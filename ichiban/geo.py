@@ -0,0 +1,101 @@
+"""Spatial index over comp Latitude/Longitude.
+
+Comps are bucketed into a fixed lat/long grid; radius queries only look at
+the occupied cells that can intersect the search circle and then compute
+exact haversine distances for those candidates in one vectorized pass.
+"""
+
+import numpy as np
+
+EARTH_RADIUS_MI = 3958.8
+MILES_PER_DEG_LAT = 69.0
+LAT_COLUMNS = ["Latitude", "latitude", "Lat"]
+LON_COLUMNS = ["Longitude", "longitude", "Lon", "Long"]
+
+
+def haversine_miles(lat, lon, lats, lons):
+    """Great-circle distance in miles from one point to arrays of points."""
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2.0) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_MI * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def coordinate_columns(df):
+    """Names of the latitude/longitude columns in `df`, or (None, None)."""
+    lat = next((c for c in LAT_COLUMNS if c in df.columns), None)
+    lon = next((c for c in LON_COLUMNS if c in df.columns), None)
+    return (lat, lon) if lat and lon else (None, None)
+
+
+class GridIndex:
+    """Uniform lat/long grid; `cell_deg` of 0.01 is roughly 0.7 miles."""
+
+    def __init__(self, lats, lons, cell_deg=0.01):
+        self.lats = np.asarray(lats, dtype="float64")
+        self.lons = np.asarray(lons, dtype="float64")
+        self.cell_deg = cell_deg
+        valid = np.isfinite(self.lats) & np.isfinite(self.lons) & ~((self.lats == 0) & (self.lons == 0))
+        self.valid = valid
+        pos = np.flatnonzero(valid)
+        keys = self._keys(self._cell(self.lats[pos]), self._cell(self.lons[pos]))
+        order = np.argsort(keys, kind="stable")
+        self.positions = pos[order]
+        sorted_keys = keys[order]
+        self.cell_keys, self.cell_starts = np.unique(sorted_keys, return_index=True)
+        self.cell_ends = np.append(self.cell_starts[1:], len(sorted_keys))
+        self.cell_y, self.cell_x = self._unkey(self.cell_keys)
+
+    @classmethod
+    def from_frame(cls, df, **kwargs):
+        lat, lon = coordinate_columns(df)
+        if lat is None:
+            return None
+        return cls(df[lat].to_numpy(dtype="float64", na_value=np.nan), df[lon].to_numpy(dtype="float64", na_value=np.nan), **kwargs)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _cell(self, deg):
+        return np.floor(np.asarray(deg) / self.cell_deg).astype(np.int64)
+
+    @staticmethod
+    def _keys(cy, cx):
+        return (cy + (1 << 20)) * (1 << 24) + (cx + (1 << 22))
+
+    @staticmethod
+    def _unkey(keys):
+        return keys // (1 << 24) - (1 << 20), keys % (1 << 24) - (1 << 22)
+
+    def _candidates(self, lat, lon, miles):
+        dlat = miles / MILES_PER_DEG_LAT
+        dlon = miles / max(MILES_PER_DEG_LAT * np.cos(np.radians(lat)), 1e-6)
+        y0, y1 = int(self._cell(lat - dlat)), int(self._cell(lat + dlat))
+        x0, x1 = int(self._cell(lon - dlon)), int(self._cell(lon + dlon))
+        if (y1 - y0 + 1) * (x1 - x0 + 1) > len(self.cell_keys):
+            # Window wider than the data: scan the occupied cells instead of enumerating the window
+            hit = np.flatnonzero((self.cell_y >= y0) & (self.cell_y <= y1) & (self.cell_x >= x0) & (self.cell_x <= x1))
+        else:
+            wanted = self._keys(np.arange(y0, y1 + 1)[:, None], np.arange(x0, x1 + 1)[None, :]).ravel()
+            hit = np.searchsorted(self.cell_keys, wanted)
+            hit = hit[hit < len(self.cell_keys)]
+            hit = hit[np.isin(self.cell_keys[hit], wanted)]
+        if not len(hit):
+            return np.empty(0, dtype=np.intp)
+        return np.concatenate([self.positions[s:e] for s, e in zip(self.cell_starts[hit], self.cell_ends[hit])])
+
+    def distances(self, lat, lon, positions=None):
+        """Miles from (lat, lon) to the given rows (all rows by default); NaN where unknown."""
+        if positions is None:
+            positions = np.arange(len(self.lats))
+        d = haversine_miles(lat, lon, self.lats[positions], self.lons[positions])
+        return np.where(self.valid[positions], d, np.nan)
+
+    def radius(self, lat, lon, miles):
+        """Row positions within `miles`, nearest first, and their distances."""
+        cand = self._candidates(lat, lon, miles)
+        d = haversine_miles(lat, lon, self.lats[cand], self.lons[cand])
+        keep = d <= miles
+        cand, d = cand[keep], d[keep]
+        order = np.argsort(d, kind="stable")
+        return cand[order], d[order]
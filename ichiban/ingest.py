@@ -0,0 +1,205 @@
+"""Comp CSV ingest: parse an MLS export once and cache the cleaned frame as Parquet.
+
+The cache is keyed by a fingerprint of the uploaded bytes, so a Streamlit rerun
+(or a later session uploading the same export) skips parsing entirely.
+"""
+
+import hashlib
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from ichiban.instrument import traced
+from ichiban.lazy import lazy_import
+
+# Deferred: Module 2 only needs `fingerprint` from here
+pd = lazy_import("pandas")
+
+# Rename commonly used fields for internal consistency
+RENAME_MAP = {
+    "Above Grade Finished Area": "ag_sf",
+    "Net Close Price": "net_price",
+    "Concessions Amount": "concessions",
+    "Bedrooms Total": "bedrooms",
+    "Bathrooms Total Integer": "bathrooms",
+    "Below Grade Finished Area": "below_grade_finished",
+    "Below Grade Unfinished Area": "below_grade_unfinished",
+}
+
+# Raw MLS columns parsed as numbers (currency / thousands separators are stripped)
+NUMERIC_COLUMNS = [
+    "Above Grade Finished Area",
+    "Net Close Price",
+    "Concessions Amount",
+    "Bedrooms Total",
+    "Bathrooms Total Integer",
+    "Below Grade Finished Area",
+    "Below Grade Unfinished Area",
+    "Bathrooms Full",
+    "Bathrooms Half",
+    "Garage Spaces",
+    "Year Built",
+    "Days In MLS",
+    "Close Price",
+    "List Price",
+    "Latitude",
+    "Longitude",
+]
+
+# Raw MLS date columns
+DATE_COLUMNS = ["Close Date", "Listing Contract Date"]
+
+# Low-cardinality text columns stored as categoricals
+CATEGORY_COLUMNS = ["City", "Subdivision Name", "Mls Status", "Standard Status", "Postal Code"]
+
+REQUIRED_FIELDS = ["ag_sf", "net_price", "bedrooms", "bathrooms"]
+ADDRESS_PARTS = ["Street Number", "Street Name", "Street Suffix"]
+
+DEFAULT_CACHE_DIR = Path(os.environ.get("ICHIBAN_CACHE_DIR", Path(__file__).resolve().parent.parent / ".ichiban_cache")) / "comps"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_MAX_ENTRIES = 32
+
+# Bump when parse_comps output changes so stale cache entries are not served
+PARSE_VERSION = 4
+
+
+def fingerprint(data):
+    """Content hash of the uploaded bytes, used as the cache key."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _to_number(s):
+    if pd.api.types.is_numeric_dtype(s):
+        return s.astype("float64")
+    cleaned = s.astype(str).str.replace(r"[$,\s]", "", regex=True)
+    return pd.to_numeric(cleaned, errors="coerce").astype("float64")
+
+
+def build_full_address(df):
+    """Combine the street components into a single `full_address` column."""
+    prefix = df["Street Dir Prefix"] if "Street Dir Prefix" in df.columns else pd.Series("", index=df.index)
+    return (
+        df["Street Number"].astype(str).str.strip()
+        + " "
+        + prefix.astype("object").fillna("").astype(str).str.strip()
+        + " "
+        + df["Street Name"].astype(str).str.strip()
+        + " "
+        + df["Street Suffix"].astype(str).str.strip()
+    ).str.replace("  ", " ").str.strip()
+
+
+@traced()
+def parse_comps(data):
+    """Parse raw CSV bytes into the cleaned comp frame used by the rest of the app.
+
+    Cleaning notes (rows removed, missing address parts) are kept in `df.attrs`
+    so they survive the Parquet round-trip.
+    """
+    dtypes = {col: "category" for col in CATEGORY_COLUMNS}
+    df = pd.read_csv(io.BytesIO(data), dtype=dtypes, low_memory=False)
+
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns:
+            df[col] = _to_number(df[col])
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors="coerce", format="mixed")
+    df.rename(columns=RENAME_MAP, inplace=True)
+
+    address_ok = all(col in df.columns for col in ADDRESS_PARTS)
+    df["full_address"] = build_full_address(df) if address_ok else "Unknown"
+
+    initial_count = len(df)
+    df.dropna(subset=[c for c in REQUIRED_FIELDS if c in df.columns], inplace=True)
+    df.sort_values(by="net_price", inplace=True, kind="stable")
+
+    df.attrs["removed"] = int(initial_count - len(df))
+    df.attrs["address_ok"] = bool(address_ok)
+    return df
+
+
+class ParquetCache:
+    """Directory of cleaned comp frames, one Parquet file per upload hash.
+
+    Reads touch the file's mtime so eviction drops the least recently used
+    entries once the directory exceeds `max_bytes` or `max_entries`.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, max_entries=DEFAULT_MAX_ENTRIES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+
+    def path(self, key):
+        return self.directory / f"{key}-v{PARSE_VERSION}.parquet"
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            df = pd.read_parquet(path)
+            os.utime(path)
+        except (OSError, ImportError, ValueError):
+            return None
+        return df
+
+    def put(self, key, df):
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp = self.path(key).with_suffix(".tmp")
+            df.to_parquet(tmp)
+            os.replace(tmp, self.path(key))
+        except (OSError, ImportError, ValueError):
+            # Parquet support (pyarrow) is optional; without it we just don't persist.
+            return False
+        self.evict()
+        return True
+
+    def evict(self):
+        entries = []
+        for p in self.directory.glob("*.parquet"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        while entries and (total > self.max_bytes or len(entries) > self.max_entries):
+            _, size, p = entries.pop(0)
+            try:
+                p.unlink()
+            except OSError:
+                pass
+            total -= size
+
+
+_default_cache = None
+
+
+def default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ParquetCache()
+    return _default_cache
+
+
+def load_comps(data, key=None, cache=None):
+    """Return `(df, from_cache)` for the uploaded CSV bytes."""
+    cache = cache or default_cache()
+    key = key or fingerprint(data)
+    df = cache.get(key)
+    if df is not None:
+        return df, True
+    df = parse_comps(data)
+    cache.put(key, df)
+    return df, False
+
+
+def load_many(payloads, cache=None, max_workers=4):
+    """Parse several exports in parallel; returns `[(df, from_cache), ...]` in input order."""
+    if len(payloads) <= 1:
+        return [load_comps(data, cache=cache) for data in payloads]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(payloads))) as pool:
+        return list(pool.map(lambda data: load_comps(data, cache=cache), payloads))
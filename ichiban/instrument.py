@@ -0,0 +1,267 @@
+"""Per-session timing / memory traces of the app's steps.
+
+`Trace.span(name)` is a context manager recording one step's wall time, row
+count and (when the trace tracks memory) tracemalloc peak. Spans nest: library
+functions decorated with `traced` record themselves as children whenever they
+run inside an active span on the same thread, and cost a thread-local lookup
+otherwise (batch runner, benchmarks). Each session keeps a bounded trace in
+session state; `show_diagnostics` renders it in the sidebar and exports it as
+JSON lines. Set `ICHIBAN_TRACE_LOG` to also append every span to a file.
+
+Memory peaks come from tracemalloc, which is process-wide: steps running
+concurrently in other sessions or job threads can inflate them.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+from ichiban.lazy import lazy_import
+from ichiban.session import session_namespace
+
+# Every page imports this module; pandas is only needed to show a trace
+pd = lazy_import("pandas")
+
+# session_state key holding the session's Trace
+TRACE_KEY = "_trace"
+MAX_SPANS = 500
+TRACE_LOG = os.environ.get("ICHIBAN_TRACE_LOG")
+RECORD_COLUMNS = ["session", "name", "parent", "depth", "at", "seconds", "peak_mb", "rows", "error"]
+
+_local = threading.local()
+_log_lock = threading.Lock()
+_memory_lock = threading.Lock()
+# Open memory-tracking spans, and whether tracemalloc was started by us (so
+# we never stop tracing someone else turned on)
+_memory_spans = 0
+_started_tracing = False
+
+
+def _stack():
+    if not hasattr(_local, "spans"):
+        _local.spans = []
+    return _local.spans
+
+
+def count_rows(value):
+    """Rows in a frame / array result (first element of a tuple, `comps` of a dict), else None."""
+    if isinstance(value, tuple) and value:
+        return count_rows(value[0])
+    if isinstance(value, dict) and "comps" in value:
+        return count_rows(value["comps"])
+    shape = getattr(value, "shape", None)
+    if shape:
+        return int(shape[0])
+    return None
+
+
+def _memory_enter():
+    global _memory_spans, _started_tracing
+    with _memory_lock:
+        if _memory_spans == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracing = True
+        _memory_spans += 1
+
+
+def _memory_exit():
+    global _memory_spans, _started_tracing
+    with _memory_lock:
+        _memory_spans -= 1
+        if _memory_spans == 0 and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+
+
+class Span:
+    def __init__(self, trace, name, rows=None, meta=None, parent=None):
+        self.trace = trace
+        self.name = name
+        self.rows = rows
+        self.meta = meta or {}
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent else 0
+        self.at = time.time()
+        self.seconds = None
+        self.peak_bytes = None
+        self.error = None
+        self._base = 0
+        # Highest absolute traced memory seen by finished children
+        self._child_peak = 0
+
+    def record(self):
+        return {
+            "session": self.trace.session if self.trace is not None else None,
+            "name": self.name,
+            "parent": self.parent.name if self.parent else None,
+            "depth": self.depth,
+            "at": self.at,
+            "seconds": self.seconds,
+            "peak_mb": round(self.peak_bytes / 2**20, 3) if self.peak_bytes is not None else None,
+            "rows": self.rows,
+            "error": self.error,
+            **self.meta,
+        }
+
+
+class Trace:
+    """Bounded list of finished spans for one session."""
+
+    def __init__(self, session=None, max_spans=MAX_SPANS, memory=False):
+        self.session = session
+        self.memory = memory
+        self._records = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._records)
+
+    @contextmanager
+    def span(self, name, rows=None, **meta):
+        """Time the block; set `span.rows` inside it when the count is known late."""
+        stack = _stack()
+        parent = stack[-1] if stack else None
+        s = Span(self, name, rows, meta, parent)
+        memory = self.memory
+        if memory:
+            _memory_enter()
+            current, peak = tracemalloc.get_traced_memory()
+            if parent is not None:
+                # The parent's peak so far, before this span resets the counter
+                parent._child_peak = max(parent._child_peak, peak)
+            tracemalloc.reset_peak()
+            s._base = current
+        stack.append(s)
+        start = time.perf_counter()
+        try:
+            yield s
+        except BaseException as e:
+            s.error = type(e).__name__
+            raise
+        finally:
+            s.seconds = round(time.perf_counter() - start, 6)
+            stack.pop()
+            if memory:
+                peak = max(tracemalloc.get_traced_memory()[1], s._child_peak)
+                s.peak_bytes = max(peak - s._base, 0)
+                if parent is not None:
+                    parent._child_peak = max(parent._child_peak, peak)
+                _memory_exit()
+            self._add(s.record())
+
+    def _add(self, record):
+        with self._lock:
+            self._records.append(record)
+        if TRACE_LOG:
+            with _log_lock, open(TRACE_LOG, "a") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+
+    def records(self):
+        with self._lock:
+            return list(self._records)
+
+    def frame(self):
+        df = pd.DataFrame(self.records())
+        return df if len(df) else pd.DataFrame(columns=RECORD_COLUMNS)
+
+    def summary(self):
+        """Calls, total / mean / max seconds, max peak MB and last row count per span name."""
+        df = self.frame()
+        if not len(df):
+            return pd.DataFrame(columns=["calls", "total_s", "mean_s", "max_s", "max_peak_mb", "last_rows"])
+        g = df.groupby("name", sort=False)
+        out = pd.DataFrame({
+            "calls": g.size(),
+            "total_s": g["seconds"].sum(),
+            "mean_s": g["seconds"].mean(),
+            "max_s": g["seconds"].max(),
+            "max_peak_mb": g["peak_mb"].max(),
+            "last_rows": g["rows"].last(),
+        })
+        return out.sort_values("total_s", ascending=False)
+
+    def to_jsonl(self):
+        return "".join(json.dumps(r, default=str) + "\n" for r in self.records())
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+
+def get_trace(state):
+    """This session's Trace (pass `st.session_state`)."""
+    trace = state.get(TRACE_KEY)
+    if trace is None:
+        trace = Trace(session_namespace(state))
+        state[TRACE_KEY] = trace
+    return trace
+
+
+def active_trace():
+    """Trace of the innermost open span on this thread, or None."""
+    stack = _stack()
+    return stack[-1].trace if stack else None
+
+
+@contextmanager
+def span(name, rows=None, **meta):
+    """A child span of the active trace; records nothing when none is active."""
+    trace = active_trace()
+    if trace is None:
+        yield Span(None, name, rows, meta)
+        return
+    with trace.span(name, rows, **meta) as s:
+        yield s
+
+
+def traced(name=None, rows=count_rows):
+    """Decorator: run the function as a `span` (named after it by default), counting result rows."""
+    def decorate(fn):
+        label = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not getattr(_local, "spans", None):
+                return fn(*args, **kwargs)
+            with span(label) as s:
+                result = fn(*args, **kwargs)
+                s.rows = rows(result) if rows else None
+                return result
+        return wrapper
+    return decorate
+
+
+def show_diagnostics(state=None):
+    """Sidebar panel with this session's spans; returns the session's Trace.
+
+    The span tables (pandas) are only built while "Show steps" is on, so light
+    pages never import pandas just to render the panel.
+    """
+    import streamlit as st
+
+    state = st.session_state if state is None else state
+    trace = get_trace(state)
+    with st.sidebar.expander("Diagnostics"):
+        trace.memory = st.toggle("Track peak memory (slower)", value=trace.memory, key="_trace_memory")
+        if not len(trace):
+            st.caption("No steps recorded yet in this session.")
+            return trace
+        st.caption(f"{len(trace)} steps recorded; this run's steps appear after the next rerun.")
+        if st.toggle("Show steps", value=False, key="_trace_show"):
+            st.dataframe(trace.summary(), use_container_width=True)
+            recent = trace.frame().tail(25).iloc[::-1]
+            st.dataframe(recent[[c for c in RECORD_COLUMNS if c in recent.columns and c != "session"]],
+                         hide_index=True, use_container_width=True)
+        c1, c2 = st.columns(2)
+        with c1:
+            st.download_button("Export JSONL", trace.to_jsonl(), file_name="ichiban_trace.jsonl",
+                               mime="application/x-ndjson")
+        with c2:
+            if st.button("Clear", key="_trace_clear"):
+                trace.clear()
+    return trace
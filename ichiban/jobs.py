@@ -0,0 +1,164 @@
+"""Background jobs (report builds, GPT calls) on a thread pool in the app process.
+
+Pages submit a job and return immediately; the job runs on a worker thread
+and the page polls its status/progress on later reruns, picking up the result
+when it is done. Jobs are grouped per session namespace (see
+`ichiban.artifacts.session_namespace`) so sessions only see their own work.
+Job functions must not call Streamlit: they run outside the script thread.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+DEFAULT_WORKERS = 4
+# Finished jobs kept per namespace before the oldest are dropped
+KEEP_FINISHED = 20
+# A namespace untouched this long (seconds) belongs to a closed session; its
+# finished jobs and their results are dropped
+NAMESPACE_TTL = 6 * 3600
+
+
+class Job:
+    """One unit of background work; `fn(job, ...)` reports progress via `job.update`."""
+
+    def __init__(self, namespace, name, key=None):
+        self.id = uuid.uuid4().hex
+        self.namespace = namespace
+        self.name = name
+        self.key = key
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = "Queued"
+        self.result = None
+        self.error = None
+        # Text produced so far (e.g. streamed LLM tokens), shown while polling
+        self.partial = ""
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    def update(self, progress=None, message=None, partial=None):
+        if partial is not None:
+            self.partial = partial
+        if progress is not None:
+            self.progress = max(0.0, min(1.0, float(progress)))
+        if message is not None:
+            self.message = message
+
+    @property
+    def done(self):
+        return self.status in (DONE, FAILED)
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def _run(self, fn, args, kwargs):
+        self.status = RUNNING
+        self.started = time.time()
+        self.message = "Running"
+        try:
+            self.result = fn(self, *args, **kwargs)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            self.status = FAILED
+            self.message = "Failed"
+        else:
+            self.progress = 1.0
+            self.status = DONE
+            self.message = "Done"
+        finally:
+            self.finished = time.time()
+
+
+class JobQueue:
+    """Thread-pool job queue with per-namespace job lists.
+
+    `submit(..., key=...)` is idempotent: while a job with the same namespace,
+    name and key exists (queued, running or finished), that job is returned
+    instead of starting a new one, so page reruns do not pile up duplicates.
+    The returned job becomes the namespace's `latest` either way.
+    """
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, namespace_ttl=NAMESPACE_TTL):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ichiban-job")
+        self._jobs = {}
+        self._by_namespace = {}
+        self._touched = {}
+        self.namespace_ttl = namespace_ttl
+        self._lock = threading.Lock()
+
+    def submit(self, namespace, name, fn, *args, key=None, **kwargs):
+        with self._lock:
+            self._touch(namespace)
+            self._prune_idle()
+            if key is not None:
+                jobs = self._by_namespace.get(namespace, {})
+                for job in jobs.values():
+                    if job.name == name and job.key == key and job.status != FAILED:
+                        # Switching back to an earlier analysis makes its job current again
+                        jobs.move_to_end(job.id)
+                        return job
+            job = Job(namespace, name, key)
+            self._jobs[job.id] = job
+            self._by_namespace.setdefault(namespace, OrderedDict())[job.id] = job
+            self._trim(namespace)
+        self._pool.submit(job._run, fn, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def jobs(self, namespace, name=None):
+        """This namespace's jobs, oldest first (optionally only those called `name`)."""
+        with self._lock:
+            self._touch(namespace)
+            jobs = list(self._by_namespace.get(namespace, {}).values())
+        return [j for j in jobs if name is None or j.name == name]
+
+    def latest(self, namespace, name):
+        jobs = self.jobs(namespace, name)
+        return jobs[-1] if jobs else None
+
+    def active(self, namespace):
+        return [j for j in self.jobs(namespace) if not j.done]
+
+    def _touch(self, namespace):
+        self._touched[namespace] = time.time()
+
+    def _prune_idle(self):
+        """Drop namespaces idle past the TTL whose jobs have all finished."""
+        cutoff = time.time() - self.namespace_ttl
+        for namespace, touched in list(self._touched.items()):
+            jobs = self._by_namespace.get(namespace, {})
+            if touched < cutoff and all(j.done for j in jobs.values()):
+                for jid in jobs:
+                    del self._jobs[jid]
+                self._by_namespace.pop(namespace, None)
+                del self._touched[namespace]
+
+    def _trim(self, namespace):
+        jobs = self._by_namespace[namespace]
+        finished = [jid for jid, j in jobs.items() if j.done]
+        for jid in finished[:max(0, len(finished) - KEEP_FINISHED)]:
+            del jobs[jid]
+            del self._jobs[jid]
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """Process-wide job queue shared by every page and session."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
@@ -0,0 +1,55 @@
+"""Deferred imports for heavy dependencies.
+
+`lazy_import("fitz")` returns a stand-in that imports the real module on first
+attribute access, so a page only pays for PyMuPDF, python-docx, the OpenAI SDK
+or pandas once the interaction that needs them actually runs (the first PDF
+upload, the first report build, the first GPT call). `available` says whether
+an optional package is installed without importing it.
+"""
+
+import functools
+import importlib
+import importlib.util
+import sys
+
+
+class LazyModule:
+    """Module stand-in; the import happens on the first attribute lookup."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            # import_module holds the import lock, so concurrent first uses are safe
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def loaded(self):
+        return self._module is not None or self._name in sys.modules
+
+    def __getattr__(self, attr):
+        # Only called for names not set in __init__, i.e. the real module's attributes
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        return f"<lazy module {self._name!r} ({'loaded' if self.loaded else 'not loaded'})>"
+
+
+def lazy_import(name):
+    """The module itself if it is already imported, else a LazyModule for it."""
+    return sys.modules.get(name) or LazyModule(name)
+
+
+@functools.lru_cache(maxsize=None)
+def available(name):
+    """True if top-level package `name` can be imported (checked without importing it)."""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
@@ -0,0 +1,241 @@
+"""OpenAI chat client with a response cache, streaming and async fan-out.
+
+Responses are cached by a hash of the full request (model, messages,
+temperature, max_tokens), in memory and on disk under the ichiban cache
+directory, so asking again about an unchanged analysis costs nothing.
+`stream` yields text as it arrives (cache hits come back as one chunk) and
+`complete_many` issues many prompts concurrently under a semaphore.
+
+Point the client at another OpenAI-compatible endpoint, e.g. the local stub
+in `ichiban.llm_stub`, with `base_url=` or the `OPENAI_BASE_URL` variable.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from ichiban.lazy import available, lazy_import
+
+# The SDK takes most of a second to import; load it on the first real call
+openai = lazy_import("openai")
+
+DEFAULT_MODEL = "gpt-4o-mini"
+SYSTEM_PROMPT = "You are a senior real estate pricing analyst."
+DEFAULT_CONCURRENCY = 4
+DEFAULT_CACHE_DIR = Path(os.environ.get("ICHIBAN_CACHE_DIR", Path(__file__).resolve().parent.parent / ".ichiban_cache")) / "llm"
+MEMORY_ENTRIES = 256
+DISK_MAX_BYTES = 64 * 1024 * 1024
+DISK_MAX_ENTRIES = 5000
+# Disk eviction scans the directory, so it runs every this many writes
+EVICT_EVERY = 64
+
+
+def request_key(model, messages, temperature, max_tokens):
+    payload = json.dumps([model, messages, temperature, max_tokens], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Completed responses by request key: a small LRU in memory, backed by JSON files.
+
+    Empty responses are never stored, so a blank completion is retried next
+    time. Reads touch a file's mtime; the least recently used files are
+    deleted once the directory exceeds `max_bytes` or `max_files`.
+    """
+
+    def __init__(self, directory=None, max_entries=MEMORY_ENTRIES, max_bytes=DISK_MAX_BYTES, max_files=DISK_MAX_ENTRIES):
+        self.directory = Path(directory) if directory else None
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self._writes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return self.directory / f"{key}.json"
+
+    def get(self, key):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        if self.directory is None:
+            return None
+        try:
+            text = json.loads(self._path(key).read_text(encoding="utf-8"))["text"]
+            os.utime(self._path(key))
+        except (OSError, ValueError, KeyError):
+            return None
+        if not text or not text.strip():
+            # Written before blank responses were skipped
+            return None
+        self._remember(key, text)
+        return text
+
+    def put(self, key, text):
+        if not text or not text.strip():
+            return
+        self._remember(key, text)
+        if self.directory is not None:
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                tmp = self._path(key).with_suffix(".tmp")
+                tmp.write_text(json.dumps({"text": text}, ensure_ascii=False), encoding="utf-8")
+                os.replace(tmp, self._path(key))
+            except OSError:
+                return
+            with self._lock:
+                self._writes += 1
+                due = self._writes % EVICT_EVERY == 1
+            if due:
+                self.evict()
+
+    def evict(self):
+        entries = []
+        for p in self.directory.glob("*.json"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        while entries and (total > self.max_bytes or len(entries) > self.max_files):
+            _, size, p = entries.pop(0)
+            try:
+                p.unlink()
+            except OSError:
+                pass
+            total -= size
+
+    def _remember(self, key, text):
+        with self._lock:
+            self._items[key] = text
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def default_cache():
+    """Process-wide response cache (disk layer off with ICHIBAN_LLM_DISK_CACHE=0)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            disk = os.environ.get("ICHIBAN_LLM_DISK_CACHE", "1") != "0"
+            _cache = ResponseCache(DEFAULT_CACHE_DIR if disk else None)
+        return _cache
+
+
+class LLMClient:
+    """Chat completions for one model/settings combination."""
+
+    def __init__(self, api_key=None, base_url=None, model=DEFAULT_MODEL, temperature=0.6, max_tokens=1000,
+                 system_prompt=SYSTEM_PROMPT, cache=None, concurrency=DEFAULT_CONCURRENCY, timeout=120.0):
+        self.api_key = api_key or os.environ.get("OPENAI_API_KEY", "")
+        self.base_url = base_url or os.environ.get("OPENAI_BASE_URL") or None
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.system_prompt = system_prompt
+        self.cache = cache if cache is not None else default_cache()
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._client = None
+        # A local stub needs no real key
+        if not self.api_key and self.base_url:
+            self.api_key = "stub"
+
+    @property
+    def available(self):
+        return available("openai") and bool(self.api_key)
+
+    def messages(self, prompt):
+        return [{"role": "system", "content": self.system_prompt}, {"role": "user", "content": prompt}]
+
+    def key(self, prompt):
+        return request_key(self.model, self.messages(prompt), self.temperature, self.max_tokens)
+
+    def cached(self, prompt):
+        return self.cache.get(self.key(prompt))
+
+    def _request(self, prompt, **extra):
+        return dict(model=self.model, messages=self.messages(prompt),
+                    temperature=self.temperature, max_tokens=self.max_tokens, **extra)
+
+    def _sync_client(self):
+        if self._client is None:
+            if not available("openai"):
+                raise RuntimeError("OpenAI SDK not available")
+            self._client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url, timeout=self.timeout)
+        return self._client
+
+    def complete(self, prompt):
+        """Full response text (from cache when the same request was made before)."""
+        key = self.key(prompt)
+        text = self.cache.get(key)
+        if text is None:
+            resp = self._sync_client().chat.completions.create(**self._request(prompt))
+            text = (resp.choices[0].message.content or "").strip()
+            self.cache.put(key, text)
+        return text
+
+    def stream(self, prompt):
+        """Yield response text chunks as they arrive; the full text is cached at the end."""
+        key = self.key(prompt)
+        text = self.cache.get(key)
+        if text is not None:
+            yield text
+            return
+        parts = []
+        for chunk in self._sync_client().chat.completions.create(**self._request(prompt, stream=True)):
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+        self.cache.put(key, "".join(parts).strip())
+
+    async def acomplete_many(self, prompts, concurrency=None):
+        """Responses for many prompts, at most `concurrency` requests in flight.
+
+        Failed requests come back as the exception instance in their slot.
+        """
+        results = [self.cache.get(self.key(p)) for p in prompts]
+        todo = [i for i, r in enumerate(results) if r is None]
+        if not todo:
+            return results
+        if not available("openai"):
+            raise RuntimeError("OpenAI SDK not available")
+        client = openai.AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, timeout=self.timeout)
+        gate = asyncio.Semaphore(concurrency or self.concurrency)
+
+        async def one(i):
+            async with gate:
+                try:
+                    resp = await client.chat.completions.create(**self._request(prompts[i]))
+                except Exception as e:
+                    results[i] = e
+                    return
+            text = (resp.choices[0].message.content or "").strip()
+            self.cache.put(self.key(prompts[i]), text)
+            results[i] = text
+
+        try:
+            await asyncio.gather(*(one(i) for i in todo))
+        finally:
+            await client.close()
+        return results
+
+    def complete_many(self, prompts, concurrency=None):
+        """Blocking wrapper around `acomplete_many` (for threads and scripts)."""
+        return asyncio.run(self.acomplete_many(prompts, concurrency))
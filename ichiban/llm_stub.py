@@ -0,0 +1,103 @@
+"""Local OpenAI-compatible stub for exercising the LLM layer without an API key.
+
+    python -m ichiban.llm_stub --port 8765 --delay 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 streamlit run main.py
+
+Answers POST /v1/chat/completions (plain and `stream: true`) with canned,
+prompt-dependent commentary, sleeping `--delay` seconds per streamed word.
+"""
+
+import argparse
+import hashlib
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def canned_reply(messages):
+    prompt = messages[-1]["content"] if messages else ""
+    tag = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+    return (
+        f"- Stub commentary {tag}: the subject sits inside the normalized band.\n"
+        "- Comparable sales align closely after adjustments.\n"
+        "- Demand cues are neutral; pacing follows the area's average days in MLS.\n\n"
+        "Recommended strategy: list within the recommended range and review after the first two weeks."
+    )
+
+
+def _completion(model, text, created):
+    return {
+        "id": f"chatcmpl-stub-{created}", "object": "chat.completion", "created": created, "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(text.split()), "total_tokens": len(text.split())},
+    }
+
+
+def _chunk(model, created, delta, finish=None):
+    return {
+        "id": f"chatcmpl-stub-{created}", "object": "chat.completion.chunk", "created": created, "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    delay = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        model = body.get("model", "stub")
+        text = canned_reply(body.get("messages", []))
+        created = int(time.time())
+
+        if not body.get("stream"):
+            payload = json.dumps(_completion(model, text, created)).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        events = [_chunk(model, created, {"role": "assistant", "content": ""})]
+        events += [_chunk(model, created, {"content": word + " "}) for word in text.split(" ")]
+        events.append(_chunk(model, created, {}, finish="stop"))
+        for event in events:
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            if self.delay:
+                time.sleep(self.delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def serve(host="127.0.0.1", port=8765, delay=0.0):
+    handler = type("Handler", (StubHandler,), {"delay": delay})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds between streamed words")
+    args = parser.parse_args(argv)
+    server = serve(args.host, args.port, args.delay)
+    print(f"LLM stub listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""Memoized dependency graph between the app's stages.
+
+Each stage declares its inputs: another stage's output (`Upstream`), a
+session-state value (`StateValue`) or an external source (`Source`, e.g. the
+schema file). A stage's output is memoized in session state under the
+fingerprint of its inputs, so a page rerun with unchanged inputs returns the
+stored result, and a changed input (say a subject field edited in Module 6)
+recomputes exactly the stages downstream of it the next time any of them is
+asked for. Source stages (ingest, filter) are published by their pages with
+`set`; everything else is pulled with `get`.
+"""
+
+import time
+
+from ichiban.adjustments import apply_adjustments
+from ichiban.analysis_format import build_analysis
+from ichiban.artifacts import content_key
+from ichiban.instrument import count_rows, span
+from ichiban.schema import load_schema
+from ichiban.summary import average_days, bootstrap_range, prepare_comps, value_range, weighted_summary
+
+# session_state key holding the memo table
+MEMO_KEY = "_pipeline"
+
+
+class MissingInput(KeyError):
+    """A stage input is not available yet (an upstream page has not run)."""
+
+    def __init__(self, stage, name):
+        super().__init__(f"{stage}: missing input {name!r}")
+        self.stage = stage
+        self.name = name
+
+
+class Upstream:
+    def __init__(self, name):
+        self.name = name
+
+
+class StateValue:
+    """A session-state value, fingerprinted by content (keep these small)."""
+
+    _REQUIRED = object()
+
+    def __init__(self, key, default=_REQUIRED):
+        self.key = key
+        self.default = default
+
+
+class Source:
+    """External input: `load()` gives the value, `fingerprint(value)` its identity."""
+
+    def __init__(self, name, load, fingerprint):
+        self.name = name
+        self.load = load
+        self.fingerprint = fingerprint
+
+
+class Stage:
+    def __init__(self, name, fn=None, inputs=None, publish=None):
+        self.name = name
+        self.fn = fn
+        self.inputs = inputs or {}
+        # Optional session_state key the output is mirrored to for older readers
+        self.publish = publish
+
+    @property
+    def is_source(self):
+        return self.fn is None
+
+
+class Pipeline:
+    def __init__(self, stages):
+        self.stages = {s.name: s for s in stages}
+        self.downstream = {name: [] for name in self.stages}
+        for stage in stages:
+            for dep in stage.inputs.values():
+                if isinstance(dep, Upstream):
+                    if dep.name not in self.stages:
+                        raise ValueError(f"{stage.name}: unknown upstream stage {dep.name!r}")
+                    self.downstream[dep.name].append(stage.name)
+
+    def _memo(self, state):
+        if MEMO_KEY not in state:
+            state[MEMO_KEY] = {}
+        return state[MEMO_KEY]
+
+    def set(self, state, name, value, fingerprint):
+        """Publish a source stage's output; downstream stages rerun if `fingerprint` changed."""
+        stage = self.stages[name]
+        memo = self._memo(state)
+        entry = memo.get(name)
+        if entry is None or entry["fingerprint"] != fingerprint:
+            entry = {"fingerprint": fingerprint, "value": value, "seconds": 0.0, "at": time.time()}
+            memo[name] = entry
+        # Same fingerprint: keep the stored object so downstream memos stay valid
+        if stage.publish:
+            state[stage.publish] = entry["value"]
+        return entry["value"]
+
+    def _resolve(self, state, stage):
+        """Input values and their combined fingerprint, bringing upstream stages up to date."""
+        values, prints = {}, {}
+        for arg, dep in stage.inputs.items():
+            if isinstance(dep, Upstream):
+                values[arg], prints[arg] = self._ensure(state, dep.name)
+            elif isinstance(dep, StateValue):
+                if dep.key in state:
+                    value = state[dep.key]
+                elif dep.default is not StateValue._REQUIRED:
+                    value = dep.default
+                else:
+                    raise MissingInput(stage.name, dep.key)
+                values[arg], prints[arg] = value, content_key(value)
+            elif isinstance(dep, Source):
+                value = dep.load()
+                values[arg], prints[arg] = value, dep.fingerprint(value)
+            else:
+                values[arg], prints[arg] = dep, content_key(dep)
+        return values, content_key([stage.name, prints])
+
+    def _ensure(self, state, name):
+        stage = self.stages[name]
+        memo = self._memo(state)
+        if stage.is_source:
+            entry = memo.get(name)
+            if entry is None:
+                raise MissingInput(name, name)
+            return entry["value"], entry["fingerprint"]
+
+        values, fingerprint = self._resolve(state, stage)
+        entry = memo.get(name)
+        if entry is None or entry["fingerprint"] != fingerprint:
+            start = time.perf_counter()
+            with span(f"stage.{name}") as s:
+                value = stage.fn(**values)
+                s.rows = count_rows(value)
+            entry = {"fingerprint": fingerprint, "value": value,
+                     "seconds": time.perf_counter() - start, "at": time.time()}
+            memo[name] = entry
+            if stage.publish:
+                state[stage.publish] = value
+        return entry["value"], entry["fingerprint"]
+
+    def get(self, state, name):
+        """Output of stage `name`, recomputing it (and anything upstream) only if inputs changed."""
+        return self._ensure(state, name)[0]
+
+    def fingerprint(self, state, name):
+        return self._ensure(state, name)[1]
+
+    def invalidate(self, state, name):
+        """Forget `name` and everything downstream of it."""
+        memo = self._memo(state)
+        pending = [name]
+        while pending:
+            current = pending.pop()
+            memo.pop(current, None)
+            pending.extend(self.downstream[current])
+
+    def status(self, state):
+        """{stage: seconds spent on its last computation, or None if never run}."""
+        memo = self._memo(state)
+        return {name: (memo[name]["seconds"] if name in memo else None) for name in self.stages}
+
+
+# --- App stages -------------------------------------------------------------
+
+schema_source = Source("schema", load_schema, lambda loaded: loaded.digest)
+
+
+def _adjust(comps, subject, schema, include=None):
+    return apply_adjustments(comps, subject, schema.compiled["mid"], include=include)
+
+
+def _summarize(comps, remarks):
+    comps = prepare_comps(comps, remarks)
+    stats, keep = value_range(comps["adjusted_price"], comps["ag_sf"])
+    if "similarity" in comps.columns:
+        # Module 4 scored the comps: weight the outlier-filtered set by similarity
+        stats.update(weighted_summary(comps["adjusted_price"], comps["ag_sf"], comps["similarity"], keep))
+    return {"comps": comps, "stats": stats, "keep": keep, "average_days": average_days(comps)}
+
+
+def _bootstrap(summary, resamples):
+    if not resamples:
+        return None
+    comps, keep = summary["comps"], summary["keep"]
+    kept = comps["adjusted_price"].to_numpy(dtype="float64")[keep if keep.any() else slice(None)]
+    return bootstrap_range(kept, n_resamples=int(resamples), confidence=0.90, seed=0)
+
+
+def _analysis(summary, bootstrap, subject, online_avg, estimates):
+    stats = dict(summary["stats"])
+    if bootstrap:
+        stats["bootstrap"] = bootstrap
+    estimates = estimates or {}
+    return build_analysis({
+        "subject_property": dict(subject),
+        "online_estimate_average": float(online_avg),
+        **stats,
+        "average_days_in_mls": summary["average_days"],
+        "online_estimates": {
+            "zillow": estimates.get("zillow"),
+            "redfin": estimates.get("redfin"),
+            "real_avm": estimates.get("real_avm")
+        },
+    }, summary["comps"])
+
+
+APP_PIPELINE = Pipeline([
+    Stage("ingest", publish="cleaned_comp_data"),
+    Stage("filter", publish="filtered_comps_df"),
+    Stage("adjust_ag", _adjust, {"comps": Upstream("filter"), "subject": StateValue("subject_data"),
+                                 "schema": schema_source, "include": ["ag"]}),
+    Stage("adjust", _adjust, {"comps": Upstream("filter"), "subject": StateValue("subject_data"),
+                              "schema": schema_source}, publish="adjusted_comps"),
+    Stage("summarize", _summarize, {"comps": Upstream("adjust"), "remarks": StateValue("comp_remarks", default=None)}),
+    Stage("bootstrap", _bootstrap, {"summary": Upstream("summarize"),
+                                    "resamples": StateValue("bootstrap_resamples", default=None)}),
+    Stage("analysis", _analysis, {"summary": Upstream("summarize"), "bootstrap": Upstream("bootstrap"),
+                                  "subject": StateValue("subject_data"), "online_avg": StateValue("online_avg"),
+                                  "estimates": StateValue("online_estimates", default={})}),
+])
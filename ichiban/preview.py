@@ -0,0 +1,132 @@
+"""Paginated comp previews sliced on the server.
+
+`PreviewSource` wraps a comp frame and answers page requests (sort column,
+address filter, page number, columns) by slicing positions, so only one page
+of rows ever reaches the browser. Sort orders and summary statistics are
+computed once per frame and reused across reruns; `show_preview` is the
+Streamlit widget the pages use.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+PAGE_SIZES = [25, 50, 100, 250]
+# Columns shown first when present; the user can pick any others
+DEFAULT_COLUMNS = ["full_address", "net_price", "ag_sf", "bedrooms", "bathrooms", "below_grade_finished",
+                   "below_grade_unfinished", "Close Date", "Days In MLS", "distance_mi", "similarity"]
+SEARCH_COLUMN = "full_address"
+
+
+class PreviewSource:
+    def __init__(self, df):
+        self.df = df
+        self._orders = {}
+        self._selection = (None, None)
+        self._stats = None
+
+    def __len__(self):
+        return len(self.df)
+
+    @property
+    def columns(self):
+        return list(self.df.columns)
+
+    def default_columns(self):
+        cols = [c for c in DEFAULT_COLUMNS if c in self.df.columns]
+        return cols or self.columns[:10]
+
+    def order(self, column, ascending=True):
+        """Row positions sorted by `column` (missing values last), cached per column."""
+        if column is None:
+            return np.arange(len(self.df))
+        if column not in self._orders:
+            s = self.df[column].reset_index(drop=True)
+            present = s.notna().to_numpy()
+            ranked = s[present].sort_values(kind="stable").index.to_numpy()
+            self._orders[column] = (ranked, np.flatnonzero(~present))
+        ranked, missing = self._orders[column]
+        return np.concatenate([ranked if ascending else ranked[::-1], missing])
+
+    def select(self, column=None, ascending=True, search=""):
+        """Positions for one sort + address search, reused until either changes."""
+        key = (column, ascending, search.strip().lower())
+        if self._selection[0] == key:
+            return self._selection[1]
+        positions = self.order(column, ascending)
+        if key[2] and SEARCH_COLUMN in self.df.columns:
+            hit = self.df[SEARCH_COLUMN].astype("string").str.lower().str.contains(key[2], regex=False, na=False).to_numpy()
+            positions = positions[hit[positions]]
+        self._selection = (key, positions)
+        return positions
+
+    def page(self, number=1, size=PAGE_SIZES[0], column=None, ascending=True, search="", columns=None):
+        """Return `(rows, matched, pages)` for 1-based page `number`."""
+        positions = self.select(column, ascending, search)
+        pages = max(1, math.ceil(len(positions) / size))
+        number = min(max(1, number), pages)
+        start = (number - 1) * size
+        cols = [c for c in (columns or self.columns) if c in self.df.columns]
+        rows = self.df.iloc[positions[start:start + size]][cols]
+        return rows, len(positions), pages
+
+    def stats(self):
+        """count / mean / min / median / max for the numeric columns (computed once)."""
+        if self._stats is None:
+            numeric = self.df.select_dtypes("number")
+            self._stats = pd.DataFrame({
+                "count": numeric.count(),
+                "mean": numeric.mean(),
+                "min": numeric.min(),
+                "median": numeric.median(),
+                "max": numeric.max(),
+            })
+        return self._stats
+
+
+def preview_source(state, key, df):
+    """PreviewSource for `df`, kept in session state while the frame stays the same object."""
+    source = state.get(key)
+    if source is None or source.df is not df:
+        source = PreviewSource(df)
+        state[key] = source
+    return source
+
+
+def show_preview(df, key):
+    """Streamlit preview of `df`: column picker, sort, address search and pagination."""
+    import streamlit as st
+
+    source = preview_source(st.session_state, f"_preview_{key}", df)
+    if not len(source):
+        st.info("No rows to show.")
+        return
+
+    with st.expander("Columns, sort and search"):
+        columns = st.multiselect("Columns", source.columns, default=source.default_columns(), key=f"{key}_cols")
+        c1, c2, c3 = st.columns([2, 1, 2])
+        with c1:
+            sort_by = st.selectbox("Sort by", [None] + source.columns, key=f"{key}_sort",
+                                   format_func=lambda c: "Original order" if c is None else c)
+        with c2:
+            ascending = st.toggle("Ascending", value=True, key=f"{key}_asc")
+        with c3:
+            search = st.text_input("Address contains", key=f"{key}_search")
+
+    p1, p2 = st.columns([1, 3])
+    with p1:
+        size = st.selectbox("Rows per page", PAGE_SIZES, key=f"{key}_size")
+    positions = source.select(sort_by, ascending, search)
+    pages = max(1, math.ceil(len(positions) / size))
+    with p2:
+        number = st.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, value=1, step=1, key=f"{key}_page")
+
+    rows, matched, pages = source.page(number, size, sort_by, ascending, search, columns)
+    st.dataframe(rows, use_container_width=True)
+    start = (min(number, pages) - 1) * size
+    st.caption(f"Rows {start + 1 if matched else 0:,}–{start + len(rows):,} of {matched:,}"
+               + (f" (filtered from {len(source):,})" if matched != len(source) else ""))
+
+    with st.expander("Summary statistics"):
+        st.dataframe(source.stats(), use_container_width=True)
@@ -0,0 +1,188 @@
+"""Token-budgeted prompt assembly for the Module 11 commentary.
+
+Comp remarks are ranked by TF-IDF similarity to a description of the subject
+(an inverted index built once per comp set), near-identical remarks are
+dropped, and as many of the best remarks as fit in the token budget are
+placed into the prompt template. `build_prompt` reports the resulting size
+so the page can show it before anything is sent.
+"""
+
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+
+from ichiban.instrument import traced
+from ichiban.lazy import available, lazy_import
+
+tiktoken = lazy_import("tiktoken")
+
+DEFAULT_BUDGET = 1200
+MAX_REMARK_TOKENS = 90
+DUPLICATE_SIMILARITY = 0.85
+INDEX_CACHE_ENTRIES = 16
+
+_WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in into is it its of on or our the this to was with you your "
+    "will all just very home house property".split()
+)
+
+_encoding = None
+
+
+def estimate_tokens(text):
+    """Token count with tiktoken when installed, else ~4 characters per token."""
+    global _encoding
+    if available("tiktoken"):
+        if _encoding is None:
+            try:
+                _encoding = tiktoken.get_encoding("o200k_base")
+            except Exception:
+                _encoding = False
+        if _encoding:
+            return len(_encoding.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+def tokenize(text):
+    return [w for w in _WORD.findall(str(text).lower()) if w not in STOPWORDS and len(w) > 1]
+
+
+class RemarksIndex:
+    """Inverted TF-IDF index over comp remarks (one document per remark)."""
+
+    def __init__(self, remarks):
+        self.remarks = [str(r) if r is not None else "" for r in remarks]
+        self.postings = {}
+        counts = [Counter(tokenize(r)) for r in self.remarks]
+        for doc, tf in enumerate(counts):
+            for term, n in tf.items():
+                self.postings.setdefault(term, []).append((doc, n))
+        n_docs = max(len(self.remarks), 1)
+        self.idf = {t: math.log((1 + n_docs) / (1 + len(p))) + 1.0 for t, p in self.postings.items()}
+        # Sublinear tf-idf weights per document, L2-normalized
+        self.vectors = []
+        for tf in counts:
+            vec = {t: (1.0 + math.log(n)) * self.idf[t] for t, n in tf.items()}
+            norm = math.sqrt(sum(w * w for w in vec.values())) or 1.0
+            self.vectors.append({t: w / norm for t, w in vec.items()})
+
+    def __len__(self):
+        return len(self.remarks)
+
+    def rank(self, query):
+        """(doc, score) pairs for non-empty remarks, best match first (ties keep comp order)."""
+        qtf = Counter(tokenize(query))
+        scores = {}
+        for term, n in qtf.items():
+            if term not in self.postings:
+                continue
+            qw = (1.0 + math.log(n)) * self.idf[term]
+            for doc, _ in self.postings[term]:
+                scores[doc] = scores.get(doc, 0.0) + qw * self.vectors[doc][term]
+        docs = [d for d in range(len(self.remarks)) if self.vectors[d]]
+        return sorted(((d, scores.get(d, 0.0)) for d in docs), key=lambda x: -x[1])
+
+    def similarity(self, a, b):
+        va, vb = self.vectors[a], self.vectors[b]
+        if len(va) > len(vb):
+            va, vb = vb, va
+        return sum(w * vb.get(t, 0.0) for t, w in va.items())
+
+
+_index_cache = OrderedDict()
+_index_lock = threading.Lock()
+
+
+def remarks_index(remarks, key):
+    """RemarksIndex for a comp set, built once per `key` (e.g. the analysis key)."""
+    with _index_lock:
+        if key in _index_cache:
+            _index_cache.move_to_end(key)
+            return _index_cache[key]
+    index = RemarksIndex(remarks)
+    with _index_lock:
+        _index_cache[key] = index
+        while len(_index_cache) > INDEX_CACHE_ENTRIES:
+            _index_cache.popitem(last=False)
+    return index
+
+
+def subject_query(subject, extra=""):
+    """Search text describing the subject's features."""
+    words = [extra]
+    for key, label in (("bedrooms", "bedroom"), ("bathrooms", "bath"), ("garage_spaces", "car garage")):
+        if subject.get(key):
+            words.append(label)
+    if (subject.get("below_grade_finished") or 0) > 0:
+        words.append("finished basement")
+    for key in ("basement_type", "view"):
+        value = subject.get(key)
+        if value and value != "none":
+            words.append(str(value))
+    return " ".join(w for w in words if w)
+
+
+def truncate_tokens(text, max_tokens):
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[:max_tokens * 4].rsplit(" ", 1)[0]
+    return cut.rstrip(" ,.;") + "…"
+
+
+def select_remarks(index, query, threshold=DUPLICATE_SIMILARITY, skipped=None):
+    """Yield remark docs best match first, skipping near-duplicates of ones already yielded.
+
+    Pass a list as `skipped` to collect the dropped duplicates.
+    """
+    chosen = []
+    for doc, _ in index.rank(query):
+        if any(index.similarity(doc, c) >= threshold for c in chosen):
+            if skipped is not None:
+                skipped.append(doc)
+            continue
+        chosen.append(doc)
+        yield doc
+
+
+def outlier_summary(notes, money):
+    """One line in place of the raw outlier_notes JSON."""
+    if not notes:
+        return "None recorded."
+    return (
+        f"Price IQR band {money(notes.get('price_iqr_low_cut'))}–{money(notes.get('price_iqr_high_cut'))}; "
+        f"PPSF band ${notes.get('ppsf_low', 0):,.0f}–${notes.get('ppsf_high', 0):,.0f}; "
+        f"kept {notes.get('filtered_count', 'N/A')} of {notes.get('total_count', 'N/A')} comps."
+    )
+
+
+@traced()
+def build_prompt(template, index, query, budget=DEFAULT_BUDGET, max_remark_tokens=MAX_REMARK_TOKENS,
+                 empty="No notable public remarks provided."):
+    """Fill `template`'s `{remarks}` slot with the best remarks that fit in `budget` tokens.
+
+    Returns `(prompt, info)`; `info` has tokens, budget, remarks_used,
+    remarks_available, duplicates_removed and over_budget.
+    """
+    base_tokens = estimate_tokens(template.replace("{remarks}", ""))
+    dropped = []
+    lines, used = [], base_tokens
+    # Remarks are pulled lazily, so only those near the top are compared for duplicates
+    for doc in select_remarks(index, query, skipped=dropped):
+        line = "- " + truncate_tokens(" ".join(index.remarks[doc].split()), max_remark_tokens)
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            break
+        lines.append(line)
+        used += cost
+    prompt = template.replace("{remarks}", "\n".join(lines) if lines else empty)
+    tokens = estimate_tokens(prompt)
+    return prompt, {
+        "tokens": tokens,
+        "budget": budget,
+        "remarks_used": len(lines),
+        "remarks_available": sum(1 for v in index.vectors if v),
+        "duplicates_removed": len(dropped),
+        "over_budget": tokens > budget,
+    }
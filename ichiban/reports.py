@@ -0,0 +1,256 @@
+"""DOCX report rendering for Modules 9 and 11.
+
+Reports are rendered into memory and cached per (report kind, analysis key,
+report inputs), so reruns of a page hand back the same bytes without
+rebuilding the document. Comp tables are emitted as one block of WordprocessingML
+and attached in a single parse instead of `add_row()` per comp.
+
+An optional `report_template.docx` next to the schema (or `ICHIBAN_REPORT_TEMPLATE`)
+supplies the styles (fonts, headings, table look) for every report.
+"""
+
+import io
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+from ichiban.adjustments import ADJUSTMENT_COLUMNS
+from ichiban.analysis_format import comps_frame
+from ichiban.artifacts import content_key
+from ichiban.instrument import traced
+from ichiban.lazy import lazy_import
+
+# python-docx, loaded on the first report build
+docx = lazy_import("docx")
+docx_oxml = lazy_import("docx.oxml")
+docx_ns = lazy_import("docx.oxml.ns")
+
+DEFAULT_TEMPLATE_PATH = Path(os.environ.get(
+    "ICHIBAN_REPORT_TEMPLATE", Path(__file__).resolve().parent.parent / "report_template.docx"))
+CACHE_ENTRIES = 32
+
+# Characters XML 1.0 does not allow (stray control bytes in MLS text)
+_INVALID_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+BACKUP_COLUMNS = [
+    ("Address", "full_address", "text"),
+    ("AG SF", "ag_sf", "int"),
+    ("Net Price", "net_price", "money"),
+    ("AG Adj", "ag_adj", "money"),
+    ("BGF Adj", "bgf_adj", "money"),
+    ("BGU Adj", "bgu_adj", "money"),
+    # Garage, baths, view, walkout / garden level and age, so each row adds up to Total Adj
+    ("Other Adj", "other_adj", "money"),
+    ("Total Adj", "total_adjustments", "money"),
+    ("Adjusted Price", "adjusted_price", "money"),
+    ("Days MLS", "days_in_mls", "int"),
+]
+OTHER_ADJUSTMENT_COLUMNS = [c for c in ADJUSTMENT_COLUMNS if c not in ("ag_adj", "bgf_adj", "bgu_adj")]
+ENHANCED_COLUMNS = [
+    ("Address", "full_address", "text"),
+    ("AG SF", "ag_sf", "int"),
+    ("Total Adjustments", "total_adjustments", "money"),
+    ("Adjusted Price", "adjusted_price", "money"),
+]
+
+
+def money(v):
+    try:
+        return f"${float(v):,.0f}"
+    except Exception:
+        return str(v)
+
+
+def _format_column(values, kind):
+    """Whole column of display strings; missing numbers show as N/A."""
+    if kind == "text":
+        return ["" if v is None else str(v) for v in values]
+    arr = np.asarray(values, dtype="float64")
+    fmt = "${:,.0f}" if kind == "money" else "{:.0f}"
+    return ["N/A" if v != v else fmt.format(v) for v in arr.tolist()]
+
+
+def _column_values(comps, col):
+    if col in comps.columns:
+        return comps[col].to_numpy()
+    if col in ("total_adjustments", "other_adj"):
+        names = ADJUSTMENT_COLUMNS if col == "total_adjustments" else OTHER_ADJUSTMENT_COLUMNS
+        parts = [comps[c].to_numpy(dtype="float64") for c in names if c in comps.columns]
+        return np.nansum(parts, axis=0) if parts else np.zeros(len(comps))
+    return np.full(len(comps), np.nan)
+
+
+def add_comp_table(doc, comps, columns):
+    """Append a header row plus one row per comp, built as a single XML fragment."""
+    table = doc.add_table(rows=1, cols=len(columns))
+    for cell, (label, _, _) in zip(table.rows[0].cells, columns):
+        cell.text = label
+    widths = [cell.width for cell in table.rows[0].cells]
+
+    cols = [_format_column(_column_values(comps, col), kind) for _, col, kind in columns]
+    cell_xml = [
+        f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{w.twips if w is not None else 0}"/></w:tcPr>'
+        '<w:p><w:r><w:t xml:space="preserve">{}</w:t></w:r></w:p></w:tc>'
+        for w in widths
+    ]
+    row_xml = "<w:tr>" + "".join(cell_xml) + "</w:tr>"
+    rows = [
+        row_xml.format(*(escape(_INVALID_XML.sub("", v)) for v in values))
+        for values in zip(*cols)
+    ]
+    if rows:
+        fragment = docx_oxml.parse_xml(f"<w:tbl {docx_ns.nsdecls('w')}>{''.join(rows)}</w:tbl>")
+        table._tbl.extend(list(fragment))
+    return table
+
+
+def add_estimates_table(doc, estimates):
+    table = doc.add_table(rows=4, cols=2)
+    table.cell(0, 0).text = "Source"; table.cell(0, 1).text = "Value"
+    for i, (label, key) in enumerate((("Zillow", "zillow"), ("Redfin", "redfin"), ("Real AVM", "real_avm")), start=1):
+        v = estimates.get(key)
+        table.cell(i, 0).text = label
+        table.cell(i, 1).text = money(v) if v is not None else "N/A"
+    return table
+
+
+_template_lock = threading.Lock()
+_template = {}
+
+
+def new_document(template_path=None):
+    """Blank report document, based on the report template when one exists."""
+    path = Path(template_path) if template_path else DEFAULT_TEMPLATE_PATH
+    with _template_lock:
+        if path not in _template:
+            _template[path] = path.read_bytes() if path.is_file() else None
+        data = _template[path]
+    return docx.Document(io.BytesIO(data)) if data else docx.Document()
+
+
+def _ranges(doc, a):
+    raw_low, raw_high = a["raw"]
+    norm_low, norm_high = a["normalized"]
+    doc.add_paragraph(f"Raw Adjusted Comp Range: {money(raw_low)} – {money(raw_high)}")
+    doc.add_paragraph(f"Normalized Range (outlier-aware): {money(norm_low)} – {money(norm_high)} (median {money(a['median'])})")
+    if abs(raw_low - norm_low) < 1 and abs(raw_high - norm_high) < 1:
+        doc.add_paragraph("Note: Normalized range equals raw range; no strong outliers were detected by the filters.")
+
+
+def _fields(analysis):
+    raw = analysis.get("adjusted_price_range", [0, 0])
+    norm = analysis.get("normalized_range", raw)
+    return {
+        "subject": analysis.get("subject_property", {}),
+        "online_avg": analysis.get("online_estimate_average", 0),
+        "raw": raw,
+        "normalized": norm,
+        "median": analysis.get("normalized_median", (norm[0] + norm[1]) / 2),
+        "avg_ppsf": analysis.get("average_ppsf", 0),
+        "avg_days": analysis.get("average_days_in_mls", "N/A"),
+        "estimates": analysis.get("online_estimates", {}) or {},
+    }
+
+
+@traced()
+def build_backup_report(analysis, template_path=None):
+    """Module 9 backup (non-GPT) report."""
+    a = _fields(analysis)
+    sp = a["subject"]
+    doc = new_document(template_path)
+    doc.add_heading("Ichiban Market Valuation Report — Backup (Non-GPT)", 0)
+
+    doc.add_heading("Subject Property", level=1)
+    doc.add_paragraph(f"Address: {sp.get('address', 'N/A')}")
+    doc.add_paragraph(f"Above Grade SF: {sp.get('ag_sf', 'N/A')} | Bedrooms: {sp.get('bedrooms', 'N/A')} | Bathrooms: {sp.get('bathrooms', 'N/A')}")
+    doc.add_paragraph(f"Below Grade Finished: {sp.get('below_grade_finished', 'N/A')} | Below Grade Unfinished: {sp.get('below_grade_unfinished', 'N/A')}")
+
+    doc.add_heading("Valuation Summary", level=1)
+    doc.add_paragraph(f"Online Estimate Average: {money(a['online_avg'])}")
+    doc.add_paragraph(f"Average Price per SF: ${a['avg_ppsf']}")
+    doc.add_paragraph(f"Average Days in MLS: {a['avg_days']}")
+
+    doc.add_heading("Pricing Ranges", level=1)
+    _ranges(doc, a)
+
+    doc.add_heading("Online Estimates (Manual Inputs)", level=1)
+    add_estimates_table(doc, a["estimates"])
+
+    doc.add_heading("Adjusted Comparable Sales (with Total Adjustments)", level=1)
+    add_comp_table(doc, comps_frame(analysis), BACKUP_COLUMNS)
+    return doc
+
+
+@traced()
+def build_enhanced_report(analysis, commentary, recommended, used_fallback=False, template_path=None):
+    """Module 11 enhanced report around the GPT (or fallback) commentary."""
+    a = _fields(analysis)
+    sp = a["subject"]
+    doc = new_document(template_path)
+    title = "Enhanced Market Valuation Summary (Auto-Fallback)" if used_fallback else "Enhanced Market Valuation Summary"
+    doc.add_heading(title, 0)
+
+    doc.add_heading("Subject Property Summary", level=1)
+    doc.add_paragraph(f"Address: {sp.get('address', 'N/A')}")
+    doc.add_paragraph(f"Above Grade SF: {sp.get('ag_sf', 'N/A')}")
+    doc.add_paragraph(f"Bedrooms: {sp.get('bedrooms', 'N/A')}")
+    doc.add_paragraph(f"Bathrooms: {sp.get('bathrooms', 'N/A')}")
+    doc.add_paragraph(f"Below Grade Finished: {sp.get('below_grade_finished', 0)}")
+    doc.add_paragraph(f"Below Grade Unfinished: {sp.get('below_grade_unfinished', 0)}")
+
+    doc.add_heading("Valuation Summary", level=1)
+    doc.add_paragraph(f"Online Estimate Average: {money(a['online_avg'])}")
+    doc.add_paragraph(f"Average Price Per SF: ${a['avg_ppsf']}")
+    doc.add_paragraph(f"Average Days in MLS: {a['avg_days']}")
+
+    doc.add_heading("Enhanced Property Overview", level=1)
+    doc.add_paragraph(commentary)
+
+    doc.add_heading("Online Estimates", level=1)
+    add_estimates_table(doc, a["estimates"])
+
+    doc.add_heading("Adjusted Comparable Properties", level=1)
+    add_comp_table(doc, comps_frame(analysis), ENHANCED_COLUMNS)
+
+    doc.add_heading("Ranges", level=1)
+    _ranges(doc, a)
+    rec_low, rec_high = recommended
+    doc.add_heading("Recommended Market Range", level=1)
+    doc.add_paragraph(f"Recommended Listing Range: {money(rec_low)} – {money(rec_high)}")
+    doc.add_paragraph("Policy: Target ≤ $75K spread. Wider ranges require explicit data-based rationale; avoid > $150K unless compelling reasons exist.")
+    return doc
+
+
+BUILDERS = {"backup": build_backup_report, "enhanced": build_enhanced_report}
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def render_report(kind, analysis, analysis_key=None, **inputs):
+    """DOCX bytes for a report kind, cached by analysis key and report inputs.
+
+    `analysis_key` is the artifact store key of `analysis`; when omitted the
+    analysis is hashed here.
+    """
+    key = (kind, analysis_key or content_key(analysis), content_key(inputs) if inputs else "")
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    doc = BUILDERS[kind](analysis, **inputs)
+    buf = io.BytesIO()
+    doc.save(buf)
+    data = buf.getvalue()
+
+    with _cache_lock:
+        _cache[key] = data
+        while len(_cache) > CACHE_ENTRIES:
+            _cache.popitem(last=False)
+    return data
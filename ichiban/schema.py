@@ -0,0 +1,141 @@
+"""Shared loader for market_adjustment_schema.json.
+
+The file is validated against SCHEMA_STRUCTURE and compiled once per process
+into low / mid / high CompiledSchema variants. Later calls only `stat` the
+file; it is re-read when the mtime or size changes and recompiled only if the
+content hash actually differs, so every session shares one compiled copy.
+"""
+
+import hashlib
+import json
+import threading
+from collections import namedtuple
+from numbers import Real
+from pathlib import Path
+
+from ichiban.adjustments import RATE_POINTS, compile_schema
+
+SCHEMA_FILENAME = "market_adjustment_schema.json"
+DEFAULT_SCHEMA_PATH = Path(__file__).resolve().parent.parent / SCHEMA_FILENAME
+
+
+class SchemaError(ValueError):
+    """The adjustment schema does not match SCHEMA_STRUCTURE."""
+
+
+# Type markers for the declared structure
+NUMBER = "number"
+RANGE = "range"        # a number or a [low, high] pair
+TEXT = "text"
+
+SCHEMA_STRUCTURE = {
+    "squareFootageAdjustments": [{
+        "priceRange": TEXT,
+        "aboveGrade": RANGE,
+        "basement": RANGE,
+        "basementFinished": RANGE,
+    }],
+    "garageAdjustment": {"perBayRange": RANGE, "tandemMultiplier": NUMBER},
+    "bathroomsAdjustment": {"halfBathroom": RANGE, "fullBathroom": RANGE},
+    "viewAdjustment": {"greenbeltPercent": RANGE, "mountainGolfPanoramicPercentRange": RANGE},
+    "walkoutBasementAdjustment": {"range": RANGE},
+    "gardenLevelAdjustment": {"range": RANGE},
+    "ageAdjustment": {"perYear": NUMBER},
+}
+# Sections that may be left out; everything else in SCHEMA_STRUCTURE is required
+OPTIONAL_SECTIONS = {"gardenLevelAdjustment", "ageAdjustment"}
+
+
+def _is_number(v):
+    return isinstance(v, Real) and not isinstance(v, bool)
+
+
+def _check(value, spec, where, errors):
+    if spec == NUMBER:
+        if not _is_number(value):
+            errors.append(f"{where}: expected a number, got {value!r}")
+    elif spec == RANGE:
+        if isinstance(value, list):
+            if len(value) != 2 or not all(_is_number(v) for v in value) or value[0] > value[1]:
+                errors.append(f"{where}: expected [low, high], got {value!r}")
+        elif not _is_number(value):
+            errors.append(f"{where}: expected a number or [low, high], got {value!r}")
+    elif spec == TEXT:
+        if not isinstance(value, str):
+            errors.append(f"{where}: expected text, got {value!r}")
+    elif isinstance(spec, list):
+        if not isinstance(value, list) or not value:
+            errors.append(f"{where}: expected a non-empty list")
+            return
+        for i, item in enumerate(value):
+            _check(item, spec[0], f"{where}[{i}]", errors)
+    elif isinstance(spec, dict):
+        if not isinstance(value, dict):
+            errors.append(f"{where}: expected an object")
+            return
+        for key, sub in spec.items():
+            if key in value:
+                _check(value[key], sub, f"{where}.{key}" if where else key, errors)
+            elif not (where == "" and key in OPTIONAL_SECTIONS):
+                errors.append(f"{where}.{key}: missing" if where else f"{key}: missing")
+
+
+def validate(raw):
+    """Raise SchemaError listing every structural problem in `raw`."""
+    errors = []
+    _check(raw, SCHEMA_STRUCTURE, "", errors)
+    if errors:
+        raise SchemaError("; ".join(errors))
+    return raw
+
+
+LoadedSchema = namedtuple("LoadedSchema", ["path", "digest", "raw", "compiled"])
+
+_cache = {}
+_stats = {}
+_lock = threading.Lock()
+
+
+def compile_all(raw):
+    """Validate `raw` and compile one CompiledSchema per rate point."""
+    validate(raw)
+    try:
+        return {point: compile_schema(raw, point) for point in RATE_POINTS}
+    except (KeyError, ValueError) as e:
+        raise SchemaError(str(e)) from e
+
+
+def load_schema(path=None):
+    """Return the cached LoadedSchema for `path`, re-reading only when the file changed.
+
+    The returned entry, including its `raw` dict, is shared process-wide and
+    must not be mutated; deep-copy `raw` before editing it (calibrated_schema does).
+
+    Raises FileNotFoundError if the file is missing and SchemaError if it is
+    not valid JSON or does not match SCHEMA_STRUCTURE.
+    """
+    path = Path(path) if path else DEFAULT_SCHEMA_PATH
+    key = str(path.resolve())
+    st = path.stat()
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None and _stats.get(key) == stamp:
+            return entry
+
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        if entry is None or entry.digest != digest:
+            try:
+                raw = json.loads(data)
+            except json.JSONDecodeError as e:
+                raise SchemaError(f"{path.name} is not valid JSON: {e}") from e
+            entry = LoadedSchema(key, digest, raw, compile_all(raw))
+            _cache[key] = entry
+        _stats[key] = stamp
+        return entry
+
+
+def load_compiled(point="mid", path=None):
+    """Shortcut for the compiled schema at one rate point."""
+    return load_schema(path).compiled[point]
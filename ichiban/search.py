@@ -0,0 +1,132 @@
+"""Indexed comp search over the cleaned comp frame.
+
+Each searchable attribute keeps a sorted copy of its values alongside the row
+positions, so range lookups are two binary searches instead of a full scan.
+A compound query starts from the most selective index and checks the other
+criteria only on those candidate rows.
+"""
+
+import numpy as np
+import pandas as pd
+
+STATUS_COLUMNS = ["Mls Status", "Standard Status", "status"]
+
+
+class SortedIndex:
+    """Sorted numeric values + their row positions (NaN rows are left out)."""
+
+    def __init__(self, values):
+        values = np.asarray(values, dtype="float64")
+        order = np.argsort(values, kind="stable")
+        keep = ~np.isnan(values[order])
+        self.positions = order[keep]
+        self.keys = values[self.positions]
+        self.values = values
+
+    def bounds(self, low=None, high=None):
+        lo = 0 if low is None else int(np.searchsorted(self.keys, low, side="left"))
+        hi = len(self.keys) if high is None else int(np.searchsorted(self.keys, high, side="right"))
+        return lo, max(lo, hi)
+
+    def count(self, low=None, high=None):
+        lo, hi = self.bounds(low, high)
+        return hi - lo
+
+    def lookup(self, low=None, high=None):
+        lo, hi = self.bounds(low, high)
+        return self.positions[lo:hi]
+
+    def mask(self, positions, low=None, high=None):
+        v = self.values[positions]
+        m = ~np.isnan(v)
+        if low is not None:
+            m &= v >= low
+        if high is not None:
+            m &= v <= high
+        return m
+
+
+class CategoryIndex:
+    """Row positions grouped by category value."""
+
+    def __init__(self, values):
+        codes, uniques = pd.factorize(pd.Series(values).astype("object"), sort=True)
+        self.codes = codes
+        self.categories = [str(u) for u in uniques]
+        order = np.argsort(codes, kind="stable")
+        starts = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+        self.groups = {cat: order[starts[i]:starts[i + 1]] for i, cat in enumerate(self.categories)}
+
+    def _codes_for(self, wanted):
+        return [self.categories.index(w) for w in wanted if w in self.groups]
+
+    def count(self, wanted):
+        return sum(len(self.groups[w]) for w in wanted if w in self.groups)
+
+    def lookup(self, wanted):
+        parts = [self.groups[w] for w in wanted if w in self.groups]
+        return np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.intp)
+
+    def mask(self, positions, wanted):
+        return np.isin(self.codes[positions], self._codes_for(wanted))
+
+
+def _date_values(series):
+    s = pd.to_datetime(series, errors="coerce", format="mixed")
+    # Days since epoch as float so NaT becomes NaN like the numeric indexes
+    return (s - pd.Timestamp("1970-01-01")).dt.total_seconds().to_numpy(dtype="float64") / 86400.0
+
+
+class CompIndex:
+    """Secondary indexes over a cleaned comp frame for fast compound queries."""
+
+    def __init__(self, df):
+        self.df = df
+        self.numeric = {}
+        for col in ["ag_sf", "bedrooms", "bathrooms"]:
+            if col in df.columns:
+                self.numeric[col] = SortedIndex(pd.to_numeric(df[col], errors="coerce"))
+        if "Close Date" in df.columns:
+            self.numeric["close_date"] = SortedIndex(_date_values(df["Close Date"]))
+        status_col = next((c for c in STATUS_COLUMNS if c in df.columns), None)
+        self.status = CategoryIndex(df[status_col]) if status_col else None
+
+    def __len__(self):
+        return len(self.df)
+
+    @property
+    def statuses(self):
+        return self.status.categories if self.status else []
+
+    def query(self, ag_sf=None, bedrooms=None, bathrooms=None, closed_since=None, status=None):
+        """Row positions (ascending) matching every given criterion.
+
+        Numeric criteria are `(low, high)` tuples (either side may be None),
+        `closed_since` is anything `pd.Timestamp` accepts and `status` is a list
+        of status values.
+        """
+        criteria = []
+        for col, rng in (("ag_sf", ag_sf), ("bedrooms", bedrooms), ("bathrooms", bathrooms)):
+            if rng is not None and col in self.numeric:
+                criteria.append((self.numeric[col], tuple(rng)))
+        if closed_since is not None and "close_date" in self.numeric:
+            since = (pd.Timestamp(closed_since) - pd.Timestamp("1970-01-01")).total_seconds() / 86400.0
+            criteria.append((self.numeric["close_date"], (since, None)))
+        if status and self.status is not None:
+            criteria.append((self.status, (list(status),)))
+
+        if not criteria:
+            return np.arange(len(self.df))
+
+        # Drive from the most selective index, then check the rest on its candidates
+        criteria.sort(key=lambda c: c[0].count(*c[1]))
+        index, args = criteria[0]
+        positions = index.lookup(*args)
+        for index, args in criteria[1:]:
+            if not len(positions):
+                break
+            positions = positions[index.mask(positions, *args)]
+        return np.sort(positions)
+
+    def frame(self, positions):
+        return self.df.iloc[positions]
@@ -0,0 +1,61 @@
+"""What-if surfaces over adjustment rates.
+
+A grid of (above-grade rate, finished-basement rate) pairs is broadcast
+against the adjusted-comp arrays, giving one row of prices per rate pair that
+goes straight into the Module 8 statistics. Rows are built and summarized in
+chunks of at most CELL_BUDGET prices, so memory stays flat however large the
+grid or comp set.
+"""
+
+import numpy as np
+
+from ichiban.instrument import traced
+from ichiban.summary import value_range_matrix
+
+# Prices (rate pairs x comps) summarized at once; value_range_matrix makes
+# several temporaries of this size
+CELL_BUDGET = 2_000_000
+
+
+def base_prices(comps):
+    """Adjusted price with the AG and finished-basement adjustments taken back out."""
+    price = comps["adjusted_price"].to_numpy(dtype="float64")
+    for col in ("ag_adj", "bgf_adj"):
+        if col in comps.columns:
+            price = price - np.nan_to_num(comps[col].to_numpy(dtype="float64"))
+    return price
+
+
+@traced()
+def sensitivity_surface(comps, ag_rates, bgf_rates):
+    """Normalized median / low / high for every (ag_rate, bgf_rate) pair.
+
+    The what-if rates are flat $/SF applied to every comp (they replace the
+    schema's price-tiered AG and finished-basement rates); all other
+    adjustments stay as computed by the engine. Returns a dict of
+    (len(ag_rates), len(bgf_rates)) arrays.
+    """
+    ag_rates = np.asarray(ag_rates, dtype="float64")
+    bgf_rates = np.asarray(bgf_rates, dtype="float64")
+    base = base_prices(comps)
+    ag_diff = np.nan_to_num(comps["ag_diff"].to_numpy(dtype="float64")) if "ag_diff" in comps.columns else np.zeros(len(base))
+    bgf_diff = np.nan_to_num(comps["bgf_diff"].to_numpy(dtype="float64")) if "bgf_diff" in comps.columns else np.zeros(len(base))
+    ag_sf = comps["ag_sf"].to_numpy(dtype="float64")
+
+    shape = (len(ag_rates), len(bgf_rates))
+    pairs = shape[0] * shape[1]
+    out = {name: np.empty(pairs) for name in ("norm_median", "norm_low", "norm_high", "average_ppsf")}
+    step = max(1, CELL_BUDGET // max(len(base), 1))
+    for start in range(0, pairs, step):
+        idx = np.arange(start, min(start + step, pairs))
+        ai, bi = np.divmod(idx, shape[1])
+        prices = base[None, :] + ag_rates[ai, None] * ag_diff[None, :] + bgf_rates[bi, None] * bgf_diff[None, :]
+        arrays, _ = value_range_matrix(prices, np.broadcast_to(ag_sf, prices.shape))
+        for name, values in out.items():
+            values[idx] = arrays[name]
+    return {
+        "median": out["norm_median"].reshape(shape),
+        "low": out["norm_low"].reshape(shape),
+        "high": out["norm_high"].reshape(shape),
+        "average_ppsf": out["average_ppsf"].reshape(shape),
+    }
@@ -0,0 +1,13 @@
+"""Per-session identity, kept free of heavy imports (every page loads it)."""
+
+import uuid
+
+# session_state key holding this session's namespace
+NAMESPACE_KEY = "_artifact_namespace"
+
+
+def session_namespace(state):
+    """Stable namespace for one Streamlit session (pass `st.session_state`)."""
+    if NAMESPACE_KEY not in state:
+        state[NAMESPACE_KEY] = uuid.uuid4().hex
+    return state[NAMESPACE_KEY]
@@ -0,0 +1,131 @@
+"""Subject-to-comp similarity scores and top-k selection.
+
+A Gower-style score over mixed features: each numeric feature contributes
+`1 - |subject - comp| / scale` (floored at 0), the basement type contributes an
+exact match, and a comp's score is the weighted mean over the features both
+the subject and the comp actually have, so missing data narrows the
+comparison instead of counting against the comp. Every comp is scored in one
+pass over a (features, comps) matrix; `top_k` then takes the best k with a
+partial sort, so ranking hundreds of thousands of candidates stays cheap.
+Module 8 turns the scores into weights (`summary.weighted_summary`).
+"""
+
+import numpy as np
+
+from ichiban.adjustments import BASEMENT_PATTERNS, _classify, _num, _text
+from ichiban.geo import coordinate_columns, haversine_miles
+from ichiban.instrument import traced
+from ichiban.search import _date_values
+
+# Relative importance of each feature (0 switches a feature off)
+DEFAULT_WEIGHTS = {
+    "ag_sf": 3.0,
+    "bedrooms": 1.0,
+    "bathrooms": 1.0,
+    "basement_sf": 1.0,
+    "basement_type": 0.5,
+    "age": 1.0,
+    "distance": 2.0,
+    "recency": 1.5,
+}
+# Difference at which a feature's similarity reaches 0. ag_sf is a fraction of
+# the subject's SF; recency is days before the newest sale in the set.
+SCALES = {
+    "ag_sf": 0.25,
+    "bedrooms": 2.0,
+    "bathrooms": 2.0,
+    "basement_sf": 1000.0,
+    "age": 40.0,
+    "distance": 3.0,
+    "recency": 365.0,
+}
+FEATURE_COLUMNS = ["ag_sf", "bedrooms", "bathrooms", "below_grade_finished", "below_grade_unfinished",
+                   "Year Built", "Basement", "Close Date", "distance_mi"]
+
+
+def _closeness(subject_value, comp_values, scale):
+    if subject_value is None or scale <= 0:
+        return np.full(len(comp_values), np.nan)
+    return np.clip(1.0 - np.abs(comp_values - float(subject_value)) / scale, 0.0, 1.0)
+
+
+def feature_similarities(comps, subject, distances=None):
+    """{feature: per-comp similarity in [0, 1]}, NaN where either side lacks the value.
+
+    `distances` (miles, aligned with `comps`) saves recomputing them when the
+    caller already has them, e.g. from the Module 4 location filter.
+    """
+    n = len(comps)
+    out = {}
+    ag_sf = subject.get("ag_sf") or None
+    out["ag_sf"] = _closeness(ag_sf, _num(comps, "ag_sf"), SCALES["ag_sf"] * float(ag_sf or 0))
+    out["bedrooms"] = _closeness(subject.get("bedrooms"), _num(comps, "bedrooms"), SCALES["bedrooms"])
+    out["bathrooms"] = _closeness(subject.get("bathrooms"), _num(comps, "bathrooms"), SCALES["bathrooms"])
+    out["age"] = _closeness(subject.get("year_built"), _num(comps, "Year Built"), SCALES["age"])
+
+    # Basement size counts finished SF fully and unfinished SF at half
+    subject_bg = subject.get("below_grade_finished")
+    if subject_bg is not None:
+        subject_bg = float(subject_bg) + 0.5 * float(subject.get("below_grade_unfinished") or 0)
+    comp_bg = _num(comps, "below_grade_finished", 0.0) + 0.5 * _num(comps, "below_grade_unfinished", 0.0)
+    out["basement_sf"] = _closeness(subject_bg, comp_bg, SCALES["basement_sf"])
+
+    subject_type = subject.get("basement_type")
+    if subject_type is not None and "Basement" in comps.columns:
+        kinds = _classify(_text(comps, "Basement"), BASEMENT_PATTERNS)
+        out["basement_type"] = (kinds == subject_type).astype("float64")
+    else:
+        out["basement_type"] = np.full(n, np.nan)
+
+    if distances is None and "distance_mi" in comps.columns:
+        distances = _num(comps, "distance_mi")
+    lat, lon = subject.get("latitude"), subject.get("longitude")
+    if distances is None and lat and lon:
+        lat_col, lon_col = coordinate_columns(comps)
+        if lat_col:
+            distances = haversine_miles(float(lat), float(lon), _num(comps, lat_col), _num(comps, lon_col))
+    out["distance"] = (_closeness(0.0, np.asarray(distances, dtype="float64"), SCALES["distance"])
+                       if distances is not None else np.full(n, np.nan))
+
+    if "Close Date" in comps.columns:
+        days = _date_values(comps["Close Date"])
+        newest = np.nanmax(days) if np.isfinite(days).any() else np.nan
+        out["recency"] = _closeness(newest, days, SCALES["recency"])
+    else:
+        out["recency"] = np.full(n, np.nan)
+    return out
+
+
+@traced()
+def similarity_scores(comps, subject, weights=None, positions=None, distances=None):
+    """Similarity of each comp (or of `comps.iloc[positions]`) to the subject, in [0, 1].
+
+    NaN for comps sharing no feature with the subject.
+    """
+    if positions is not None:
+        comps = comps[[c for c in FEATURE_COLUMNS + list(coordinate_columns(comps)) if c in comps.columns]].iloc[positions]
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    features = feature_similarities(comps, subject, distances)
+    names = [f for f in features if weights.get(f, 0) > 0]
+    if not names:
+        return np.full(len(comps), np.nan)
+    sims = np.vstack([features[f] for f in names])
+    w = np.array([weights[f] for f in names], dtype="float64")[:, None]
+    present = ~np.isnan(sims)
+    total = (w * present).sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(total > 0, (w * np.where(present, sims, 0.0)).sum(axis=0) / total, np.nan)
+
+
+def top_k(scores, k):
+    """Positions of the `k` highest scores, best first; NaN scores are never selected."""
+    scores = np.asarray(scores, dtype="float64")
+    ranked = np.flatnonzero(~np.isnan(scores))
+    if k <= 0 or not len(ranked):
+        return ranked[:0]
+    values = scores[ranked]
+    if k < len(ranked):
+        # O(n) selection of the best k, then a sort of just those k
+        best = np.argpartition(-values, k - 1)[:k]
+        ranked, values = ranked[best], values[best]
+    return ranked[np.argsort(-values, kind="stable")]
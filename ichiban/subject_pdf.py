@@ -0,0 +1,227 @@
+"""Subject-property PDF extraction for Module 2.
+
+The PDF is parsed once per content hash: pages are extracted (on a shared
+pool of spawned worker processes for long documents, since MuPDF is not
+thread-safe), the text goes through precompiled field patterns, and the
+result is cached in memory and as JSON on disk so reruns are instant.
+"""
+
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from ichiban.ingest import fingerprint
+from ichiban.instrument import traced
+from ichiban.lazy import lazy_import
+
+# PyMuPDF, loaded on the first PDF upload
+fitz = lazy_import("fitz")
+
+DEFAULT_CACHE_DIR = Path(os.environ.get("ICHIBAN_CACHE_DIR", Path(__file__).resolve().parent.parent / ".ichiban_cache")) / "subject_pdf"
+# Bump when the extracted fields change so stale cache entries are not served
+EXTRACT_VERSION = 2
+# Documents shorter than this are extracted in-process (a pool costs more than it saves)
+PARALLEL_MIN_PAGES = 8
+MEMORY_ENTRIES = 32
+DISK_MAX_BYTES = 64 * 1024 * 1024
+DISK_MAX_ENTRIES = 256
+# Extracted text kept in the result (Module 2 only previews it; fields are parsed from all of it)
+MAX_TEXT_CHARS = 20_000
+
+_NUM = r"(\d[\d,]*(?:\.\d+)?)"
+# First matching pattern wins; labels follow common MLS / listing-sheet wording
+FIELD_PATTERNS = {
+    "address": [
+        # Anchored to the line start so "Agent Email Address:" / "Mailing Address:" don't match
+        re.compile(r"^[ \t]*(?:Property\s+|Subject\s+|Street\s+)?Address[ \t]*[:#]?[ \t]*(.+)", re.I | re.M),
+        re.compile(r"^\s*(\d{1,6}\s+(?:[NSEW]\.?\s+)?[A-Za-z0-9 .'-]+?\s+(?:St|Street|Ave|Avenue|Rd|Road|Dr|Drive|Ln|Lane|Ct|Court|"
+                   r"Cir|Circle|Way|Pl|Place|Blvd|Boulevard|Pkwy|Parkway|Trl|Trail|Ter|Terrace)\b.*)$", re.I | re.M),
+    ],
+    "ag_sf": [
+        re.compile(r"Above\s+Grade\s+(?:Finished\s+)?(?:Area|SF|Sq\.?\s*Ft\.?|Square\s+Feet)\s*[:\-]?\s*" + _NUM, re.I),
+        re.compile(r"\bAGSF\s*[:\-]?\s*" + _NUM, re.I),
+    ],
+    # "4 Beds" (value first, same line) is tried before "Bedrooms Total: 4"
+    "bedrooms": [
+        re.compile(r"(?<![\d,.])(\d+)[ \t]*(?:Bedrooms|Beds|BR)\b", re.I),
+        re.compile(r"(?:Total\s+)?(?:Bedrooms|Beds)(?:\s+Total)?\s*[:\-]?\s*(\d+)", re.I),
+    ],
+    "bathrooms": [
+        re.compile(r"(?<![\d,.])(\d+(?:\.\d+)?)[ \t]*(?:Bathrooms|Baths|BA)\b", re.I),
+        re.compile(r"(?:Total\s+)?(?:Bathrooms|Baths)(?:\s+Total)?(?:\s+Integer)?\s*[:\-]?\s*(\d+(?:\.\d+)?)", re.I),
+    ],
+    "below_grade_finished": [
+        re.compile(r"Below\s+Grade\s+Finished\s+(?:Area|SF|Sq\.?\s*Ft\.?|Square\s+Feet)\s*[:\-]?\s*" + _NUM, re.I),
+        re.compile(r"(?:Finished\s+Basement|Basement\s+Finished)(?:\s+(?:Area|SF|Sq\.?\s*Ft\.?))?\s*[:\-]?\s*" + _NUM, re.I),
+    ],
+    "below_grade_unfinished": [
+        re.compile(r"Below\s+Grade\s+Unfinished\s+(?:Area|SF|Sq\.?\s*Ft\.?|Square\s+Feet)\s*[:\-]?\s*" + _NUM, re.I),
+        re.compile(r"(?:Unfinished\s+Basement|Basement\s+Unfinished)(?:\s+(?:Area|SF|Sq\.?\s*Ft\.?))?\s*[:\-]?\s*" + _NUM, re.I),
+    ],
+}
+INTEGER_FIELDS = {"ag_sf", "bedrooms", "below_grade_finished", "below_grade_unfinished"}
+
+
+def parse_fields(text):
+    """Subject fields found in the extracted text (missing fields are left out)."""
+    fields = {}
+    for name, patterns in FIELD_PATTERNS.items():
+        for pattern in patterns:
+            m = pattern.search(text)
+            if not m:
+                continue
+            raw = m.group(1).strip()
+            if name == "address":
+                # Labels on the same line (e.g. "Address: 1 Main St   Price: ...") end the value
+                value = re.split(r"\s{2,}|\t|\s+\|\s+", raw)[0].strip(" ,")
+                if not value:
+                    continue
+            else:
+                number = float(raw.replace(",", ""))
+                value = int(round(number)) if name in INTEGER_FIELDS else number
+            fields[name] = value
+            break
+    return fields
+
+
+def _page_range_text(path, start, stop):
+    with fitz.open(path) as doc:
+        return [doc[i].get_text() for i in range(start, stop)]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(max_workers):
+    """Process pool shared by every session, started once with "spawn" (forking the threaded server is unsafe)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def extract_pages(data, max_workers=4):
+    """Text of every page, in order; long documents are split across worker processes."""
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        n = doc.page_count
+        if n < PARALLEL_MIN_PAGES or max_workers <= 1 or (os.cpu_count() or 1) <= 1:
+            return [page.get_text() for page in doc]
+    workers = min(max_workers, os.cpu_count() or 1, n)
+    step = -(-n // workers)
+    ranges = [(i, min(i + step, n)) for i in range(0, n, step)]
+    # Workers read the PDF from a temp file rather than each receiving a pickled copy
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        chunks = _get_pool(max_workers).map(_page_range_text, [path] * len(ranges), *zip(*ranges))
+        return [text for chunk in chunks for text in chunk]
+    finally:
+        os.unlink(path)
+
+
+class ExtractionCache:
+    """Extraction results by PDF hash: small in-memory LRU over JSON files.
+
+    Reads touch a file's mtime; the least recently used files are deleted once
+    the directory exceeds `max_bytes` or `max_files`.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_entries=MEMORY_ENTRIES,
+                 max_bytes=DISK_MAX_BYTES, max_files=DISK_MAX_ENTRIES):
+        self.directory = Path(directory) if directory else None
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return self.directory / f"{key}-v{EXTRACT_VERSION}.json"
+
+    def get(self, key):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        if self.directory is None:
+            return None
+        try:
+            result = json.loads(self._path(key).read_text(encoding="utf-8"))
+            os.utime(self._path(key))
+        except (OSError, ValueError):
+            return None
+        self._remember(key, result)
+        return result
+
+    def put(self, key, result):
+        self._remember(key, result)
+        if self.directory is not None:
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._path(key).write_text(json.dumps(result), encoding="utf-8")
+            except OSError:
+                return
+            self.evict()
+
+    def evict(self):
+        entries = []
+        for p in self.directory.glob("*.json"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        while entries and (total > self.max_bytes or len(entries) > self.max_files):
+            _, size, p = entries.pop(0)
+            try:
+                p.unlink()
+            except OSError:
+                pass
+            total -= size
+
+    def _remember(self, key, result):
+        with self._lock:
+            self._items[key] = result
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+
+_default_cache = None
+
+
+def default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ExtractionCache()
+    return _default_cache
+
+
+@traced()
+def extract_subject(data, cache=None, max_workers=4):
+    """Return `(result, from_cache)` for the PDF bytes.
+
+    `result` has `fields` (prefill values), `pages` and `text` (the first
+    MAX_TEXT_CHARS characters).
+    """
+    cache = cache or default_cache()
+    key = fingerprint(data)
+    result = cache.get(key)
+    if result is not None:
+        return result, True
+    pages = extract_pages(data, max_workers=max_workers)
+    text = "\n".join(pages)
+    result = {"key": key, "pages": len(pages), "fields": parse_fields(text), "text": text[:MAX_TEXT_CHARS]}
+    cache.put(key, result)
+    return result, False
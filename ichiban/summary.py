@@ -0,0 +1,311 @@
+"""Module 8 valuation statistics: raw / outlier-filtered / normalized ranges,
+plus the similarity-weighted band when comps carry similarity scores.
+
+Kept free of Streamlit so the same numbers come out of the page and the
+headless batch runner.
+"""
+
+import numpy as np
+import pandas as pd
+
+from ichiban.instrument import traced
+
+MAX_SPREAD = 150_000.0
+REMARKS_COLUMNS = ["Public Remarks", "PublicRemarks", "PUBLIC REMARKS", "public_remarks", "Remarks"]
+OUTLIER_METHOD = "IQR + PPSF band; normalized 20–80th; $150K cap around median"
+
+
+@traced()
+def prepare_comps(comps, remarks=None):
+    """Numeric price/adjustment columns, total_adjustments, days_in_mls and remarks.
+
+    `remarks` (a `compact.RemarksStore`) supplies the text for compact frames
+    whose remarks column was moved out of line.
+    """
+    # Shallow: with copy-on-write the new columns never touch the caller's frame
+    comps = comps.copy(deep=False)
+    for col in ["ag_sf", "net_price", "ag_adj", "bgf_adj", "bgu_adj", "adjusted_price"]:
+        if col in comps.columns:
+            comps[col] = pd.to_numeric(comps[col], errors="coerce")
+
+    # Total Adjustments
+    for col in ["ag_adj", "bgf_adj", "bgu_adj"]:
+        if col not in comps.columns:
+            comps[col] = 0
+    if "total_adjustments" not in comps.columns:
+        comps["total_adjustments"] = comps["ag_adj"].fillna(0) + comps["bgf_adj"].fillna(0) + comps["bgu_adj"].fillna(0)
+
+    # Days in MLS
+    if "Days In MLS" in comps.columns:
+        s = pd.to_numeric(comps["Days In MLS"], errors="coerce")
+    elif "days_in_mls" in comps.columns:
+        s = pd.to_numeric(comps["days_in_mls"], errors="coerce")
+    else:
+        s = pd.Series(np.nan, index=comps.index, dtype="float64")
+    comps["days_in_mls"] = s
+
+    # Remarks
+    remarks_found = [c for c in REMARKS_COLUMNS if c in comps.columns]
+    if remarks_found:
+        comps["public_remarks"] = comps[remarks_found[0]].astype(str).fillna("")
+    elif remarks is not None:
+        comps["public_remarks"] = remarks.lookup(comps.index).astype(str)
+    else:
+        comps["public_remarks"] = ""
+    comps["remarks_snippet"] = comps["public_remarks"].str.slice(0, 400)
+    return comps
+
+
+def average_days(comps):
+    s = comps["days_in_mls"]
+    return int(s.mean()) if s.notna().any() else "N/A"
+
+
+def _row_quantiles(sorted_rows, counts, qs):
+    """Linear-interpolated quantiles of each row's first `counts[i]` (sorted) values.
+
+    Returns shape (rows, len(qs)); NaN for rows with no values.
+    """
+    last = np.maximum(counts - 1, 0)[:, None]
+    pos = np.asarray(qs, dtype="float64")[None, :] * last
+    lo = np.floor(pos).astype(np.intp)
+    hi = np.minimum(lo + 1, last)
+    a = np.take_along_axis(sorted_rows, lo, axis=1)
+    b = np.take_along_axis(sorted_rows, hi, axis=1)
+    out = a + (b - a) * (pos - lo)
+    out[counts == 0] = np.nan
+    return out
+
+
+def _sorted_rows(matrix, mask):
+    """Row-wise sort of `matrix` with masked-out cells pushed to the end as NaN."""
+    rows = np.where(mask, matrix, np.nan)
+    rows.sort(axis=1)
+    return rows, np.count_nonzero(mask, axis=1)
+
+
+def value_range_matrix(prices, ag_sf):
+    """Module 8 statistics for a (groups, comps) matrix; NaN prices are padding / missing.
+
+    Each row is one comp set. The three filter stages (price IQR, PPSF IQR,
+    survivors) are one row-wise sort each over the whole matrix, instead of
+    separate quantile calls and filtered copies per comp set.
+    Returns `(arrays, keep)` where `keep` has the matrix's shape.
+    """
+    prices = np.asarray(prices, dtype="float64")
+    ag_sf = np.asarray(ag_sf, dtype="float64")
+    n_groups = prices.shape[0]
+    row_counts = np.count_nonzero(~np.isnan(prices), axis=1)
+
+    # Price quartiles plus the unfiltered 20/50/80 fallback, and raw min/max, from one sort
+    valid = ~np.isnan(prices)
+    sorted_prices, counts = _sorted_rows(prices, valid)
+    pq = _row_quantiles(sorted_prices, counts, [0.25, 0.75, 0.20, 0.50, 0.80])
+    raw_low = sorted_prices[:, 0] if prices.shape[1] else np.full(n_groups, np.nan)
+    raw_high = np.take_along_axis(sorted_prices, np.maximum(counts - 1, 0)[:, None], axis=1)[:, 0] if prices.shape[1] else raw_low
+
+    # Avg PPSF
+    total_sf = np.nansum(ag_sf, axis=1)
+    total_price = np.nansum(prices, axis=1)
+
+    # Outlier filter (IQR + PPSF)
+    iqr = pq[:, 1] - pq[:, 0]
+    low_cut = pq[:, 0] - 1.5 * iqr; high_cut = pq[:, 1] + 1.5 * iqr
+    keep = (prices >= low_cut[:, None]) & (prices <= high_cut[:, None])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ppsf = np.where(ag_sf != 0, prices / ag_sf, np.nan)
+    ppsf_q = _row_quantiles(*_sorted_rows(ppsf, keep & ~np.isnan(ppsf)), [0.25, 0.75])
+    ppsf_iqr = ppsf_q[:, 1] - ppsf_q[:, 0]
+    ppsf_low = ppsf_q[:, 0] - 1.5 * ppsf_iqr; ppsf_high = ppsf_q[:, 1] + 1.5 * ppsf_iqr
+    keep &= (ppsf >= ppsf_low[:, None]) & (ppsf <= ppsf_high[:, None])
+
+    # Normalized range + 150k cap (groups with no survivors fall back to all prices)
+    sorted_kept, kept_counts = _sorted_rows(prices, keep)
+    nq = _row_quantiles(sorted_kept, kept_counts, [0.20, 0.50, 0.80])
+    nq = np.where((kept_counts > 0)[:, None], nq, pq[:, 2:])
+    norm_low, norm_median, norm_high = nq[:, 0].copy(), nq[:, 1], nq[:, 2].copy()
+    capped = norm_high - norm_low > MAX_SPREAD
+    half = MAX_SPREAD / 2.0
+    norm_low[capped] = np.maximum(raw_low, norm_median - half)[capped]
+    norm_high[capped] = np.minimum(raw_high, norm_median + half)[capped]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        avg_ppsf = np.where(total_sf > 0, np.round(total_price / total_sf, 2), 0.0)
+    arrays = {
+        "raw_low": raw_low, "raw_high": raw_high,
+        "norm_low": norm_low, "norm_high": norm_high, "norm_median": norm_median,
+        "average_ppsf": avg_ppsf,
+        "low_cut": low_cut, "high_cut": high_cut, "ppsf_low": ppsf_low, "ppsf_high": ppsf_high,
+        "filtered_count": kept_counts, "total_count": row_counts,
+    }
+    return arrays, keep
+
+
+def value_range_arrays(prices, ag_sf, groups, n_groups=None):
+    """Module 8 statistics for many comp sets at once, as arrays indexed by group.
+
+    `groups` assigns each comp row to a subject (integer codes 0..n_groups-1).
+    Groups are bucketed by size (powers of two) and each bucket's rows are
+    scattered into its own NaN-padded (groups, max comps) matrix for
+    value_range_matrix, so padding stays under 2x the data even when one
+    large group sits next to thousands of small ones. Returns
+    `(arrays, keep)` with `keep` per input row.
+    """
+    prices = np.asarray(prices, dtype="float64")
+    ag_sf = np.asarray(ag_sf, dtype="float64")
+    groups = np.asarray(groups, dtype=np.intp)
+    n_groups = (int(groups.max()) + 1 if len(groups) else 0) if n_groups is None else n_groups
+
+    sizes = np.bincount(groups, minlength=n_groups)
+    order = np.argsort(groups, kind="stable")
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    slot = np.empty(len(groups), dtype=np.intp)
+    slot[order] = np.arange(len(groups)) - starts[groups[order]]
+
+    size_class = np.ceil(np.log2(np.maximum(sizes, 1))).astype(np.intp)
+    row_class = size_class[groups]
+    local = np.empty(n_groups, dtype=np.intp)
+    arrays, keep = {}, np.zeros(len(groups), dtype=bool)
+    for c in np.unique(size_class):
+        members = np.flatnonzero(size_class == c)
+        local[members] = np.arange(len(members))
+        rows = np.flatnonzero(row_class == c)
+        g, s = local[groups[rows]], slot[rows]
+        # Buckets of empty groups still need one (all-NaN) column
+        width = max(int(sizes[members].max()), 1)
+        price_m = np.full((len(members), width), np.nan)
+        sf_m = np.full((len(members), width), np.nan)
+        price_m[g, s] = prices[rows]
+        sf_m[g, s] = ag_sf[rows]
+        part, keep_m = value_range_matrix(price_m, sf_m)
+        for name, values in part.items():
+            if name not in arrays:
+                arrays[name] = np.empty(n_groups, dtype=values.dtype)
+            arrays[name][members] = values
+        keep[rows] = keep_m[g, s]
+    if not arrays:
+        arrays, _ = value_range_matrix(np.full((0, 1), np.nan), np.full((0, 1), np.nan))
+    arrays["total_count"] = sizes
+    return arrays, keep
+
+
+def value_ranges(prices, ag_sf, groups, n_groups=None):
+    """Module 8 statistics for many comp sets at once.
+
+    Returns `(stats_list, keep)` with one stats dict per group, in group order,
+    carrying the same fields (and outlier_notes) as the Module 8 summary.
+    """
+    a, keep = value_range_arrays(prices, ag_sf, groups, n_groups)
+    stats = []
+    for g in range(len(a["raw_low"])):
+        stats.append({
+            "adjusted_price_range": [float(a["raw_low"][g]), float(a["raw_high"][g])],
+            "normalized_range": [float(a["norm_low"][g]), float(a["norm_high"][g])],
+            "normalized_median": float(a["norm_median"][g]),
+            "average_ppsf": float(a["average_ppsf"][g]),
+            "outlier_notes": {
+                "method": OUTLIER_METHOD,
+                "price_iqr_low_cut": float(a["low_cut"][g]), "price_iqr_high_cut": float(a["high_cut"][g]),
+                "ppsf_low": float(a["ppsf_low"][g]), "ppsf_high": float(a["ppsf_high"][g]),
+                "filtered_count": int(a["filtered_count"][g]), "total_count": int(a["total_count"][g])
+            },
+        })
+    return stats, keep
+
+
+@traced()
+def value_range(prices, ag_sf):
+    """Raw range, average PPSF, IQR + PPSF outlier filter and the capped 20–80th band.
+
+    Returns `(stats, keep)` where `keep` marks the comps surviving both filters.
+    """
+    prices = np.asarray(prices, dtype="float64")
+    stats, keep = value_ranges(prices, ag_sf, np.zeros(len(prices), dtype=np.intp), n_groups=1)
+    return stats[0], keep
+
+
+def weighted_quantiles(values, weights, qs):
+    """Quantiles of `values` under `weights` (midpoint interpolation; NaNs and zero weights ignored)."""
+    values = np.asarray(values, dtype="float64")
+    weights = np.asarray(weights, dtype="float64")
+    ok = ~np.isnan(values) & ~np.isnan(weights) & (weights > 0)
+    if not ok.any():
+        return np.full(len(qs), np.nan)
+    values, weights = values[ok], weights[ok]
+    order = np.argsort(values, kind="stable")
+    values, weights = values[order], weights[order]
+    cum = np.cumsum(weights)
+    points = (cum - 0.5 * weights) / cum[-1]
+    return np.interp(qs, points, values)
+
+
+def weighted_summary(prices, ag_sf, weights, keep=None):
+    """Similarity-weighted 20/50/80th prices and PPSF over the comps in `keep` (all when None).
+
+    `effective_comps` is Kish's effective sample size, (sum w)^2 / sum w^2: how
+    many equally weighted comps the weighted result is worth. Returns {} when
+    no kept comp with a price has a weight (e.g. no similarity scores, or an
+    all-False `keep`).
+    """
+    prices = np.asarray(prices, dtype="float64")
+    ag_sf = np.asarray(ag_sf, dtype="float64")
+    weights = np.nan_to_num(np.asarray(weights, dtype="float64"), nan=0.0)
+    if keep is not None:
+        weights = np.where(keep, weights, 0.0)
+    # Comps without a price carry no weight in any of the statistics
+    weights = np.where(np.isnan(prices), 0.0, weights)
+    if not weights.sum() > 0:
+        return {}
+    low, median, high = weighted_quantiles(prices, weights, [0.20, 0.50, 0.80])
+    has_sf = ~np.isnan(prices) & ~np.isnan(ag_sf) & (ag_sf > 0)
+    w_sf = np.where(has_sf, weights, 0.0)
+    sf_total = float((w_sf * np.where(has_sf, ag_sf, 0.0)).sum())
+    price_total = float((w_sf * np.where(has_sf, prices, 0.0)).sum())
+    w_sum, w_sq = float(weights.sum()), float((weights ** 2).sum())
+    return {
+        "weighted_range": [float(low), float(high)],
+        "weighted_median": float(median),
+        "weighted_ppsf": round(price_total / sf_total, 2) if sf_total > 0 else 0.0,
+        "effective_comps": round(w_sum ** 2 / w_sq, 1) if w_sq > 0 else 0.0,
+    }
+
+
+# Resampled values held in memory at once; larger runs are processed in blocks
+BOOTSTRAP_BLOCK = 4_000_000
+
+
+@traced()
+def bootstrap_range(prices, n_resamples=10_000, confidence=0.90, seed=None, qs=(0.20, 0.50, 0.80)):
+    """Bootstrap confidence intervals for the band edges and median of `prices`.
+
+    Every resample is a row of one (n_resamples, n) index matrix; the 20/50/80th
+    order statistics of all rows come from a single `np.partition` call per
+    block, so there is no Python loop per resample.
+    """
+    prices = np.asarray(prices, dtype="float64")
+    prices = prices[~np.isnan(prices)]
+    n = len(prices)
+    if n < 2:
+        return None
+    rng = np.random.default_rng(seed)
+
+    pos = np.asarray(qs, dtype="float64") * (n - 1)
+    lo = np.floor(pos).astype(np.intp)
+    hi = np.minimum(lo + 1, n - 1)
+    kth = np.unique(np.concatenate([lo, hi]))
+
+    block = max(1, BOOTSTRAP_BLOCK // n)
+    stats = np.empty((n_resamples, len(qs)))
+    for start in range(0, n_resamples, block):
+        rows = min(block, n_resamples - start)
+        sample = prices[rng.integers(0, n, size=(rows, n))]
+        sample.partition(kth, axis=1)
+        stats[start:start + rows] = sample[:, lo] + (sample[:, hi] - sample[:, lo]) * (pos - lo)
+
+    alpha = (1.0 - confidence) / 2.0
+    bounds = np.quantile(stats, [alpha, 1.0 - alpha], axis=0)
+    names = {0.20: "low", 0.50: "median", 0.80: "high"}
+    result = {"confidence": confidence, "resamples": int(n_resamples), "sample_size": int(n)}
+    for i, q in enumerate(qs):
+        result[names.get(q, f"q{int(q * 100)}")] = [float(bounds[0, i]), float(bounds[1, i])]
+    return result
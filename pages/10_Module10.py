@@ -1,12 +1,32 @@
 import streamlit as st
-import json
+
+from ichiban.analysis_format import comp_count, comps_frame, loads
+from ichiban.artifacts import get_store, session_namespace
+from ichiban.instrument import show_diagnostics
 
 st.set_page_config(page_title="Module 10: Review JSON", page_icon="🧾")
 st.title("🧾 Module 10: Review Valuation JSON")
+trace = show_diagnostics()
+
+namespace = session_namespace(st.session_state)
+
+# Reload a saved analysis (JSON or binary) instead of re-running Modules 1–8
+saved = st.file_uploader("Load a saved analysis (optional)", type=["json", "ichban"])
+if saved is not None:
+    try:
+        with trace.span("module10.load_analysis"):
+            loaded = loads(saved.getvalue())
+    except (ValueError, KeyError) as e:
+        st.error(f"❌ Could not read {saved.name}: {e}")
+    else:
+        st.session_state["analysis_key"] = get_store().put(namespace, "analysis", loaded)
+        st.success(f"✅ Loaded {saved.name}; Modules 9 and 11 will use it.")
+
+data = get_store().latest(namespace, "analysis")
+if data is None:
+    st.error("❌ No analysis found for this session. Please run Module 8 first.")
+    st.stop()
 
-try:
-    with open("module9_analysis.json", "r") as f:
-        data = json.load(f)
-    st.json(data)
-except Exception as e:
-    st.error(f"Error reading JSON: {e}")
\ No newline at end of file
+st.json({k: v for k, v in data.items() if k != "comps"})
+st.subheader(f"Comps ({comp_count(data)})")
+st.dataframe(comps_frame(data))
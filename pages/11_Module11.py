@@ -1,27 +1,24 @@
 
-import json
-from pathlib import Path
 import streamlit as st
-from docx import Document
 
-# OpenAI (optional)
-try:
-    from openai import OpenAI
-except Exception:
-    OpenAI = None
+from ichiban.analysis_format import comps_frame
+from ichiban.artifacts import content_key, get_store, session_namespace
+from ichiban.instrument import show_diagnostics
+from ichiban.jobs import get_queue
+from ichiban.llm import LLMClient
+from ichiban.prompts import DEFAULT_BUDGET, build_prompt, outlier_summary, remarks_index, subject_query
+from ichiban.reports import money, render_report
 
 st.set_page_config(page_title="Module 11: GPT Market Review (Fixed JSON Source)", page_icon="🤖")
 st.title("🤖 Module 11: GPT Commentary & Enhanced Report — Fixed JSON Source")
+trace = show_diagnostics()
 
-# --- Load JSON produced by Module 8
-json_path = Path("module9_analysis.json")
-if not json_path.exists():
-    st.error("❌ Could not find 'module9_analysis.json'. Please run Module 8 first.")
+# --- Load the analysis Module 8 published for this session
+summary = get_store().latest(session_namespace(st.session_state), "analysis")
+if summary is None:
+    st.error("❌ No analysis found for this session. Please run Module 8 first.")
     st.stop()
 
-with open(json_path, "r") as f:
-    summary = json.load(f)
-
 subject = summary.get("subject_property", {})
 online_avg = summary.get("online_estimate_average", 0)
 raw_low, raw_high = summary.get("adjusted_price_range", [0, 0])
@@ -29,7 +26,7 @@ norm_low, norm_high = summary.get("normalized_range", [raw_low, raw_high])
 norm_median = summary.get("normalized_median", (norm_low + norm_high) / 2)
 avg_ppsf = summary.get("average_ppsf", 0)
 days_mls = summary.get("average_days_in_mls", "N/A")
-comps = summary.get("comps", [])
+comps = comps_frame(summary)
 outlier_notes = summary.get("outlier_notes", {})
 estimates = summary.get("online_estimates", {})
 
@@ -37,12 +34,6 @@ zillow_val = estimates.get("zillow")
 redfin_val = estimates.get("redfin")
 real_avm_val = estimates.get("real_avm")
 
-def money(v):
-    try:
-        return f"${float(v):,.0f}"
-    except Exception:
-        return str(v)
-
 # Snapshot (shows Days in MLS explicitly)
 st.subheader("📊 Valuation Snapshot")
 st.write(f"Online Estimate Avg: {money(online_avg)}")
@@ -51,10 +42,17 @@ st.write(f"Average Days in MLS: {days_mls}")
 st.write(f"Raw Range: {money(raw_low)} – {money(raw_high)}")
 st.write(f"Normalized Range: {money(norm_low)} – {money(norm_high)} (median {money(norm_median)})")
 
-# Remarks block (limited)
-remarks_snippets = [c.get("remarks_snippet", "") for c in comps if c.get("remarks_snippet")]
-remarks_snippets = remarks_snippets[:5]
-remarks_block = "\n".join(f"- {s}" for s in remarks_snippets) if remarks_snippets else "No notable public remarks provided."
+# Remarks ranked by relevance to the subject (index built once per analysis)
+namespace = session_namespace(st.session_state)
+analysis_key = get_store().latest_key(namespace, "analysis")
+remarks = comps["remarks_snippet"].tolist() if "remarks_snippet" in comps.columns else []
+with trace.span("module11.remarks_index", rows=len(remarks)):
+    index = remarks_index(remarks, analysis_key)
+c1, c2 = st.columns([3, 1])
+with c1:
+    focus = st.text_input("Subject features to match in comp remarks (optional)", placeholder="e.g. updated kitchen, mountain views")
+with c2:
+    budget = st.number_input("Prompt token budget", min_value=300, max_value=8000, value=DEFAULT_BUDGET, step=100)
 
 # Recommend range inside normalized (≤ $75K target)
 def propose_list_range(low, high, median, target=75_000.0):
@@ -75,7 +73,7 @@ Final Review Rules:
 5) Use comp remarks for qualitative nuance.
 """
 
-prompt = f"""
+template = f"""
 You are a senior real estate pricing analyst. Produce:
 - 4–7 bullets (market position, comp alignment, demand cues, risks)
 - Short paragraph with strategy and recommended range
@@ -100,11 +98,11 @@ Online Estimates:
 - Redfin: {money(redfin_val) if redfin_val is not None else "N/A"}
 - Real AVM: {money(real_avm_val) if real_avm_val is not None else "N/A"}
 
-Comp Remarks (snippets):
-{remarks_block}
+Comp Remarks (most relevant):
+{{remarks}}
 
 Outlier Notes:
-{json.dumps(outlier_notes, indent=2)}
+{outlier_summary(outlier_notes, money)}
 
 {rules}
 
@@ -113,13 +111,24 @@ Your response must:
 - If this still exceeds $75K, explain why it is acceptable or propose a tightened alternative.
 """.strip()
 
+with trace.span("module11.build_prompt"):
+    prompt, prompt_info = build_prompt(template, index, subject_query(subject, focus), budget=int(budget))
+remarks_used = prompt_info["remarks_used"]
+
 st.subheader("🔎 Prompt Preview")
+st.caption(
+    f"~{prompt_info['tokens']:,} tokens of {prompt_info['budget']:,} budget · "
+    f"{remarks_used} of {prompt_info['remarks_available']} remarks "
+    f"({prompt_info['duplicates_removed']} near-duplicates dropped)"
+)
+if prompt_info["over_budget"]:
+    st.warning("The fixed part of the prompt alone exceeds the token budget; raise the budget.")
 st.code(prompt)
 
-# GPT call with auto-fallback
-api_key = st.secrets.get("general", {}).get("openai_key", "")
-gpt_commentary = None
-used_fallback = False
+# GPT call with auto-fallback (runs as a background job; the page stays responsive)
+general = st.secrets.get("general", {})
+# Responses are cached per prompt + model settings; openai_base_url can point at a local stub
+llm = LLMClient(api_key=general.get("openai_key", ""), base_url=general.get("openai_base_url"))
 
 def fallback_commentary():
     bullets = []
@@ -129,7 +138,7 @@ def fallback_commentary():
         bullets.append(f"Average Days in MLS ≈ {days_mls}; pricing can lean higher for patient timelines, lower for faster absorption.")
     else:
         bullets.append("Average Days in MLS unavailable; consider a conservative initial stance until market feedback is clear.")
-    if remarks_snippets:
+    if remarks_used:
         bullets.append("Comp remarks indicate notable features/upgrades; position the subject relative to these differentiators.")
     spread = rec_high - rec_low
     if spread > 75_000:
@@ -141,95 +150,76 @@ def fallback_commentary():
     )
     return "\n".join([f"- {b}" for b in bullets]) + "\n\n" + para
 
-if st.button("Run Analysis and Generate Enhanced Report"):
-    if api_key and OpenAI is not None:
+def enhanced_report_job(job, prompt, fallback, recommended):
+    """Worker-thread body: GPT commentary (or fallback) plus the DOCX build. No Streamlit calls here."""
+    notes = []
+    commentary = None
+    if llm.available:
+        job.update(0.1, "Waiting for GPT commentary")
         try:
-            client = OpenAI(api_key=api_key)
-            resp = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You are a senior real estate pricing analyst."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.6,
-                max_tokens=1000
-            )
-            gpt_commentary = resp.choices[0].message.content.strip()
+            with trace.span("module11.gpt", cached=llm.cached(prompt) is not None):
+                parts = []
+                for delta in llm.stream(prompt):
+                    parts.append(delta)
+                    job.update(message="Streaming GPT commentary", partial="".join(parts))
+                commentary = "".join(parts).strip()
         except Exception as e:
-            st.error(f"❌ GPT call failed. Fallback will be used. Details: {e}")
-            used_fallback = True
+            notes.append(("error", f"❌ GPT call failed. Fallback will be used. Details: {e}"))
+    elif not llm.api_key:
+        notes.append(("warning", "No API key found; using fallback commentary."))
     else:
-        used_fallback = True
-        if not api_key:
-            st.warning("No API key found; using fallback commentary.")
-        elif OpenAI is None:
-            st.warning("OpenAI SDK not available; using fallback commentary.")
-
-    if used_fallback or not gpt_commentary:
-        gpt_commentary = fallback_commentary()
-
-    # Build DOCX
-    doc = Document()
-    title = "Enhanced Market Valuation Summary (Auto-Fallback)" if used_fallback else "Enhanced Market Valuation Summary"
-    doc.add_heading(title, 0)
-
-    # Subject
-    doc.add_heading("Subject Property Summary", level=1)
-    doc.add_paragraph(f"Address: {subject.get('address', 'N/A')}")
-    doc.add_paragraph(f"Above Grade SF: {subject.get('ag_sf', 'N/A')}")
-    doc.add_paragraph(f"Bedrooms: {subject.get('bedrooms', 'N/A')}")
-    doc.add_paragraph(f"Bathrooms: {subject.get('bathrooms', 'N/A')}")
-    doc.add_paragraph(f"Below Grade Finished: {subject.get('below_grade_finished', 0)}")
-    doc.add_paragraph(f"Below Grade Unfinished: {subject.get('below_grade_unfinished', 0)}")
-
-    # Valuation summary (explicit Days in MLS)
-    doc.add_heading("Valuation Summary", level=1)
-    doc.add_paragraph(f"Online Estimate Average: {money(online_avg)}")
-    doc.add_paragraph(f"Average Price Per SF: ${avg_ppsf}")
-    doc.add_paragraph(f"Average Days in MLS: {days_mls}")
-
-    # GPT Overview
-    doc.add_heading("Enhanced Property Overview", level=1)
-    doc.add_paragraph(gpt_commentary)
-
-    # Online estimates
-    doc.add_heading("Online Estimates", level=1)
-    est = doc.add_table(rows=4, cols=2)
-    est.cell(0, 0).text = "Source"; est.cell(0, 1).text = "Value"
-    est.cell(1, 0).text = "Zillow";  est.cell(1, 1).text = money(zillow_val) if zillow_val is not None else "N/A"
-    est.cell(2, 0).text = "Redfin";  est.cell(2, 1).text = money(redfin_val) if redfin_val is not None else "N/A"
-    est.cell(3, 0).text = "Real AVM";est.cell(3, 1).text = money(real_avm_val) if real_avm_val is not None else "N/A"
-
-    # Adjusted comps table (with Total Adjustments)
-    doc.add_heading("Adjusted Comparable Properties", level=1)
-    comp_table = doc.add_table(rows=1, cols=4)
-    hdrs = comp_table.rows[0].cells
-    hdrs[0].text = "Address"
-    hdrs[1].text = "AG SF"
-    hdrs[2].text = "Total Adjustments"
-    hdrs[3].text = "Adjusted Price"
-    for c in comps:
-        row = comp_table.add_row().cells
-        row[0].text = str(c.get("full_address", ""))
-        row[1].text = str(c.get("ag_sf", ""))
-        ta = c.get("total_adjustments", (c.get("ag_adj", 0) + c.get("bgf_adj", 0) + c.get("bgu_adj", 0)))
-        row[2].text = money(ta)
-        row[3].text = money(c.get("adjusted_price", 0))
-
-    # Ranges + recommendation
-    doc.add_heading("Ranges", level=1)
-    doc.add_paragraph(f"Raw Adjusted Comp Range: {money(raw_low)} – {money(raw_high)}")
-    doc.add_paragraph(f"Normalized Range (outlier-aware): {money(norm_low)} – {money(norm_high)} (median {money(norm_median)})")
-    if abs(raw_low - norm_low) < 1 and abs(raw_high - norm_high) < 1:
-        doc.add_paragraph("Note: Normalized range equals raw range; no strong outliers were detected by the filters.")
-    doc.add_heading("Recommended Market Range", level=1)
-    doc.add_paragraph(f"Recommended Listing Range: {money(rec_low)} – {money(rec_high)}")
-    doc.add_paragraph("Policy: Target ≤ $75K spread. Wider ranges require explicit data-based rationale; avoid > $150K unless compelling reasons exist.")
-
-    out_name = "Enhanced_GPT_Market_Report_Fixed_JSON.docx"
-    with open(out_name, "wb") as f:
-        doc.save(f)
-    with open(out_name, "rb") as f:
-        st.download_button("📥 Download Enhanced Report (Fixed JSON Source)", f, file_name=out_name)
-
-    st.success("✅ Enhanced report created.")
+        notes.append(("warning", "OpenAI SDK not available; using fallback commentary."))
+
+    used_fallback = not commentary
+    if used_fallback:
+        commentary = fallback
+    job.update(0.8, "Building report", partial=commentary)
+    with trace.span("module11.render_report", rows=len(comps)):
+        report = render_report("enhanced", summary, analysis_key=analysis_key,
+                               commentary=commentary, recommended=recommended, used_fallback=used_fallback)
+    return {"report": report, "commentary": commentary, "used_fallback": used_fallback, "notes": notes}
+
+
+queue = get_queue()
+if st.button("Run Analysis and Generate Enhanced Report"):
+    # Same analysis + prompt → the existing job (and its report) is reused;
+    # a new job for a cached prompt skips the API round-trip
+    queue.submit(namespace, "enhanced_report", enhanced_report_job, prompt, fallback_commentary(), (rec_low, rec_high),
+                 key=content_key([analysis_key, prompt]))
+
+
+# Poll only while this page's own job runs (other pages' jobs don't matter here)
+current = queue.latest(namespace, "enhanced_report")
+polling = current is not None and not current.done
+if polling:
+    st.session_state["_module11_polling"] = current.id
+
+
+def show_report_job():
+    job = queue.latest(namespace, "enhanced_report")
+    if job is None:
+        return
+    if not job.done:
+        st.progress(job.progress, text=f"{job.message} ({job.elapsed:.0f}s)")
+        if job.partial:
+            st.markdown(job.partial)
+        return
+    if st.session_state.get("_module11_polling") == job.id:
+        # Finished while polling: one full rerun stops the fragment timer
+        del st.session_state["_module11_polling"]
+        st.rerun()
+    if job.error:
+        st.error(f"❌ Report job failed: {job.error}")
+        return
+    for level, note in job.result["notes"]:
+        getattr(st, level)(note)
+    st.subheader("📝 Commentary")
+    st.markdown(job.result["commentary"])
+    st.download_button("📥 Download Enhanced Report (Fixed JSON Source)", job.result["report"],
+                       file_name="Enhanced_GPT_Market_Report_Fixed_JSON.docx",
+                       mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+    st.success(f"✅ Enhanced report created in {job.elapsed:.1f}s.")
+
+
+# Poll while this page's job is in flight; otherwise render once
+st.fragment(show_report_job, run_every=0.5 if polling else None)()
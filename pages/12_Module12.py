@@ -0,0 +1,88 @@
+import streamlit as st
+import numpy as np
+import pandas as pd
+
+from ichiban.instrument import show_diagnostics
+from ichiban.lazy import lazy_import
+from ichiban.pipeline import APP_PIPELINE, MissingInput
+from ichiban.schema import DEFAULT_SCHEMA_PATH, SchemaError
+from ichiban.sensitivity import sensitivity_surface
+
+# Altair, loaded when the heatmap is first drawn
+alt = lazy_import("altair")
+
+st.set_page_config(page_title="Module 12: Rate Sensitivity (What-If)", layout="wide")
+st.title("🧮 Module 12: Adjustment Rate Sensitivity (What-If)")
+trace = show_diagnostics()
+
+try:
+    with trace.span("module12.adjust"):
+        comps = APP_PIPELINE.get(st.session_state, "adjust")
+except FileNotFoundError:
+    st.error(f"❌ market_adjustment_schema.json not found; expected at `{DEFAULT_SCHEMA_PATH}`.")
+    st.stop()
+except (MissingInput, SchemaError):
+    st.error("❌ No adjusted comps found. Complete Modules 1–7 first.")
+    st.stop()
+if len(comps) == 0:
+    st.error("No comps available after adjustments.")
+    st.stop()
+
+st.markdown(
+    "Each cell re-prices every comp with a flat Above Grade and Finished Basement $/SF rate "
+    "(instead of the schema's price tiers), then runs the Module 8 outlier filter and normalized range."
+)
+
+c1, c2 = st.columns(2)
+with c1:
+    ag_min, ag_max = st.slider("Above Grade rate ($/SF)", 0, 200, (20, 80))
+    ag_steps = st.number_input("Above Grade steps", min_value=2, max_value=200, value=50)
+with c2:
+    bgf_min, bgf_max = st.slider("Finished Basement rate ($/SF)", 0, 100, (0, 50))
+    bgf_steps = st.number_input("Finished Basement steps", min_value=2, max_value=200, value=50)
+
+metric = st.selectbox("Show", ["Normalized median", "Normalized low", "Normalized high", "Normalized spread"])
+
+ag_rates = np.linspace(ag_min, ag_max, int(ag_steps))
+bgf_rates = np.linspace(bgf_min, bgf_max, int(bgf_steps))
+with trace.span("module12.surface", rows=len(comps), cells=len(ag_rates) * len(bgf_rates)):
+    surface = sensitivity_surface(comps, ag_rates, bgf_rates)
+
+values = {
+    "Normalized median": surface["median"],
+    "Normalized low": surface["low"],
+    "Normalized high": surface["high"],
+    "Normalized spread": surface["high"] - surface["low"],
+}[metric]
+
+grid = pd.DataFrame({
+    "ag_rate": np.repeat(ag_rates, len(bgf_rates)).round(2),
+    "bgf_rate": np.tile(bgf_rates, len(ag_rates)).round(2),
+    "value": values.ravel(),
+})
+chart = alt.Chart(grid).mark_rect().encode(
+    x=alt.X("ag_rate:O", title="Above Grade $/SF", axis=alt.Axis(labelOverlap=True)),
+    y=alt.Y("bgf_rate:O", title="Finished Basement $/SF", sort="descending", axis=alt.Axis(labelOverlap=True)),
+    color=alt.Color("value:Q", title=metric, scale=alt.Scale(scheme="viridis")),
+    tooltip=[alt.Tooltip("ag_rate:Q", title="AG $/SF"), alt.Tooltip("bgf_rate:Q", title="BGF $/SF"),
+             alt.Tooltip("value:Q", title=metric, format="$,.0f")],
+)
+st.altair_chart(chart, use_container_width=True)
+
+st.caption(
+    f"{metric}: ${np.nanmin(values):,.0f} – ${np.nanmax(values):,.0f} across "
+    f"{len(ag_rates) * len(bgf_rates):,} rate combinations × {len(comps)} comps."
+)
+
+# Point lookup for a specific what-if
+st.subheader("Single What-If")
+p1, p2 = st.columns(2)
+with p1:
+    ag_pick = st.number_input("Above Grade rate", min_value=0.0, value=float(ag_rates[len(ag_rates) // 2]), step=1.0)
+with p2:
+    bgf_pick = st.number_input("Finished Basement rate", min_value=0.0, value=float(bgf_rates[len(bgf_rates) // 2]), step=1.0)
+point = sensitivity_surface(comps, [ag_pick], [bgf_pick])
+st.write(
+    f"Normalized: ${point['low'][0, 0]:,.0f} – ${point['high'][0, 0]:,.0f} "
+    f"(median ${point['median'][0, 0]:,.0f}), Avg PPSF ${point['average_ppsf'][0, 0]:,.2f}"
+)
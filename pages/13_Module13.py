@@ -0,0 +1,92 @@
+import streamlit as st
+import json
+
+from ichiban.calibration import Calibrator, calibrated_schema
+from ichiban.instrument import show_diagnostics
+from ichiban.schema import DEFAULT_SCHEMA_PATH, SchemaError, load_schema
+
+st.set_page_config(page_title="Module 13: Calibrate Adjustment Rates", layout="wide")
+st.title("📐 Module 13: Calibrate Adjustment Rates from Comps")
+trace = show_diagnostics()
+
+if "cleaned_comp_data" not in st.session_state:
+    st.error("❌ No cleaned comp data found. Please complete Module 1 first.")
+    st.stop()
+try:
+    base = load_schema()
+except FileNotFoundError:
+    st.error(f"❌ market_adjustment_schema.json not found; expected at `{DEFAULT_SCHEMA_PATH}`.")
+    st.stop()
+except SchemaError as e:
+    st.error(f"❌ market_adjustment_schema.json could not be loaded: {e}")
+    st.stop()
+
+df = st.session_state.cleaned_comp_data
+compiled = base.compiled["mid"]
+
+# The accumulated fit survives reruns; it is restarted if the schema's price tiers change
+calibrator = st.session_state.get("calibrator")
+if calibrator is None or list(calibrator.tier_upper) != list(compiled.tier_upper):
+    calibrator = Calibrator(compiled)
+    st.session_state["calibrator"] = calibrator
+
+st.markdown(
+    "Regresses net price on Above Grade SF, finished / unfinished basement SF (one rate per schema price tier), "
+    "bedrooms, baths and garage bays. Each comp set you add is folded into the running fit; comps already "
+    "added (same address and close date) are skipped."
+)
+
+c1, c2 = st.columns(2)
+with c1:
+    if st.button(f"Add current comp set ({len(df):,} comps)"):
+        with trace.span("module13.update", rows=len(df)):
+            added, skipped = calibrator.update(df)
+        st.success(f"Added {added:,} comps ({skipped:,} already added or missing price / SF / beds / baths).")
+with c2:
+    if st.button("Reset calibration"):
+        calibrator = Calibrator(compiled)
+        st.session_state["calibrator"] = calibrator
+
+if calibrator.n == 0:
+    st.info("No comps added yet.")
+    st.stop()
+
+with trace.span("module13.fit", rows=calibrator.n):
+    rates, stats = calibrator.fit()
+
+# Current schema mid rates next to the fitted ones
+current = {}
+for t, label in enumerate(compiled.tier_labels):
+    current[("aboveGrade", label)] = compiled.ag_rate[t]
+    current[("basementFinished", label)] = compiled.basement_finished_rate[t]
+    current[("basement", label)] = compiled.basement_rate[t]
+current[("full_baths", None)] = compiled.full_bath
+current[("half_baths", None)] = compiled.half_bath
+current[("garage_bays", None)] = compiled.garage_per_bay
+rates["schema_mid"] = [current.get((r.feature, r.tier)) for r in rates.itertuples()]
+
+st.metric("Comps in fit", f"{stats['n']:,}")
+st.caption(f"R² {stats['r2']:.3f}. Tiers with fewer rows than required keep the current schema rates.")
+st.dataframe(
+    rates[["feature", "tier", "rate", "se", "schema_mid", "rows", "enough_rows"]],
+    hide_index=True, use_container_width=True,
+)
+
+try:
+    schema = calibrated_schema(base.raw, rates, stats)
+except SchemaError as e:
+    st.error(f"❌ Calibrated schema is invalid: {e}")
+    st.stop()
+
+if schema["calibration"]["kept_from_base"]:
+    st.caption("Kept from the current schema: " + ", ".join(schema["calibration"]["kept_from_base"]))
+
+st.download_button(
+    "Download calibrated schema",
+    json.dumps(schema, indent=2, ensure_ascii=False),
+    file_name="calibrated_market_adjustment_schema.json",
+    mime="application/json",
+)
+# The schema file is shared by every session, so the page never overwrites it
+st.caption("To adopt these rates, review the download and replace market_adjustment_schema.json with it.")
+
@@ -1,51 +1,59 @@
 
 import streamlit as st
-import pandas as pd
+
+from ichiban.compact import compact_comps, memory_report
+from ichiban.dedup import merge_exports
+from ichiban.geo import GridIndex
+from ichiban.ingest import fingerprint, load_many
+from ichiban.instrument import show_diagnostics
+from ichiban.pipeline import APP_PIPELINE
+from ichiban.preview import show_preview
+from ichiban.search import CompIndex
 
 st.set_page_config(page_title="Module 1: Load and Clean Comps", page_icon="📥")
 st.title("📥 Module 1: Load and Preview Comp Data")
-
-uploaded_file = st.file_uploader("Upload Comp CSV File", type=["csv"])
-if uploaded_file:
-    df = pd.read_csv(uploaded_file)
-
-    # Rename commonly used fields for internal consistency
-    rename_map = {
-        "Above Grade Finished Area": "ag_sf",
-        "Net Close Price": "net_price",
-        "Concessions Amount": "concessions",
-        "Bedrooms Total": "bedrooms",
-        "Bathrooms Total Integer": "bathrooms"
-    }
-    df.rename(columns=rename_map, inplace=True)
-
-    # Combine address fields safely
-    if all(col in df.columns for col in ["Street Number", "Street Name", "Street Suffix"]):
-        df["full_address"] = (
-            df["Street Number"].astype(str).str.strip()
-            + " "
-            + df.get("Street Dir Prefix", "").fillna("").astype(str).str.strip()
-            + " "
-            + df["Street Name"].astype(str).str.strip()
-            + " "
-            + df["Street Suffix"].astype(str).str.strip()
-        ).str.replace("  ", " ").str.strip()
-    else:
+trace = show_diagnostics()
+
+uploaded_files = st.file_uploader("Upload Comp CSV File(s)", type=["csv"], accept_multiple_files=True)
+if uploaded_files:
+    payloads = [f.getvalue() for f in uploaded_files]
+    key = fingerprint(b"".join(sorted(fingerprint(p).encode() for p in payloads)))
+
+    # Only parse when the uploads actually changed; later reruns reuse the session copy
+    if st.session_state.get("comp_data_key") != key:
+        with trace.span("module1.load", files=len(payloads)) as span:
+            results = load_many(payloads)
+            # Keep only the columns the app uses; remarks live once, outside the frame
+            df, remarks = compact_comps(merge_exports([df for df, _ in results]), key)
+            span.rows = len(df)
+        st.session_state.comp_remarks = remarks
+        APP_PIPELINE.set(st.session_state, "ingest", df, key)
+        with trace.span("module1.index", rows=len(df)):
+            st.session_state.comp_index = CompIndex(df)
+            st.session_state.comp_geo_index = GridIndex.from_frame(df)
+        st.session_state.comp_data_key = key
+        st.session_state.comp_data_from_cache = all(hit for _, hit in results)
+    df = st.session_state.cleaned_comp_data
+
+    if not df.attrs.get("address_ok", True):
         st.warning("Some address components are missing. 'full_address' will not be generated.")
-        df["full_address"] = "Unknown"
-
-    # Drop rows with missing critical values
-    required_fields = ["ag_sf", "net_price", "bedrooms", "bathrooms"]
-    initial_count = len(df)
-    df.dropna(subset=required_fields, inplace=True)
-    removed = initial_count - len(df)
 
+    removed = df.attrs.get("removed", 0)
     if removed > 0:
         st.info(f"{removed} comps removed due to missing critical fields.")
 
-    df.sort_values(by="net_price", inplace=True)
-    st.dataframe(df)
+    duplicates = df.attrs.get("duplicates_removed", 0)
+    if duplicates > 0:
+        st.info(f"{duplicates} duplicate comps removed across {len(uploaded_files)} exports (same address and close date).")
 
-    # Save to session
-    st.session_state.cleaned_comp_data = df
+    show_preview(df, "module1")
+
+    if st.session_state.get("comp_data_from_cache"):
+        st.caption("Loaded from the local comp cache (these exports were parsed before).")
     st.success("Comp data loaded and cleaned successfully.")
+
+    with st.expander("Session memory"):
+        report = memory_report(st.session_state)
+        st.caption(f"This session holds {report['unique_bytes'].sum() / 1e6:,.1f} MB "
+                   f"({report['bytes'].sum() / 1e6:,.1f} MB before counting shared buffers once).")
+        st.dataframe(report, hide_index=True)
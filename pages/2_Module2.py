@@ -1,26 +1,36 @@
 import streamlit as st
-import fitz  # PyMuPDF
-import re
+
+from ichiban.instrument import show_diagnostics
+from ichiban.subject_pdf import extract_subject
 
 st.set_page_config(page_title="Module 2: Subject Property Details", page_icon="🏠")
 st.title("🏠 Module 2: Subject Property Details")
+trace = show_diagnostics()
 
 # Upload PDF
 uploaded_pdf = st.file_uploader("Upload Subject Property PDF", type=["pdf"])
 
-# Extract text if PDF is uploaded
-extracted_text = ""
+# Extract fields once per PDF (cached by content hash)
+fields = {}
+pdf_key = "manual"
 if uploaded_pdf:
-    with fitz.open(stream=uploaded_pdf.read(), filetype="pdf") as doc:
-        for page in doc:
-            extracted_text += page.get_text()
+    with trace.span("module2.extract_pdf"):
+        result, from_cache = extract_subject(uploaded_pdf.getvalue())
+    fields = result["fields"]
+    pdf_key = result["key"][:12]
+    found = ", ".join(sorted(fields)) or "no fields"
+    st.caption(f"{'Cached' if from_cache else 'Extracted'}: {result['pages']} pages · found {found}")
+    with st.expander("Extracted text"):
+        st.text(result["text"][:5000])
 
-# Manual Entry Inputs (Default)
+# Inputs are prefilled from the PDF; keys follow the PDF so a new upload refreshes them
 st.subheader("Review or Manually Complete Extracted Info:")
-address = st.text_input("Address", "")
-ag_sf = st.number_input("Above Grade SF", min_value=0)
-bedrooms = st.number_input("Bedrooms", min_value=0, step=1)
-bathrooms = st.number_input("Bathrooms", min_value=0, step=1)
+address = st.text_input("Address", fields.get("address", ""), key=f"address_{pdf_key}")
+ag_sf = st.number_input("Above Grade SF", min_value=0, value=fields.get("ag_sf", 0), key=f"ag_sf_{pdf_key}")
+bedrooms = st.number_input("Bedrooms", min_value=0, step=1, value=fields.get("bedrooms", 0), key=f"bedrooms_{pdf_key}")
+bathrooms = st.number_input("Bathrooms", min_value=0.0, step=0.5, value=float(fields.get("bathrooms", 0)), key=f"bathrooms_{pdf_key}")
+bgf = st.number_input("Below Grade Finished SF", min_value=0, value=fields.get("below_grade_finished", 0), key=f"bgf_{pdf_key}")
+bgu = st.number_input("Below Grade Unfinished SF", min_value=0, value=fields.get("below_grade_unfinished", 0), key=f"bgu_{pdf_key}")
 
 # Save to session state
 if st.button("Save Subject Property Info"):
@@ -29,6 +39,8 @@ if st.button("Save Subject Property Info"):
         "ag_sf": ag_sf,
         "bedrooms": bedrooms,
         "bathrooms": bathrooms,
+        "below_grade_finished": bgf,
+        "below_grade_unfinished": bgu,
     }
     st.session_state["subject_data"] = subject_data
     st.success("✅ Subject Property Data Saved to Session")
@@ -1,8 +1,11 @@
 
 import streamlit as st
 
+from ichiban.instrument import show_diagnostics
+
 st.set_page_config(page_title="Module 3: Online Estimate Averaging (with Save)", page_icon="📊")
 st.title("📊 Module 3: Online Estimate Averaging")
+show_diagnostics()
 
 st.markdown("Enter any or all of the following estimates:")
 
@@ -1,8 +1,18 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 
+from ichiban.artifacts import content_key
+from ichiban.geo import GridIndex
+from ichiban.instrument import show_diagnostics
+from ichiban.pipeline import APP_PIPELINE
+from ichiban.preview import show_preview
+from ichiban.search import CompIndex
+from ichiban.similarity import similarity_scores, top_k
+
 st.set_page_config(page_title="Module 4: Comp Filtering", page_icon="📏")
 st.title("📏 Module 4: Comp Filtering by Above Grade SF")
+trace = show_diagnostics()
 
 # Load cleaned comp data from session_state
 if "cleaned_comp_data" not in st.session_state:
@@ -11,19 +21,105 @@ if "cleaned_comp_data" not in st.session_state:
 
 df = st.session_state.cleaned_comp_data
 
+# Indexes are built once per comp set and reused on every rerun
+index = st.session_state.get("comp_index")
+if index is None or index.df is not df:
+    with trace.span("module4.index", rows=len(df)):
+        index = CompIndex(df)
+        st.session_state["comp_index"] = index
+        st.session_state["comp_geo_index"] = GridIndex.from_frame(df)
+geo = st.session_state.get("comp_geo_index")
+
+subject = st.session_state.get("subject_data", {})
+# Comps farther than this are never comparable; also bounds the spatial index's search window
+MAX_RADIUS_MI = 100.0
+
 # Input: Subject Above Grade Finished SF
-subject_sf = st.number_input("Enter Subject Above Grade Finished SF", min_value=0)
+subject_sf = st.number_input("Enter Subject Above Grade Finished SF", min_value=0, value=int(subject.get("ag_sf", 0) or 0))
+
+# Filter logic: 85% to 110% of subject_sf by default
+c1, c2 = st.columns(2)
+with c1:
+    low_pct = st.number_input("Lower bound (% of subject SF)", min_value=0, max_value=100, value=85, step=1)
+with c2:
+    high_pct = st.number_input("Upper bound (% of subject SF)", min_value=100, max_value=300, value=110, step=1)
+lower_bound = subject_sf * low_pct / 100.0
+upper_bound = subject_sf * high_pct / 100.0
+
+with st.expander("Additional criteria"):
+    beds_tol = baths_tol = None
+    if st.checkbox("Match bedrooms", value=False):
+        subject_beds = st.number_input("Subject bedrooms", min_value=0, step=1, value=int(subject.get("bedrooms", 0) or 0))
+        beds_tol = st.number_input("Bedrooms ±", min_value=0, step=1, value=1)
+    if st.checkbox("Match bathrooms", value=False):
+        # Module 2 saves half baths (e.g. 2.5)
+        subject_baths = st.number_input("Subject bathrooms", min_value=0.0, step=0.5,
+                                        value=float(subject.get("bathrooms", 0) or 0))
+        baths_tol = st.number_input("Bathrooms ±", min_value=0.0, step=0.5, value=1.0)
+    months = st.number_input("Closed within last N months (0 = any)", min_value=0, step=1, value=0)
+    status = st.multiselect("Status", index.statuses, default=[])
+
+with trace.span("module4.query") as span:
+    positions = index.query(
+        ag_sf=(lower_bound, upper_bound),
+        bedrooms=(subject_beds - beds_tol, subject_beds + beds_tol) if beds_tol is not None else None,
+        bathrooms=(subject_baths - baths_tol, subject_baths + baths_tol) if baths_tol is not None else None,
+        closed_since=pd.Timestamp.today().normalize() - pd.DateOffset(months=months) if months else None,
+        status=status,
+    )
+    span.rows = len(positions)
+
+# Location: distance column plus optional radius / nearest-N limits
+distances = None
+if geo is not None and len(geo):
+    with st.expander("Location"):
+        g1, g2 = st.columns(2)
+        with g1:
+            subject_lat = st.number_input("Subject latitude", value=float(subject.get("latitude", 0.0) or 0.0), format="%.6f")
+        with g2:
+            subject_lon = st.number_input("Subject longitude", value=float(subject.get("longitude", 0.0) or 0.0), format="%.6f")
+        radius_mi = st.number_input("Radius (miles, 0 = any)", min_value=0.0, max_value=MAX_RADIUS_MI, value=0.0, step=0.25)
+        nearest_n = st.number_input("Keep only the N nearest (0 = all)", min_value=0, step=1, value=0)
+    if subject_lat or subject_lon:
+        if radius_mi > 0:
+            in_radius, _ = geo.radius(subject_lat, subject_lon, radius_mi)
+            positions = np.intersect1d(positions, in_radius)
+        distances = geo.distances(subject_lat, subject_lon, positions)
+        if nearest_n and len(positions) > nearest_n:
+            keep = np.sort(np.argpartition(np.nan_to_num(distances, nan=np.inf), nearest_n - 1)[:nearest_n])
+            positions, distances = positions[keep], distances[keep]
+else:
+    st.caption("No Latitude/Longitude columns in the comp data; location filters are unavailable.")
 
-# Filter logic: 85% to 110% of subject_sf
-lower_bound = subject_sf * 0.85
-upper_bound = subject_sf * 1.10
+# Similarity to the subject (SF, rooms, basement, age, distance, recency); Module 8 weights by it
+with st.expander("Similarity ranking"):
+    rank = st.checkbox("Score comps by similarity to the subject", value=True)
+    top_n = st.number_input("Keep only the K most similar (0 = all)", min_value=0, step=1, value=0, disabled=not rank)
+scores = None
+if rank and len(positions):
+    scoring_subject = {**subject, "ag_sf": subject_sf or None}
+    with trace.span("module4.similarity", rows=len(positions)):
+        scores = similarity_scores(df, scoring_subject, positions=positions, distances=distances)
+        if top_n and np.isnan(scores).all():
+            # top_k never picks unscored comps; cutting here would drop every comp
+            st.warning("No comp could be scored for similarity, so the K-most-similar limit was skipped.")
+        elif top_n and len(positions) > top_n:
+            keep = np.sort(top_k(scores, top_n))
+            positions, scores = positions[keep], scores[keep]
+            if distances is not None:
+                distances = distances[keep]
 
-filtered_df = df[
-    (df["ag_sf"] >= lower_bound) & (df["ag_sf"] <= upper_bound)
-]
+with trace.span("module4.publish", rows=len(positions)):
+    filtered_df = index.frame(positions)
+    if distances is not None:
+        filtered_df = filtered_df.assign(distance_mi=np.round(distances, 2))
+    if scores is not None:
+        filtered_df = filtered_df.assign(similarity=np.round(scores, 3))
 
-st.session_state['filtered_comps_df'] = filtered_df   # Save to state for next module
+    # Save for the next modules; adjustments downstream rerun only when the selection changes
+    selection = content_key([st.session_state.get("comp_data_key"), positions, distances, scores])
+    filtered_df = APP_PIPELINE.set(st.session_state, "filter", filtered_df, selection)
 
 # Display result
 st.success(f"{len(filtered_df)} comps match the filtering range ({lower_bound:.0f} - {upper_bound:.0f} SF).")
-st.dataframe(filtered_df)
+show_preview(filtered_df, "module4")
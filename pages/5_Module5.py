@@ -1,36 +1,29 @@
 import streamlit as st
-import pandas as pd
-import json
+
+from ichiban.instrument import show_diagnostics
+from ichiban.pipeline import APP_PIPELINE
+from ichiban.schema import DEFAULT_SCHEMA_PATH, SchemaError
 
 st.set_page_config(page_title="Module 5: Apply Comp Adjustments", layout="wide")
 st.title("📐 Module 5: Comp Adjustments Using Schema")
+trace = show_diagnostics()
 
 # Ensure required data exists
 if "filtered_comps_df" not in st.session_state or "subject_data" not in st.session_state:
     st.error("❌ Missing filtered comps or subject data. Please complete Modules 1–4.")
     st.stop()
 
-# Load schema
+# Above Grade SF adjustment (price-tiered rate from the schema); recomputed only
+# when the filtered comps, the subject or the schema file change
 try:
-    with open("market_adjustment_schema.json", "r") as f:
-        schema = json.load(f)
+    with trace.span("module5.adjust_ag"):
+        comps = APP_PIPELINE.get(st.session_state, "adjust_ag")
 except FileNotFoundError:
-    st.error("Please upload 'market_adjustment_schema.json' in this directory.")
+    st.error(f"❌ market_adjustment_schema.json not found; expected at `{DEFAULT_SCHEMA_PATH}`.")
+    st.stop()
+except SchemaError as e:
+    st.error(f"❌ market_adjustment_schema.json is invalid: {e}")
     st.stop()
 
-comps = st.session_state["filtered_comps_df"].copy()
-subject = st.session_state["subject_data"]
-
-# Above Grade SF adjustment
-rate = schema.get("above_grade_adjustment", 40)
-comps["ag_diff"] = comps["ag_sf"] - subject["ag_sf"]
-comps["ag_adj"] = comps["ag_diff"] * rate
-
-# Final adjusted price
-comps["adjusted_price"] = comps["net_price"] + comps["ag_adj"]
-
-# Display
+# Display (Module 7 applies the full adjustment set used by Module 8)
 st.dataframe(comps[["full_address", "ag_sf", "net_price", "ag_diff", "ag_adj", "adjusted_price"]])
-
-# Save for next module
-st.session_state["adjusted_comps"] = comps
@@ -1,7 +1,10 @@
 import streamlit as st
 
+from ichiban.instrument import show_diagnostics
+
 st.set_page_config(page_title="Module 6: Subject Basement Details", page_icon="🏗️")
 st.title("🏗️ Module 6: Enter Basement Information")
+show_diagnostics()
 
 if "subject_data" not in st.session_state:
     st.error("❌ Please complete Module 2 first to enter basic subject property info.")
@@ -13,9 +16,32 @@ subject = st.session_state.subject_data
 bgf = st.number_input("Below Grade Finished SF", min_value=0, value=subject.get("below_grade_finished", 0))
 bgu = st.number_input("Below Grade Unfinished SF", min_value=0, value=subject.get("below_grade_unfinished", 0))
 
+# Other features used by the schema adjustments in Module 7 (leave blank to skip)
+st.subheader("Other Features (optional)")
+garage = st.number_input("Garage Spaces", min_value=0, step=1, value=subject.get("garage_spaces"))
+tandem = st.checkbox("Tandem garage", value=bool(subject.get("garage_tandem", False)))
+full_baths = st.number_input("Full Bathrooms", min_value=0, step=1, value=subject.get("full_baths"))
+half_baths = st.number_input("Half Bathrooms", min_value=0, step=1, value=subject.get("half_baths"))
+year_built = st.number_input("Year Built", min_value=0, step=1, value=subject.get("year_built"))
+view_options = [None, "none", "greenbelt", "premium"]
+view = st.selectbox("View", view_options, index=view_options.index(subject.get("view")),
+                    format_func=lambda v: {None: "Not specified", "none": "No view", "greenbelt": "Greenbelt",
+                                           "premium": "Mountain / golf / panoramic"}[v])
+basement_options = [None, "none", "walkout", "garden"]
+basement_type = st.selectbox("Basement Type", basement_options, index=basement_options.index(subject.get("basement_type")),
+                             format_func=lambda v: {None: "Not specified", "none": "Standard", "walkout": "Walkout",
+                                                    "garden": "Garden level"}[v])
+
 # Save updated subject data
 subject["below_grade_finished"] = bgf
 subject["below_grade_unfinished"] = bgu
+subject["garage_spaces"] = garage
+subject["garage_tandem"] = tandem
+subject["full_baths"] = full_baths
+subject["half_baths"] = half_baths
+subject["year_built"] = year_built
+subject["view"] = view
+subject["basement_type"] = basement_type
 st.session_state["subject_data"] = subject
 
 st.success("✅ Subject Basement Info Updated")
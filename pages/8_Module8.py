@@ -1,21 +1,21 @@
 
 import streamlit as st
-import json
-import numpy as np
-import pandas as pd
+
+from ichiban.analysis_format import comp_count, to_binary, to_json
+from ichiban.artifacts import get_store, session_namespace
+from ichiban.instrument import show_diagnostics
+from ichiban.pipeline import APP_PIPELINE
+from ichiban.schema import DEFAULT_SCHEMA_PATH, SchemaError
 
 st.set_page_config(page_title="Module 8: Final Summary (Complete JSON + Inline Estimates)", page_icon="📊")
 st.title("📊 Module 8: Final Valuation Summary – Complete JSON")
+trace = show_diagnostics()
 
 # Preconditions
-if "adjusted_comps" not in st.session_state or "subject_data" not in st.session_state or "online_avg" not in st.session_state:
+if "filtered_comps_df" not in st.session_state or "subject_data" not in st.session_state or "online_avg" not in st.session_state:
     st.error("❌ Missing required data. Complete Modules 1–7 and 3.")
     st.stop()
 
-comps = st.session_state["adjusted_comps"].copy()
-subject = st.session_state["subject_data"]
-online_avg = float(st.session_state["online_avg"])
-
 # Inline Online Estimates (if missing)
 est = st.session_state.get("online_estimates", {})
 if not est or all(v in (None, 0, "") for v in est.values()):
@@ -34,117 +34,52 @@ if not est or all(v in (None, 0, "") for v in est.values()):
             "real_avm": a_in if a_in > 0 else None
         }
         st.success("✅ Online estimates saved to session. Re-run this module to include them in JSON.")
-est = st.session_state.get("online_estimates", {})  # refresh
-
-# Ensure numeric types
-for col in ["ag_sf","net_price","ag_adj","bgf_adj","bgu_adj","adjusted_price"]:
-    if col in comps.columns:
-        comps[col] = pd.to_numeric(comps[col], errors="coerce")
-
-# Total Adjustments
-for col in ["ag_adj","bgf_adj","bgu_adj"]:
-    if col not in comps.columns:
-        comps[col] = 0
-if "total_adjustments" not in comps.columns:
-    comps["total_adjustments"] = comps["ag_adj"].fillna(0) + comps["bgf_adj"].fillna(0) + comps["bgu_adj"].fillna(0)
 
-# Days in MLS
-if "Days In MLS" in comps.columns:
-    s = pd.to_numeric(comps["Days In MLS"], errors="coerce")
-elif "days_in_mls" in comps.columns:
-    s = pd.to_numeric(comps["days_in_mls"], errors="coerce")
+# Bootstrap stability of the normalized band (resamples the outlier-filtered prices)
+if st.checkbox("Bootstrap confidence intervals", value=True):
+    st.session_state["bootstrap_resamples"] = st.select_slider("Resamples", options=[1_000, 2_000, 5_000, 10_000, 20_000], value=10_000)
 else:
-    s = pd.Series(dtype="float64")
-avg_days = int(s.mean()) if s.notna().any() else "N/A"
-comps["days_in_mls"] = s
-
-# Remarks
-remarks_cols = ["Public Remarks", "PublicRemarks", "PUBLIC REMARKS", "public_remarks", "Remarks"]
-remarks_found = [c for c in remarks_cols if c in comps.columns]
-if remarks_found:
-    comps["public_remarks"] = comps[remarks_found[0]].astype(str).fillna("")
-else:
-    comps["public_remarks"] = ""
-comps["remarks_snippet"] = comps["public_remarks"].str.slice(0, 400)
-
-# Raw range
-if len(comps) == 0:
-    st.error("No comps available after adjustments.")
+    st.session_state["bootstrap_resamples"] = None
+
+# Adjust → summarize → bootstrap → analysis; each stage reruns only if its inputs changed
+try:
+    with trace.span("module8.summarize"):
+        result = APP_PIPELINE.get(st.session_state, "summarize")
+    if len(result["comps"]) == 0:
+        st.error("No comps available after adjustments.")
+        st.stop()
+    with trace.span("module8.analysis"):
+        bootstrap = APP_PIPELINE.get(st.session_state, "bootstrap")
+        summary = APP_PIPELINE.get(st.session_state, "analysis")
+except FileNotFoundError:
+    st.error(f"❌ market_adjustment_schema.json not found; expected at `{DEFAULT_SCHEMA_PATH}`.")
+    st.stop()
+except SchemaError as e:
+    st.error(f"❌ market_adjustment_schema.json is invalid: {e}")
     st.stop()
-prices = comps["adjusted_price"].astype(float)
-raw_low = float(prices.min()); raw_high = float(prices.max())
-
-# Avg PPSF
-total_sf = float(comps["ag_sf"].sum())
-avg_ppsf = round(float(comps["adjusted_price"].sum()) / total_sf, 2) if total_sf > 0 else 0.0
-
-# Outlier filter (IQR + PPSF)
-q1, q3 = prices.quantile(0.25), prices.quantile(0.75)
-iqr = q3 - q1
-low_cut = float(q1 - 1.5 * iqr); high_cut = float(q3 + 1.5 * iqr)
-filtered = comps[(comps["adjusted_price"] >= low_cut) & (comps["adjusted_price"] <= high_cut)]
-ppsf = (filtered["adjusted_price"] / filtered["ag_sf"].replace(0, pd.NA)).astype(float)
-ppsf_q1, ppsf_q3 = ppsf.quantile(0.25), ppsf.quantile(0.75)
-ppsf_iqr = ppsf_q3 - ppsf_q1
-ppsf_low = float(ppsf_q1 - 1.5 * ppsf_iqr); ppsf_high = float(ppsf_q3 + 1.5 * ppsf_iqr)
-filtered = filtered[(ppsf >= ppsf_low) & (ppsf <= ppsf_high)]
-
-# Normalized range + 150k cap
-if not filtered.empty:
-    norm_low = float(filtered["adjusted_price"].quantile(0.20))
-    norm_high = float(filtered["adjusted_price"].quantile(0.80))
-    norm_median = float(filtered["adjusted_price"].median())
-else:
-    norm_low = float(prices.quantile(0.20))
-    norm_high = float(prices.quantile(0.80))
-    norm_median = float(prices.median())
-MAX_SPREAD = 150_000.0
-if norm_high - norm_low > MAX_SPREAD:
-    half = MAX_SPREAD / 2.0
-    norm_low = max(raw_low, norm_median - half)
-    norm_high = min(raw_high, norm_median + half)
-
-summary = {
-    "subject_property": subject,
-    "online_estimate_average": online_avg,
-    "adjusted_price_range": [raw_low, raw_high],
-    "normalized_range": [norm_low, norm_high],
-    "normalized_median": norm_median,
-    "average_ppsf": avg_ppsf,
-    "average_days_in_mls": avg_days,
-    "outlier_notes": {
-        "method": "IQR + PPSF band; normalized 20–80th; $150K cap around median",
-        "price_iqr_low_cut": low_cut, "price_iqr_high_cut": high_cut,
-        "ppsf_low": ppsf_low, "ppsf_high": ppsf_high,
-        "filtered_count": int(len(filtered)), "total_count": int(len(comps))
-    },
-    "online_estimates": {
-        "zillow": est.get("zillow"),
-        "redfin": est.get("redfin"),
-        "real_avm": est.get("real_avm")
-    },
-    "comps": comps.to_dict(orient="records")
-}
-
-# JSON-safe convert
-def convert_all(o):
-    import numpy as np, pandas as pd
-    if isinstance(o, dict):
-        return {k: convert_all(v) for k, v in o.items()}
-    if isinstance(o, list):
-        return [convert_all(v) for v in o]
-    if hasattr(o, "tolist"):  # pandas/numpy
-        try: return o.tolist()
-        except Exception: pass
-    if str(type(o)).startswith("<class 'numpy."):
-        try: return o.item()
-        except Exception: return float(o)
-    return o
-
-with open("module9_analysis.json", "w") as f:
-    json.dump(convert_all(summary), f, indent=2)
 
-st.success("✅ Summary saved as 'module9_analysis.json' (with Online Estimates if provided)")
+comps = result["comps"]
+raw_low, raw_high = summary["adjusted_price_range"]
+norm_low, norm_high = summary["normalized_range"]
+norm_median = summary["normalized_median"]
+
+# Publish to this session's artifact store; Modules 9–11 read it from memory
+with trace.span("module8.publish", rows=comp_count(summary)):
+    analysis_key = get_store().put(session_namespace(st.session_state), "analysis", summary)
+st.session_state["analysis_key"] = analysis_key
+
+st.success("✅ Summary published for Modules 9–11 (with Online Estimates if provided)")
+st.caption(f"Analysis {analysis_key[:12]} · format v{summary['format_version']} · {comp_count(summary)} comps")
+
+with trace.span("module8.serialize", rows=comp_count(summary)):
+    analysis_json, analysis_binary = to_json(summary), to_binary(summary)
+d1, d2 = st.columns(2)
+with d1:
+    st.download_button("📥 Download analysis (JSON)", analysis_json,
+                       file_name="module9_analysis.json", mime="application/json")
+with d2:
+    st.download_button("📥 Download analysis (binary, fast reload)", analysis_binary,
+                       file_name="module9_analysis.ichban", mime="application/octet-stream")
 
 # Previews
 st.subheader("Online Estimates")
@@ -152,3 +87,16 @@ st.json(summary["online_estimates"])
 st.subheader("Ranges")
 st.write(f"Raw: ${raw_low:,.0f} – ${raw_high:,.0f}")
 st.write(f"Normalized: ${norm_low:,.0f} – ${norm_high:,.0f} (median ${norm_median:,.0f})")
+if "weighted_median" in summary:
+    w_low, w_high = summary["weighted_range"]
+    st.write(f"Similarity-weighted: ${w_low:,.0f} – ${w_high:,.0f} (median ${summary['weighted_median']:,.0f}, "
+             f"PPSF ${summary['weighted_ppsf']:,.2f})")
+    st.caption(f"Weighted by Module 4 similarity scores; worth about {summary['effective_comps']:,.1f} equally weighted comps.")
+if bootstrap:
+    st.subheader(f"Bootstrap {bootstrap['confidence']:.0%} Confidence Intervals")
+    st.caption(f"{bootstrap['resamples']:,} resamples of {bootstrap['sample_size']} filtered comps (before the $150K cap).")
+    for label, key in (("Low edge (20th)", "low"), ("Median", "median"), ("High edge (80th)", "high")):
+        lo, hi = bootstrap[key]
+        st.write(f"{label}: ${lo:,.0f} – ${hi:,.0f}")
+    if len(comps) and bootstrap["median"][1] - bootstrap["median"][0] > 50_000:
+        st.warning("ℹ️ The median is unstable across resamples; the comp set may be too thin.")
@@ -0,0 +1,35 @@
+import json
+
+import numpy as np
+import pytest
+
+from ichiban.analysis_format import loads, to_binary, to_json
+
+
+def _analysis():
+    return {
+        "weighted_median": float("nan"),
+        "normalized_range": [np.float64(1.0), np.float64("inf")],
+        "comps": {"length": 2, "columns": {"distance_mi": np.array([1.5, np.nan]),
+                                           "full_address": np.array(["1 Elm St", "2 Elm St"], dtype=object)}},
+    }
+
+
+def _reject(token):
+    raise ValueError(token)
+
+
+def test_json_is_strict_and_round_trips_nan():
+    text = to_json(_analysis())
+    payload = json.loads(text, parse_constant=_reject)
+    assert payload["weighted_median"] is None
+    assert payload["normalized_range"] == [1.0, None]
+    columns = loads(text)["comps"]["columns"]
+    assert np.isnan(columns["distance_mi"][1])
+
+
+def test_truncated_binary_raises_value_error():
+    data = to_binary(_analysis())
+    for cut in (len(data) - 8, len(data) // 2, 12):
+        with pytest.raises(ValueError):
+            loads(data[:cut])
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import generate
+from ichiban.calibration import Calibrator, calibrated_schema
+from ichiban.ingest import parse_comps
+from ichiban.schema import compile_all, load_schema
+
+
+@pytest.fixture(scope="module")
+def comps():
+    return parse_comps(generate(40000, seed=3).to_csv(index=False).encode())
+
+
+@pytest.fixture(scope="module")
+def base():
+    return load_schema()
+
+
+def test_recovers_synthetic_rates(comps, base):
+    calibrator = Calibrator(base.compiled["mid"])
+    calibrator.update(comps)
+    rates, stats = calibrator.fit()
+    fixed = rates.set_index("feature")
+    # benchmarks.synthetic prices garage bays at 9000 and full baths at 6500
+    assert fixed.loc["garage_bays", "rate"] == pytest.approx(9000, rel=0.1)
+    assert fixed.loc["full_baths", "rate"] == pytest.approx(6500, rel=0.2)
+    # ... and finished / unfinished basement at 35 / 12 $/SF in every tier
+    busy = rates[rates["rows"] >= 5000]
+    assert np.allclose(busy.loc[busy["feature"] == "basementFinished", "rate"], 35, rtol=0.15)
+    assert np.allclose(busy.loc[busy["feature"] == "basement", "rate"], 12, atol=4)
+    assert stats["r2"] > 0.8
+    compile_all(calibrated_schema(base.raw, rates, stats))
+
+
+def test_incremental_matches_full_fit(comps, base):
+    compiled = base.compiled["mid"]
+    parts = Calibrator(compiled)
+    for chunk in (comps.iloc[:20000], comps.iloc[10000:30000], comps.iloc[25000:]):
+        parts.update(chunk)
+    # Same tiering coefficients (frozen on the first batch), all rows at once
+    full = Calibrator(compiled)
+    full.tier_coef = parts.tier_coef
+    full.update(comps)
+    assert parts.n == full.n == len(comps)
+    assert np.allclose(parts.fit()[0]["rate"], full.fit()[0]["rate"])
+
+
+def test_unusable_rows_are_not_remembered(comps, base):
+    calibrator = Calibrator(base.compiled["mid"])
+    blank = comps.iloc[:100].copy()
+    blank["ag_sf"] = np.nan
+    calibrator.update(comps.iloc[100:1000])
+    assert calibrator.update(blank) == (0, 100)
+    assert calibrator.update(comps.iloc[:100]) == (100, 0)
+
+
+def test_unidentified_bedrooms_rate_is_null(comps, base):
+    calibrator = Calibrator(base.compiled["mid"])
+    calibrator.update(comps.iloc[:5000])
+    rates, stats = calibrator.fit()
+    rates.loc[rates["feature"] == "bedrooms", "rate"] = np.nan
+    schema = calibrated_schema(base.raw, rates, stats)
+    assert schema["calibration"]["bedrooms_rate"] is None
+
+
+def test_load_rejects_different_features(comps, base, tmp_path):
+    compiled = base.compiled["mid"]
+    calibrator = Calibrator(compiled)
+    calibrator.update(comps.iloc[:1000])
+    calibrator.equations.names[-1] = "pool"
+    path = tmp_path / "calibration.npz"
+    calibrator.save(path)
+    with pytest.raises(ValueError, match="features"):
+        Calibrator.load(path, compiled)
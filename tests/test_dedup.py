@@ -0,0 +1,72 @@
+import pandas as pd
+
+from ichiban.dedup import find_duplicates, merge_exports
+
+
+def _frame(rows, address_ok=True):
+    df = pd.DataFrame(rows)
+    df.attrs["address_ok"] = address_ok
+    return df
+
+
+def test_unknown_addresses_are_not_duplicates():
+    df = _frame({
+        "full_address": ["Unknown"] * 3,
+        "Close Date": ["2024-01-05", "2024-01-05", "2024-02-01"],
+        "net_price": [400000, 410000, 420000],
+    }, address_ok=False)
+    merged = merge_exports([df])
+    assert len(merged) == 3
+    assert merged.attrs["duplicates_removed"] == 0
+    assert not find_duplicates(df).any()
+
+
+def test_blank_dates_and_addresses_are_kept():
+    df = _frame({
+        "full_address": ["12 Elm St", "12 Elm St", "", ""],
+        "Street Number": ["12", "12", "", ""],
+        "Postal Code": ["80202", "80202", "", ""],
+        "Close Date": ["", "", "2024-01-05", "2024-01-05"],
+    })
+    assert not find_duplicates(df).any()
+
+
+def test_repeated_comp_is_dropped_once():
+    df = _frame({
+        "full_address": ["12 Elm Street", "12 Elm St", "14 Elm St"],
+        "Street Number": ["12", "12", "14"],
+        "Postal Code": ["80202", "80202-1234", "80202"],
+        "Close Date": ["2024-01-05", "2024-01-05", "2024-01-05"],
+        "net_price": [400000, 400000, 410000],
+    })
+    merged = merge_exports([df.iloc[:2], df.iloc[1:]])
+    assert len(merged) == 2
+    assert merged.attrs["duplicates_removed"] == 2
+
+
+def test_different_street_suffix_is_a_different_comp():
+    df = _frame({
+        "full_address": ["123 Maple St", "123 Maple Ct", "123 Maple"],
+        "Street Number": ["123", "123", "123"],
+        "Postal Code": ["80202", "80202", "80202"],
+        "Close Date": ["2024-01-05", "2024-01-05", "2024-01-05"],
+    })
+    # Only the suffix-less row matches an earlier one
+    assert find_duplicates(df).tolist() == [False, False, True]
+
+
+def test_export_without_addresses_keeps_its_rows_only():
+    good = _frame({
+        "full_address": ["12 Elm St", "12 Elm St"],
+        "Close Date": ["2024-01-05", "2024-01-05"],
+        "net_price": [400000, 400000],
+    })
+    unknown = _frame({
+        "full_address": ["Unknown", "Unknown"],
+        "Close Date": ["2024-01-05", "2024-01-05"],
+        "net_price": [410000, 420000],
+    }, address_ok=False)
+    merged = merge_exports([good, unknown])
+    assert len(merged) == 3
+    assert merged.attrs["duplicates_removed"] == 1
+    assert not merged.attrs["address_ok"]
@@ -0,0 +1,11 @@
+from ichiban.subject_pdf import parse_fields
+
+
+def test_address_skips_email_and_mailing_labels():
+    text = ("Listing Agent: Jo Smith\nAgent Email Address: jo@x.com\nMailing Address: PO Box 12\n"
+            "Property Address: 123 Main St   List Price: $500,000\n")
+    assert parse_fields(text)["address"] == "123 Main St"
+
+
+def test_address_falls_back_to_street_line():
+    assert parse_fields("Agent Email Address: jo@x.com\n  1234 N Elm Street\n")["address"] == "1234 N Elm Street"
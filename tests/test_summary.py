@@ -0,0 +1,35 @@
+import numpy as np
+
+from ichiban.summary import weighted_summary
+
+
+def test_unpriced_comps_carry_no_weight():
+    stats = weighted_summary([100.0, np.nan], [10.0, 10.0], [1.0, 1.0])
+    assert stats["effective_comps"] == 1.0
+    assert stats["weighted_median"] == 100.0
+
+
+def test_no_similarity_scores_omits_weighted_stats():
+    assert weighted_summary([100.0, 200.0], [10.0, 10.0], [np.nan, np.nan]) == {}
+
+
+def test_nothing_kept_omits_weighted_stats():
+    assert weighted_summary([100.0, 200.0], [10.0, 10.0], [1.0, 1.0], keep=np.array([False, False])) == {}
+
+
+def test_ragged_groups_match_per_group_ranges():
+    from ichiban.summary import value_range, value_ranges
+
+    rng = np.random.default_rng(0)
+    sizes = np.array([0, 1, 3, 17, 400, 5])
+    groups = np.repeat(np.arange(len(sizes)), sizes)
+    rng.shuffle(groups)
+    prices = rng.normal(500_000, 120_000, len(groups))
+    ag_sf = rng.normal(2000, 300, len(groups))
+    stats, keep = value_ranges(prices, ag_sf, groups, n_groups=len(sizes))
+    for g in np.flatnonzero(sizes):
+        rows = groups == g
+        single, single_keep = value_range(prices[rows], ag_sf[rows])
+        assert stats[g]["normalized_range"] == single["normalized_range"]
+        assert (keep[rows] == single_keep).all()
+    assert stats[0]["outlier_notes"]["total_count"] == 0